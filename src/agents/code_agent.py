@@ -5,6 +5,7 @@ from langchain_ollama import ChatOllama
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
 
+from agents.utils import get_agent_checkpointer
 from config.settings_config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -45,6 +46,7 @@ async def get_code_agent() -> tuple[str, CompiledStateGraph]:
         tools=[],
         prompt=code_agent_prompt,
         name=CODE_AGENT_NAME,
+        checkpointer=get_agent_checkpointer(get_settings().code_agent_durability),
     )
 
     return "Code Agent", agent
@@ -9,7 +9,9 @@ from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
 from langgraph.prebuilt.chat_agent_executor import AgentState
 
+from agents.utils import get_agent_checkpointer
 from config.settings_config import get_settings
+from enums.checkpoint_durability import CheckpointDurability
 
 logger = logging.getLogger(__name__)
 
@@ -105,6 +107,8 @@ async def get_google_agent() -> tuple[str, CompiledStateGraph, list[str]]:
         prompt=prompt,  # type: ignore
         name=GOOGLE_AGENT_NAME,
         interrupt_before=["tools"],
+        # Confirmations interrupt inside the agent, it always checkpoints steps
+        checkpointer=get_agent_checkpointer(CheckpointDurability.STEP),
     )
 
     return "Google Agent", agent, ["send_gmail"]
@@ -3,6 +3,7 @@ from langchain_ollama import ChatOllama
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
 
+from agents.utils import get_agent_checkpointer
 from config.settings_config import get_settings
 
 TRANSLATOR_AGENT_NAME = "translator_agent"
@@ -50,6 +51,7 @@ async def get_translator_agent() -> tuple[str, CompiledStateGraph]:
         tools=[],
         prompt=translator_agent_prompt,
         name=TRANSLATOR_AGENT_NAME,
+        checkpointer=get_agent_checkpointer(get_settings().translator_agent_durability),
     )
 
     return "Translator Agent", agent
@@ -13,6 +13,7 @@ from agents.tools.upload_file import (
     keyword_search_from_uploaded_files,
     sparse_search_uploaded_files,
 )
+from agents.utils import get_agent_checkpointer
 from config.settings_config import get_settings
 
 UPLOAD_FILE_RAF_AGENT_NAME = "upload_file_agent"
@@ -178,6 +179,9 @@ async def get_upload_file_agent() -> tuple[str, CompiledStateGraph]:
         tools=tools,
         prompt=prompt,  # type: ignore
         name=UPLOAD_FILE_RAF_AGENT_NAME,
+        checkpointer=get_agent_checkpointer(
+            get_settings().upload_file_agent_durability
+        ),
     )
 
     return "Upload File Agent", agent
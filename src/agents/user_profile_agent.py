@@ -4,6 +4,7 @@ from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
 
 from agents.tools.user_profile import get_profile, update_profile
+from agents.utils import get_agent_checkpointer
 from config.settings_config import get_settings
 
 USER_PROFILE_AGENT_NAME = "user_profile_agent"
@@ -114,6 +115,9 @@ async def get_user_profile_agent() -> tuple[str, CompiledStateGraph]:
         tools=tools,
         prompt=user_agent_prompt,
         name=USER_PROFILE_AGENT_NAME,
+        checkpointer=get_agent_checkpointer(
+            get_settings().user_profile_agent_durability
+        ),
     )
 
     return "User Profile Agent", agent
@@ -4,7 +4,16 @@ from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import BaseTool
 from langchain_core.tools import tool as create_tool
 from langgraph.prebuilt.interrupt import HumanInterrupt, HumanInterruptConfig
-from langgraph.types import interrupt
+from langgraph.types import Checkpointer, interrupt
+
+from enums.checkpoint_durability import CheckpointDurability
+
+
+def get_agent_checkpointer(durability: CheckpointDurability) -> Checkpointer:
+    """Checkpointer a sub-agent is compiled with for its durability"""
+    # None inherits the supervisor's checkpointer, False runs the agent's steps
+    # without one and its result is checkpointed by the supervisor
+    return None if durability == CheckpointDurability.STEP else False
 
 
 def add_human_in_the_loop(
@@ -9,6 +9,7 @@ from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import create_react_agent
 from langgraph.prebuilt.chat_agent_executor import AgentState
 
+from agents.utils import get_agent_checkpointer
 from config.settings_config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -97,6 +98,7 @@ async def get_weather_agent() -> tuple[str, CompiledStateGraph]:
         tools=tools,
         prompt=weather_agent_prompt,  # type: ignore
         name=WEATHER_AGENT_NAME,
+        checkpointer=get_agent_checkpointer(get_settings().weather_agent_durability),
     )
 
     return "Weather Agent", agent
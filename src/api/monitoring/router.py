@@ -6,7 +6,8 @@ from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse, PlainTextResponse
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-from core.monitoring import cpu_usage, memory_usage
+from core.monitoring import cpu_usage, memory_usage, record_pool_stats
+from db.psycopg.utils import get_open_pools
 
 logger = logging.getLogger(__name__)
 api_router = APIRouter()
@@ -42,12 +43,14 @@ async def readyz(request: Request) -> JSONResponse:
 async def metrics_endpoint() -> PlainTextResponse:
     """
     Exposes Prometheus-compatible metrics from `prometheus_client`.
-    Also updates CPU and memory usage just-in-time.
+    Also updates CPU, memory usage and Postgres pool stats just-in-time.
     """
     logger.debug("Metrics endpoint called")
     process = psutil.Process(os.getpid())
     memory_usage.set(process.memory_info().rss)
     cpu_usage.set(process.cpu_percent(interval=0.1))
+    for name, pool in (await get_open_pools()).items():
+        record_pool_stats(name, pool)
 
     return PlainTextResponse(
         generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST}
@@ -1,12 +1,26 @@
 import logging
 
 from fastapi import APIRouter, Query, Request, status
+from fastapi.responses import StreamingResponse
 
-from api.v1.schema.chat import ChatMessagesResponse, ChatsResponse
+from api.v1.schema.chat import (
+    ChatImportResponse,
+    ChatMessageResponse,
+    ChatMessagesResponse,
+    ChatSearchResponse,
+    ChatsResponse,
+)
+from core.etag import is_not_modified, not_modified
+from core.responses import model_response
+from services.v1.chat_export_service import export_user_chats, import_user_chats
 from services.v1.chat_service import (
     delete_chat_of_user,
     get_chat_list,
+    get_chat_list_etag,
     get_messages_by_chat_id,
+    get_messages_etag,
+    get_thinking_message,
+    search_chat_messages,
 )
 
 logger = logging.getLogger(__name__)
@@ -23,10 +37,30 @@ async def get_chat_messages(
     chat_id: str,
     limit: int = Query(20, ge=1, le=100),
     cursor: str = Query(None),
+    stub_thinking: bool = Query(False),
 ):
     # todo
     user_id = "user_id"
-    return await get_messages_by_chat_id(user_id, chat_id, limit, cursor)
+
+    # Computed before the read, so a concurrent write can only make it stale
+    etag = await get_messages_etag(user_id, chat_id, limit, cursor, stub_thinking)
+    if is_not_modified(request, etag):
+        return not_modified(etag)  # type: ignore
+
+    return model_response(
+        await get_messages_by_chat_id(user_id, chat_id, limit, cursor, stub_thinking),
+        etag,
+    )
+
+
+@router.get(
+    "/chats/{chat_id}/messages/{message_id}/thinking",
+    response_model=ChatMessageResponse,
+)
+async def get_chat_thinking_message(request: Request, chat_id: str, message_id: str):
+    # todo
+    user_id = "user_id"
+    return await get_thinking_message(user_id, chat_id, message_id)
 
 
 @router.get(
@@ -39,7 +73,46 @@ async def get_chats(
     cursor: str = Query(None),
 ):
     # todo: add user id to condition
-    return await get_chat_list("user_id", limit, cursor)
+    user_id = "user_id"
+
+    etag = await get_chat_list_etag(user_id, limit, cursor)
+    if is_not_modified(request, etag):
+        return not_modified(etag)  # type: ignore
+
+    return model_response(await get_chat_list(user_id, limit, cursor), etag)
+
+
+@router.get(
+    "/chats/search",
+    response_model=ChatSearchResponse,
+)
+async def search_chats(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str = Query(None),
+):
+    # todo
+    user_id = "user_id"
+    return await search_chat_messages(user_id, q, limit, cursor)
+
+
+@router.get("/chats/export", response_class=StreamingResponse)
+async def export_chats(request: Request):
+    # todo
+    user_id = "user_id"
+    return StreamingResponse(
+        export_user_chats(user_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="chats.ndjson"'},
+    )
+
+
+@router.post("/chats/import", response_model=ChatImportResponse)
+async def import_chats(request: Request):
+    # todo
+    user_id = "user_id"
+    return await import_user_chats(user_id, request.stream())
 
 
 @router.delete("/chats/{chat_id}", status_code=status.HTTP_204_NO_CONTENT)
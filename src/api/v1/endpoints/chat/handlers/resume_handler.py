@@ -3,18 +3,26 @@ import json
 import redis.asyncio as redis
 from fastapi import WebSocket
 
+from core.checkpoint_compactor import checkpoint_compactor
+from core.user_events import user_event_hub
+
 
 async def handle_resume(
     websocket: WebSocket, redis_client: redis.Redis, user_id: str, data: dict
 ) -> None:
     chat_id = data.get("chat_id")
     if not chat_id:
-        await websocket.send_json({"type": "error", "message": "Missing chat_id"})
+        await user_event_hub.send_json(
+            websocket, {"type": "error", "message": "Missing chat_id"}
+        )
         return
 
     # TODO
     # await get_chat(user_id, chat_id)
 
+    # A resumed thread isn't idle, keep it out of compaction
+    await checkpoint_compactor.mark(chat_id)
+
     redis_key = f"chat_messages_in_progress:{chat_id}"
     raw_state = await redis_client.get(redis_key)
     if raw_state:
@@ -22,11 +30,14 @@ async def handle_resume(
         resume_current = stream_state["current"]
         thinking = stream_state["thinking"]
 
-        await websocket.send_json(
+        await user_event_hub.send_json(
+            websocket,
             {
                 **(resume_current or {}),
                 "type": "resume_thinking" if thinking else "resume_messaging",
-            }
+            },
         )
 
-    await websocket.send_json({"type": "resume_ack", "chat_id": chat_id})
+    await user_event_hub.send_json(
+        websocket, {"type": "resume_ack", "chat_id": chat_id}
+    )
@@ -1,5 +1,7 @@
 from fastapi import WebSocket
 
+from core.user_events import user_event_hub
+
 
 async def handle_stop(websocket: WebSocket):
-    await websocket.send_json({"type": "complete"})
+    await user_event_hub.send_json(websocket, {"type": "complete"})
@@ -1,7 +1,9 @@
 from fastapi import WebSocket
 
+from core.user_events import user_event_hub
+
 
 async def handle_unknown(websocket: WebSocket, event_type: str):
-    await websocket.send_json(
-        {"type": "error", "message": f"Unknown type '{event_type}'"}
+    await user_event_hub.send_json(
+        websocket, {"type": "error", "message": f"Unknown type '{event_type}'"}
     )
@@ -31,6 +31,8 @@ from api.v1.schema.chat import (
     StreamChatTitle,
 )
 from config.settings_config import get_settings
+from core.checkpoint_compactor import checkpoint_compactor
+from core.user_events import user_event_hub
 from db.prisma.generated.models import Chat as PrismaChat
 from enums.chat import ApproveType, ChatRole, StreamType
 from services.v1.chat_service import (
@@ -86,21 +88,23 @@ async def _handle_chat(
     chat_id = chat.id
 
     if is_chat_created:
-        await websocket.send_json(
+        await user_event_hub.send_json(
+            websocket,
             {
                 "type": "create_chat",
                 "chat_id": chat_id,
                 "content": chat.title,
                 "timestamp": chat.timestamp,
-            }
+            },
         )
     else:
-        await websocket.send_json(
+        await user_event_hub.send_json(
+            websocket,
             {
                 "type": "update_chat",
                 "chat_id": chat_id,
                 "timestamp": chat.timestamp,
-            }
+            },
         )
 
     return chat
@@ -108,26 +112,22 @@ async def _handle_chat(
 
 async def _handle_init_user_message(
     websocket: WebSocket,
+    user_id: str,
     chat_id: str,
     group_id: str,
     message: str,
     upload_files: List[ChatMessageUploadFile],
 ) -> None:
-    user_msg = await save_user_message(chat_id, group_id, message, upload_files)
+    user_msg = await save_user_message(
+        user_id, chat_id, group_id, message, upload_files
+    )
 
     strem_message: StreamChatMessage = {
+        **user_msg,
         "type": StreamType.INIT,
-        "id": user_msg.id,
-        "chat_id": chat_id,
-        "role": ChatRole.USER,
-        "group_id": group_id,
-        "timestamp": datetime.now(timezone.utc).timestamp(),
-        "content": user_msg.content,
-        "upload_files": upload_files,
-        "agent": None,  # No agent for user messages
     }
 
-    await websocket.send_json(strem_message)
+    await user_event_hub.send_json(websocket, strem_message)
 
 
 async def _get_config(
@@ -199,7 +199,7 @@ async def _generate_chat_title(
             "type": StreamType.CHECKING_TITLE,
             "chat_id": chat.id,
         }
-        await websocket.send_json(stream_chat)
+        await user_event_hub.send_json(websocket, stream_chat)
         await asyncio.sleep(0)
 
         is_greeting = await _is_greeting(message)
@@ -211,7 +211,7 @@ async def _generate_chat_title(
                 "content": chat.title,
                 "timestamp": chat.timestamp,
             }
-            await websocket.send_json(greeting_title)
+            await user_event_hub.send_json(websocket, greeting_title)
         else:
             title = await _generate_title(message, last_message)
             updated_chat = await update_chat_title(user_id, chat.id, title)
@@ -221,7 +221,7 @@ async def _generate_chat_title(
                 "content": updated_chat.title,
                 "timestamp": updated_chat.timestamp,
             }
-            await websocket.send_json(generated_title)
+            await user_event_hub.send_json(websocket, generated_title)
 
 
 async def _get_sub_graph_state(
@@ -293,7 +293,7 @@ async def _is_completed(
                     **current,
                     "type": StreamType.CONFIRMATION,
                 }
-                await websocket.send_json(stream_msg)
+                await user_event_hub.send_json(websocket, stream_msg)
 
                 last_user_message = sub_state.values["messages"][-2]
                 await redis_client.setex(
@@ -382,7 +382,7 @@ async def _send_stream_messages(
                         **current,
                         "type": StreamType.END_MESSAGING,
                     }
-                    await websocket.send_json(end_msg)
+                    await user_event_hub.send_json(websocket, end_msg)
                     buffered.append(current)
                     current = None
 
@@ -401,7 +401,7 @@ async def _send_stream_messages(
                     **current,
                     "type": StreamType.START_THINKING,
                 }
-                await websocket.send_json(start_thinking_msg)
+                await user_event_hub.send_json(websocket, start_thinking_msg)
                 await _cache_stream_to_redis(redis_client, chat.id, current, thinking)
                 continue
 
@@ -412,7 +412,7 @@ async def _send_stream_messages(
                         **current,
                         "type": StreamType.END_THINKING,
                     }
-                    await websocket.send_json(end_thinking_msg)
+                    await user_event_hub.send_json(websocket, end_thinking_msg)
                     buffered.append(current)
                 current = None
                 await redis_client.delete(f"chat_messages_in_progress:{chat.id}")
@@ -425,7 +425,7 @@ async def _send_stream_messages(
                     **current,
                     "type": StreamType.THINKING,
                 }
-                await websocket.send_json(thinking_msg)
+                await user_event_hub.send_json(websocket, thinking_msg)
                 await _cache_stream_to_redis(redis_client, chat.id, current, thinking)
                 continue
 
@@ -447,7 +447,7 @@ async def _send_stream_messages(
                         **current,
                         "type": StreamType.START_MESSAGING,
                     }
-                    await websocket.send_json(start_msg)
+                    await user_event_hub.send_json(websocket, start_msg)
                 else:
                     current["timestamp"] = datetime.now(timezone.utc).timestamp()
                     current["content"] = str(current["content"]) + content
@@ -455,7 +455,7 @@ async def _send_stream_messages(
                         **current,
                         "type": StreamType.MESSAGING,
                     }
-                    await websocket.send_json(messaging_msg)
+                    await user_event_hub.send_json(websocket, messaging_msg)
 
                 await _cache_stream_to_redis(redis_client, chat.id, current, thinking)
 
@@ -465,7 +465,7 @@ async def _send_stream_messages(
     if current:
         buffered.append(current)
         final_msg: StreamChatMessage = {**current, "type": StreamType.END_MESSAGING}
-        await websocket.send_json(final_msg)
+        await user_event_hub.send_json(websocket, final_msg)
         current = None
 
 
@@ -478,7 +478,9 @@ async def _stream_user_messages(
     upload_files: List[ChatMessageUploadFile],
 ) -> tuple[bool, list[ChatMessage], str]:
     group_id = str(uuid.uuid4())
-    await _handle_init_user_message(websocket, chat.id, group_id, message, upload_files)
+    await _handle_init_user_message(
+        websocket, chat.userId, chat.id, group_id, message, upload_files
+    )
 
     buffered: list[ChatMessage] = []
     await _send_stream_messages(
@@ -569,7 +571,7 @@ async def _stream_confirm_messages(
             "type": StreamType.END_CONFIRMATION,
             "agent": None,
         }
-        await websocket.send_json(confirm_msg)
+        await user_event_hub.send_json(websocket, confirm_msg)
 
         if approve == ApproveType.ACCEPT or approve == ApproveType.UPDATE:
             if approve == ApproveType.UPDATE:
@@ -664,6 +666,7 @@ async def handle_user_message(
     upload_files = data.get("upload_files", [])
 
     chat = await _handle_chat(websocket, user_id, chat_id)
+    await checkpoint_compactor.mark(chat.id)
     config = await _get_config(chat.id, user_id, upload_files)
 
     if isinstance(message, dict):
@@ -680,7 +683,8 @@ async def handle_user_message(
             upload_files,
         )
 
-    await save_bot_messages(buffered)
+    await save_bot_messages(user_id, buffered)
+    await checkpoint_compactor.mark(chat.id)
 
     await redis_client.delete(f"chat_messages_in_progress:{chat.id}")
 
@@ -689,4 +693,6 @@ async def handle_user_message(
             await _generate_chat_title(
                 websocket, user_id, chat, user_message, buffered[-1]
             )
-        await websocket.send_json({"type": "complete", "chat.id": chat.id})
+        await user_event_hub.send_json(
+            websocket, {"type": "complete", "chat.id": chat.id}
+        )
@@ -4,8 +4,17 @@ from typing import Optional
 
 from fastapi import APIRouter, File, Form, UploadFile, status
 
-from api.v1.schema.chat import UploadFileChunkResponse
-from services.v1.upload_service import delete_uploaded_file, upload_file_chunks
+from api.v1.schema.chat import (
+    UploadFileChunkResponse,
+    UploadFileChunksResponse,
+    UploadFileStatusResponse,
+)
+from services.v1.upload_service import (
+    delete_uploaded_file,
+    get_upload_chunks,
+    get_upload_status,
+    upload_file_chunks,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +25,10 @@ router = APIRouter()
 async def upload_chunks(
     chunk: UploadFile = File(...),
     filename: str = Form(...),
-    chunk_index: int = Form(...),
-    total_chunks: int = Form(...),
+    chunk_index: int = Form(..., ge=0),
+    total_chunks: int = Form(..., ge=1),
+    # Optional for clients predating in-place writes, see `upload_file_chunks`
+    chunk_size: Optional[int] = Form(None, ge=1),
     file_id: Optional[str] = Form(None),
 ):
     user_id = "user_id"  # TODO:
@@ -32,9 +43,26 @@ async def upload_chunks(
         file_name=filename,
         chunk_index=chunk_index,
         total_chunks=total_chunks,
+        chunk_size=chunk_size,
     )
 
 
+@router.get("/chats/upload/{file_id}/chunks", response_model=UploadFileChunksResponse)
+async def get_upload_file_chunks(file_id: str):
+    # todo
+    user_id = "user_id"
+
+    return await get_upload_chunks(user_id, file_id)
+
+
+@router.get("/chats/upload/{file_id}/status", response_model=UploadFileStatusResponse)
+async def get_upload_file_status(file_id: str):
+    # todo
+    user_id = "user_id"
+
+    return await get_upload_status(user_id, file_id)
+
+
 @router.delete("/chats/upload/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_upload(file_id: str):
     # todo
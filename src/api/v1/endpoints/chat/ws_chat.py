@@ -9,6 +9,7 @@ from api.v1.endpoints.chat.handlers.stop_handler import handle_stop
 from api.v1.endpoints.chat.handlers.unknown_handler import handle_unknown
 from api.v1.endpoints.chat.handlers.user_message_handler import handle_user_message
 from core.redis_manager import get_redis
+from core.user_events import user_event_hub
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -21,15 +22,18 @@ async def websocket_chat(websocket: WebSocket):
 
     logger.debug("🔌 Chat WebSocket connected")
 
-    try:
-        user_id = "user_id"  # TODO: replace with real authentication
+    user_id = "user_id"  # TODO: replace with real authentication
+    user_event_hub.register(user_id, websocket)
 
+    try:
         while True:
             data_text = await websocket.receive_text()
             try:
                 data = json.loads(data_text)
             except Exception:
-                await websocket.send_json({"type": "error", "message": "Invalid JSON"})
+                await user_event_hub.send_json(
+                    websocket, {"type": "error", "message": "Invalid JSON"}
+                )
                 continue
 
             event_type = data.get("type")
@@ -47,3 +51,5 @@ async def websocket_chat(websocket: WebSocket):
 
     except WebSocketDisconnect:
         logger.debug("❌ Chat WebSocket disconnected")
+    finally:
+        user_event_hub.unregister(user_id, websocket)
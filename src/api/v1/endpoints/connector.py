@@ -5,7 +5,10 @@ from fastapi import APIRouter, Request, status
 from fastapi.responses import RedirectResponse
 
 from api.v1.schema.connector import ConnectorsResponse
+from core.etag import is_not_modified, not_modified
+from core.responses import model_response
 from services.v1.connector_service import (
+    get_connectors_etag,
     get_connectors_of_user,
     upsert_connector_of_user,
 )
@@ -35,4 +38,9 @@ async def callback(
 async def get_connectors(request: Request):
     # todo
     user_id = "user_id"
-    return await get_connectors_of_user(user_id)
+
+    etag = await get_connectors_etag(user_id)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    return model_response(await get_connectors_of_user(user_id), etag)
@@ -3,7 +3,13 @@ import logging
 from fastapi import APIRouter, Request
 
 from api.v1.schema.profile import ProfileResponse, UpdateProfileRequest
-from services.v1.profile_service import get_profile_of_user, update_profile_of_user
+from core.etag import is_not_modified, not_modified
+from core.responses import model_response
+from services.v1.profile_service import (
+    get_profile_etag,
+    get_profile_of_user,
+    update_profile_of_user,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +23,12 @@ router = APIRouter()
 async def get_profile(request: Request):
     # todo
     user_id = "user_id"
-    return await get_profile_of_user(user_id)
+
+    etag = await get_profile_etag(user_id)
+    if is_not_modified(request, etag):
+        return not_modified(etag)  # type: ignore
+
+    return model_response(await get_profile_of_user(user_id), etag)
 
 
 @router.patch("/profile", response_model=ProfileResponse)
@@ -3,6 +3,7 @@ from typing import List, Optional, TypedDict, Union
 from pydantic import BaseModel
 
 from enums.chat import ApproveType, ChatRole, StreamType
+from enums.ingestion import IngestionStatus
 
 
 class ConfirmationChatMessage(TypedDict):
@@ -15,10 +16,11 @@ class ChatResponse(BaseModel):
     id: str
     title: str
     timestamp: float
+    last_message: Optional[str] = None
 
 
 class ChatsResponse(BaseModel):
-    total: int
+    total: Optional[int]
     next_cursor: Optional[str]
     chats: list[ChatResponse]
 
@@ -43,14 +45,39 @@ class ChatMessageResponse(BaseModel):
     group_id: str
     upload_files: List[ChatMessageUploadFile]
     agent: Optional[Agent]
+    # Set on thinking stubs, the length of the full content
+    content_length: Optional[int] = None
 
 
 class ChatMessagesResponse(BaseModel):
-    total: int
+    total: Optional[int]
     next_cursor: Optional[str]
     messages: list[ChatMessageResponse]
 
 
+class ChatSearchResult(BaseModel):
+    message_id: str
+    chat_id: str
+    chat_title: str
+    role: ChatRole
+    timestamp: float
+    # HTML: escaped content with the matches wrapped in <mark>
+    snippet: str
+    rank: float
+
+
+class ChatSearchResponse(BaseModel):
+    next_cursor: Optional[str]
+    results: list[ChatSearchResult]
+
+
+class ChatImportResponse(BaseModel):
+    upload_files: int
+    chats: int
+    chat_files: int
+    messages: int
+
+
 class ChatMessage(TypedDict):
     id: str
     chat_id: str
@@ -82,3 +109,21 @@ class UploadFileChunkResponse(BaseModel):
     file_id: str
     file_name: str
     complete: bool
+    # Set on the last chunk, the file is ingested in the background
+    status: Optional[IngestionStatus] = None
+
+
+class UploadFileChunksResponse(BaseModel):
+    file_id: str
+    file_name: str
+    total_chunks: int
+    chunk_size: int
+    received: List[int]
+
+
+class UploadFileStatusResponse(BaseModel):
+    file_id: str
+    file_name: str
+    status: IngestionStatus
+    attempts: int
+    error: Optional[str] = None
@@ -0,0 +1,6 @@
+from config.logging_config import setup_logging
+from core.app_factory import create_app
+
+setup_logging()
+
+app = create_app()
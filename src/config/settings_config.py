@@ -1,10 +1,11 @@
 import logging
 from functools import lru_cache
-from typing import Annotated, List
+from typing import Annotated, List, Optional
 
 from pydantic import AnyHttpUrl, BeforeValidator, Field, ValidationError, computed_field
 from pydantic_settings import BaseSettings
 
+from enums.checkpoint_durability import CheckpointDurability
 from enums.mcp_transport import McpTransport
 
 logger = logging.getLogger(__name__)
@@ -20,6 +21,8 @@ class Settings(BaseSettings):
     port: Annotated[int, Field(ge=0)]
     backend_cors_origins: List[AnyHttpUrl]
     allowed_hosts: List[AnyHttpUrl]
+    # Responses smaller than this are sent uncompressed
+    gzip_minimum_size: Annotated[int, Field(ge=0)]
 
     # agents
     ollama_base_url: AnyHttpUrl
@@ -40,6 +43,13 @@ class Settings(BaseSettings):
         str, BeforeValidator(str.strip), Field(min_length=1)
     ]
 
+    # checkpoint durability of agents without interrupts
+    weather_agent_durability: CheckpointDurability
+    user_profile_agent_durability: CheckpointDurability
+    code_agent_durability: CheckpointDurability
+    translator_agent_durability: CheckpointDurability
+    upload_file_agent_durability: CheckpointDurability
+
     # models
     chat_title_model: Annotated[str, BeforeValidator(str.strip), Field(min_length=1)]
     chat_upload_file_description_model: Annotated[
@@ -63,6 +73,43 @@ class Settings(BaseSettings):
     ]
     postgres_pool_min_size: Annotated[int, Field(ge=0)]
     postgres_pool_max_size: Annotated[int, Field(ge=0)]
+    # Optional read replica, reads go to the primary when unset
+    postgres_replica_url: Annotated[
+        Optional[str], BeforeValidator(lambda v: (v or "").strip() or None)
+    ] = None
+    postgres_replica_pin_seconds: Annotated[int, Field(ge=1)]
+    checkpoint_pool_min_size: Annotated[int, Field(ge=0)]
+    checkpoint_pool_max_size: Annotated[int, Field(ge=1)]
+    checkpoint_compression_min_bytes: Annotated[int, Field(ge=0)]
+    checkpoint_compression_level: Annotated[int, Field(ge=1, le=22)]
+
+    # chat persistence
+    chat_write_batch_size: Annotated[int, Field(ge=1)]
+    chat_write_flush_interval: Annotated[float, Field(gt=0)]
+    chat_write_retry_delay: Annotated[float, Field(gt=0)]
+    chat_write_retry_max_delay: Annotated[float, Field(gt=0)]
+    chat_touch_flush_interval: Annotated[float, Field(gt=0)]
+    chat_archive_after_days: Annotated[int, Field(ge=1)]
+    chat_gc_interval: Annotated[float, Field(gt=0)]
+    chat_gc_batch_size: Annotated[int, Field(ge=1)]
+
+    # checkpoint retention
+    checkpoint_keep_per_thread: Annotated[int, Field(ge=1)]
+    checkpoint_compaction_interval: Annotated[float, Field(gt=0)]
+    checkpoint_compaction_idle_seconds: Annotated[float, Field(ge=0)]
+    checkpoint_compaction_pause: Annotated[float, Field(ge=0)]
+
+    # upload ingestion
+    ingestion_workers: Annotated[int, Field(ge=1)]
+    ingestion_max_attempts: Annotated[int, Field(ge=1)]
+    ingestion_retry_delay: Annotated[float, Field(ge=0)]
+    ingestion_job_timeout: Annotated[float, Field(gt=0)]
+    ingestion_job_ttl: Annotated[int, Field(ge=1)]
+    ingestion_poll_interval: Annotated[float, Field(gt=0)]
+    parsing_processes: Annotated[int, Field(ge=1)]
+    parsing_pages_per_shard: Annotated[int, Field(ge=1)]
+    upload_stale_seconds: Annotated[float, Field(gt=0)]
+    upload_sweep_interval: Annotated[float, Field(gt=0)]
 
     # qdrant
     qdrant_url: AnyHttpUrl
@@ -70,6 +117,8 @@ class Settings(BaseSettings):
         str, BeforeValidator(str.strip), Field(min_length=1)
     ]
     qdrant_embeddings_model_dims: Annotated[int, Field(ge=0)]
+    embedding_batch_size: Annotated[int, Field(ge=1)]
+    embedding_concurrency: Annotated[int, Field(ge=1)]
     qdrant_upload_collection_name: Annotated[
         str, BeforeValidator(str.strip), Field(min_length=1)
     ]
@@ -92,6 +141,12 @@ class Settings(BaseSettings):
     # stream
     stream_cache_ttl: Annotated[int, Field(ge=0)]
 
+    # cache
+    chat_index_ttl: Annotated[int, Field(ge=0)]
+    message_cache_size: Annotated[int, Field(ge=1)]
+    message_cache_ttl: Annotated[int, Field(ge=0)]
+    checkpoint_cache_ttl: Annotated[int, Field(ge=1)]
+
     class ConfigDict:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 
 from api.monitoring.router import api_router as monitoring_api_router
 from api.v1.router import api_router as v1_api_router
@@ -38,6 +39,11 @@ def create_app() -> FastAPI:
     #         allowed_hosts=[str(origin) for origin in get_settings().allowed_hosts],
     #     )
 
+    # Compress large responses, e.g. history pages
+    app.add_middleware(
+        GZipMiddleware, minimum_size=get_settings().gzip_minimum_size, compresslevel=6
+    )
+
     # Add logging middleware
     app.add_middleware(LoggingMetricMiddleware)
 
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+from config.settings_config import get_settings
+from core.checkpoint_cache import invalidate_checkpoint_cache
+from core.chat_touch import PENDING_KEY as TOUCH_PENDING_KEY
+from core.monitoring import chat_gc_reclaimed_counter
+from core.redis_lock import acquire_lock, release_lock
+from core.redis_manager import get_redis
+from db.psycopg.chat_gc_repository import (
+    delete_checkpoints,
+    delete_memories,
+    memory_prefix,
+)
+
+logger = logging.getLogger(__name__)
+
+# ZSET of [user_id, chat_id] members scored by deletion time
+PENDING_KEY = "chat_gc:pending"
+LOCK_KEY = "chat_gc:lock"
+
+# Chats collected per run
+COLLECT_LIMIT = 100
+
+
+def _stream_key(chat_id: str) -> str:
+    # Left behind when a deleted chat was streaming, the message cache is
+    # already invalidated by the delete
+    return f"chat_messages_in_progress:{chat_id}"
+
+
+class ChatGarbageCollector:
+    """
+    Deletes what a chat leaves behind outside of Prisma's cascade: LangGraph
+    checkpoints of its thread, memories in its store namespace and its Redis
+    keys.
+
+    Deleted chats are queued in Redis and collected in batches every
+    `chat_gc_interval`, once they've been deleted for at least one interval so
+    a turn still streaming into the chat has finished. The queue is shared by
+    all workers and survives restarts; `db.scripts.reconcile_chat_orphans`
+    queues orphans that were never scheduled.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start the periodic collector"""
+        if self._task is not None:
+            return  # Already running
+
+        self._task = asyncio.create_task(self._run())
+        logger.info("Chat garbage collector started")
+
+    async def stop(self) -> None:
+        """Stop the collector, the queue is kept for the next start"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info("Chat garbage collector stopped")
+
+    async def schedule(self, user_id: Optional[str], chat_id: str) -> None:
+        """Queue a deleted chat, user_id is only needed for its memories"""
+        try:
+            await get_redis().zadd(
+                PENDING_KEY, {json.dumps([user_id, chat_id]): time.time()}, nx=True
+            )
+        except Exception as e:
+            # The reconciliation sweep finds it later
+            logger.warning(f"Failed to schedule GC of chat {chat_id}: {e}")
+
+    async def collect(self, min_age: Optional[float] = None) -> int:
+        """Collect queued chats deleted at least `min_age` seconds ago"""
+        redis_client = get_redis()
+        interval = get_settings().chat_gc_interval
+        if min_age is None:
+            min_age = interval
+
+        # One worker at a time, deletes of the same rows would only wait on locks
+        lock_ttl = max(1, int(interval * 10))
+        lock_token = await acquire_lock(LOCK_KEY, lock_ttl)
+        if lock_token is None:
+            return 0
+
+        try:
+            members = await redis_client.zrangebyscore(
+                PENDING_KEY, "-inf", time.time() - min_age, start=0, num=COLLECT_LIMIT
+            )
+            if not members:
+                return 0
+
+            entries = [json.loads(member) for member in members]
+            chat_ids = [chat_id for _, chat_id in entries]
+            batch_size = get_settings().chat_gc_batch_size
+
+            for table, count in (
+                await delete_checkpoints(chat_ids, batch_size)
+            ).items():
+                chat_gc_reclaimed_counter.labels(kind=table).inc(count)
+
+            await invalidate_checkpoint_cache(chat_ids)
+
+            prefixes = [
+                memory_prefix(user_id, chat_id)
+                for user_id, chat_id in entries
+                if user_id is not None
+            ]
+            if prefixes:
+                chat_gc_reclaimed_counter.labels(kind="store").inc(
+                    await delete_memories(prefixes, batch_size)
+                )
+
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.delete(*[_stream_key(chat_id) for chat_id in chat_ids])
+            pipe.hdel(TOUCH_PENDING_KEY, *chat_ids)
+            pipe.zrem(PENDING_KEY, *members)
+            deleted_keys, _, _ = await pipe.execute()
+            chat_gc_reclaimed_counter.labels(kind="redis").inc(deleted_keys)
+
+            logger.info(f"Collected {len(chat_ids)} deleted chats")
+            return len(chat_ids)
+        finally:
+            await release_lock(LOCK_KEY, lock_token)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(get_settings().chat_gc_interval)
+            try:
+                await self.collect()
+            except Exception as e:
+                logger.error(f"Chat garbage collection failed: {e}")
+
+
+# Global instance
+chat_gc = ChatGarbageCollector()
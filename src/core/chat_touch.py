@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from config.settings_config import get_settings
+from core.monitoring import chat_touch_flush_counter
+from core.redis_lock import acquire_lock, release_lock
+from core.redis_manager import get_redis
+from db.prisma.utils import get_db
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "chat_touch:pending"
+LOCK_KEY = "chat_touch:lock"
+
+# Keeps the newest timestamp per chat. KEYS: pending / ARGV: chat id, timestamp
+TOUCH_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if not current or tonumber(current) < tonumber(ARGV[2]) then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+return 1
+"""
+
+# Removes flushed entries unless they were touched again meanwhile.
+# KEYS: pending / ARGV: chat id, timestamp, chat id, timestamp, ...
+RELEASE_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+return 1
+"""
+
+# One multi-row UPDATE, never moving a chat back in time
+FLUSH_QUERY = """
+UPDATE "Chat" AS c
+SET "timestamp" = v.ts, "updatedAt" = NOW()
+FROM unnest($1::text[], $2::float8[]) AS v(id, ts)
+WHERE c.id = v.id AND c."timestamp" < v.ts
+"""
+
+
+class ChatTouchBuffer:
+    """
+    Coalesces chat activity timestamps in Redis.
+
+    Every message touches its chat, but Postgres only receives one multi-row
+    UPDATE per `chat_touch_flush_interval` for all chats touched meanwhile,
+    whichever worker touched them. A touched chat stays in the pending hash
+    until its UPDATE is committed, so the exact activity timestamp of a chat
+    is always max(pending value, stored value): use `get_fresh_timestamps`,
+    or call `flush` before reading `Chat.timestamp` ordering from Postgres.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start the periodic flusher"""
+        if self._task is not None:
+            return  # Already running
+
+        self._task = asyncio.create_task(self._run())
+        logger.info("Chat touch buffer started")
+
+    async def stop(self) -> None:
+        """Stop the flusher and write every pending touch"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        await self.flush()
+        logger.info("Chat touch buffer stopped")
+
+    async def touch(self, chat_id: str, timestamp: float) -> None:
+        try:
+            await get_redis().eval(
+                TOUCH_SCRIPT, 1, PENDING_KEY, chat_id, repr(timestamp)
+            )
+        except Exception as e:
+            # Redis is only a buffer, don't lose the activity
+            logger.warning(f"Chat touch buffering failed, writing through: {e}")
+            db = await get_db()
+            await db.chat.update_many(
+                where={"id": chat_id, "timestamp": {"lt": timestamp}},
+                data={"timestamp": timestamp},
+            )
+
+    async def get_pending_timestamps(self, chat_ids: List[str]) -> Dict[str, float]:
+        """Timestamps of the given chats that are not in Postgres yet"""
+        if not chat_ids:
+            return {}
+
+        values = await get_redis().hmget(PENDING_KEY, chat_ids)
+        return {
+            chat_id: float(value)
+            for chat_id, value in zip(chat_ids, values)
+            if value is not None
+        }
+
+    async def get_fresh_timestamps(self, stored: Dict[str, float]) -> Dict[str, float]:
+        """Merge pending touches into timestamps read from Postgres"""
+        pending = await self.get_pending_timestamps(list(stored))
+        return {
+            chat_id: max(timestamp, pending.get(chat_id, timestamp))
+            for chat_id, timestamp in stored.items()
+        }
+
+    async def flush(self) -> None:
+        """Write all pending touches to Postgres in one UPDATE"""
+        redis_client = get_redis()
+
+        # Workers share the pending hash, one flush at a time is enough
+        lock_ttl = max(1, int(get_settings().chat_touch_flush_interval * 2))
+        lock_token = await acquire_lock(LOCK_KEY, lock_ttl)
+        if lock_token is None:
+            return
+
+        try:
+            pending = await redis_client.hgetall(PENDING_KEY)
+            if not pending:
+                return
+
+            db = await get_db()
+            updated = await db.execute_raw(
+                FLUSH_QUERY,
+                list(pending),
+                [float(timestamp) for timestamp in pending.values()],
+            )
+
+            await redis_client.eval(
+                RELEASE_SCRIPT,
+                1,
+                PENDING_KEY,
+                *[item for entry in pending.items() for item in entry],
+            )
+
+            chat_touch_flush_counter.inc(updated)
+            logger.debug(f"Flushed {len(pending)} chat touches, {updated} updated")
+        finally:
+            await release_lock(LOCK_KEY, lock_token)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(get_settings().chat_touch_flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Chat touch flush failed: {e}")
+
+
+# Global instance
+chat_touch_buffer = ChatTouchBuffer()
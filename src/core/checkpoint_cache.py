@@ -0,0 +1,315 @@
+import asyncio
+import base64
+import json
+import logging
+from typing import Any, List, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+from config.settings_config import get_settings
+from core.monitoring import checkpoint_cache_counter
+from core.redis_manager import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Sets the latest checkpoint of a namespace unless a newer one is cached.
+# `writes` records how many pending writes it has so far, a read trusts the
+# writes hash only when it still holds that many.
+# KEYS: latest, writes of the checkpoint, namespaces of the thread
+# ARGV: checkpoint id, data, ttl, namespace
+SET_LATEST_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'id')
+if current and current > ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'id', ARGV[1], 'data', ARGV[2],
+    'writes', redis.call('HLEN', KEYS[2]))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('SADD', KEYS[3], ARGV[4])
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+return 1
+"""
+
+# Adds pending writes of a checkpoint, kept if already written like Postgres.
+# KEYS: latest, writes of the checkpoint
+# ARGV: checkpoint id, ttl, then field/value pairs
+ADD_WRITES_SCRIPT = """
+for i = 3, #ARGV, 2 do
+    redis.call('HSETNX', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if redis.call('HGET', KEYS[1], 'id') == ARGV[1] then
+    redis.call('HSET', KEYS[1], 'writes', redis.call('HLEN', KEYS[2]))
+end
+return 1
+"""
+
+
+# Id and pending write count of the latest checkpoint in Postgres, read from
+# the primary keys only
+LATEST_CHECKPOINT_QUERY = """
+SELECT c.checkpoint_id, (
+    SELECT count(*) FROM checkpoint_writes w
+    WHERE w.thread_id = c.thread_id
+    AND w.checkpoint_ns = c.checkpoint_ns
+    AND w.checkpoint_id = c.checkpoint_id
+) AS writes
+FROM checkpoints c
+WHERE c.thread_id = %s AND c.checkpoint_ns = %s
+ORDER BY c.checkpoint_id DESC
+LIMIT 1
+"""
+
+
+def _latest_key(thread_id: str, checkpoint_ns: str) -> str:
+    return f"checkpoint_cache:{thread_id}:{checkpoint_ns}:latest"
+
+
+def _writes_key(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+    return f"checkpoint_cache:{thread_id}:{checkpoint_ns}:writes:{checkpoint_id}"
+
+
+def _namespaces_key(thread_id: str) -> str:
+    return f"checkpoint_cache:{thread_id}:namespaces"
+
+
+async def invalidate_checkpoint_cache(thread_ids: List[str]) -> None:
+    """Drop the cached checkpoints of threads changed outside the saver"""
+    if not thread_ids:
+        return
+
+    redis_client = get_redis()
+    pipe = redis_client.pipeline(transaction=False)
+    for thread_id in thread_ids:
+        pipe.smembers(_namespaces_key(thread_id))
+    namespaces = await pipe.execute()
+
+    keys = [
+        _latest_key(thread_id, checkpoint_ns)
+        for thread_id, thread_namespaces in zip(thread_ids, namespaces)
+        for checkpoint_ns in thread_namespaces
+    ]
+    # Pending writes are only read through their latest checkpoint, they
+    # expire on their own
+    await redis_client.delete(
+        *keys, *[_namespaces_key(thread_id) for thread_id in thread_ids]
+    )
+
+
+class CachedPostgresSaver(AsyncPostgresSaver):
+    """
+    AsyncPostgresSaver with a write-through Redis cache of the latest
+    checkpoint of each thread and subgraph namespace.
+
+    Every put and pending write goes to Postgres first, then to Redis for
+    `checkpoint_cache_ttl`. Reads of the latest checkpoint (graph steps and
+    `aget_state`) still query Postgres, but only its primary keys: a cached
+    copy is served when Postgres confirms its id and write count, so a copy
+    left stale by a failed Redis write (whose invalidation may fail too) is
+    never read. What the cache saves is loading and decoding the blobs and
+    writes. Reads of older checkpoints and `alist` always go to Postgres.
+
+    Writes to special channels (errors, interrupts, resumes) replace earlier
+    ones in Postgres, so a count can't tell a stale copy of them. They are
+    never cached: Postgres then always counts more writes than the cache and
+    the checkpoint is read from Postgres until the next one is put. Threads
+    are only cached by their writes, so an idle thread costs nothing until
+    its next turn.
+    """
+
+    def _encode(self, value: Any) -> str:
+        type_, data = self.serde.dumps_typed(value)
+        return f"{type_}:{base64.b64encode(data).decode()}"
+
+    def _decode(self, value: str) -> Any:
+        type_, data = value.split(":", 1)
+        return self.serde.loads_typed((type_, base64.b64decode(data)))
+
+    def _encode_writes(
+        self, task_id: str, task_path: str, writes: Sequence[tuple[str, Any]]
+    ) -> List[str]:
+        args = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            args.append(f"{task_id}:{idx}")
+            args.append(
+                json.dumps([task_path, task_id, idx, channel, self._encode(value)])
+            )
+        return args
+
+    def _decode_tuple(
+        self, thread_id: str, checkpoint_ns: str, data: str, writes: List[str]
+    ) -> CheckpointTuple:
+        value = self._decode(data)
+        # In Postgres' order: task path, task id, index
+        pending_writes = sorted(json.loads(write) for write in writes)
+
+        return CheckpointTuple(
+            {
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": value["checkpoint"]["id"],
+                }
+            },
+            value["checkpoint"],
+            value["metadata"],
+            (
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": value["parent_checkpoint_id"],
+                    }
+                }
+                if value["parent_checkpoint_id"]
+                else None
+            ),
+            [
+                (task_id, channel, self._decode(write))
+                for _, task_id, _, channel, write in pending_writes
+            ],
+        )
+
+    async def _get_cached(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: Optional[str]
+    ) -> Optional[CheckpointTuple]:
+        redis_client = get_redis()
+        latest = await redis_client.hgetall(_latest_key(thread_id, checkpoint_ns))
+        if not latest or (checkpoint_id and latest["id"] != checkpoint_id):
+            return None
+
+        writes = await redis_client.hvals(
+            _writes_key(thread_id, checkpoint_ns, latest["id"])
+        )
+        if len(writes) != int(latest["writes"]):
+            return None  # Evicted or a write never made it
+
+        if not await self._is_current(
+            thread_id, checkpoint_ns, latest["id"], len(writes)
+        ):
+            await self._invalidate(thread_id, checkpoint_ns)
+            return None
+
+        return await asyncio.to_thread(
+            self._decode_tuple, thread_id, checkpoint_ns, latest["data"], writes
+        )
+
+    async def _is_current(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, writes: int
+    ) -> bool:
+        async with self._cursor() as cur:
+            await cur.execute(LATEST_CHECKPOINT_QUERY, (thread_id, checkpoint_ns))
+            row = await cur.fetchone()
+        return (
+            row is not None
+            and row["checkpoint_id"] == checkpoint_id
+            and row["writes"] == writes
+        )
+
+    async def _invalidate(self, thread_id: str, checkpoint_ns: str) -> None:
+        # The cache missed an update, the next read goes to Postgres
+        try:
+            await get_redis().delete(_latest_key(thread_id, checkpoint_ns))
+        except Exception as e:
+            logger.warning(f"Failed to invalidate checkpoint of {thread_id}: {e}")
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        try:
+            cached = await self._get_cached(
+                thread_id, checkpoint_ns, get_checkpoint_id(config)
+            )
+        except Exception as e:
+            logger.warning(f"Checkpoint cache read failed for {thread_id}: {e}")
+            cached = None
+
+        checkpoint_cache_counter.labels(result="hit" if cached else "miss").inc()
+        if cached:
+            return cached
+
+        return await super().aget_tuple(config)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+
+        thread_id = next_config["configurable"]["thread_id"]
+        checkpoint_ns = next_config["configurable"]["checkpoint_ns"]
+        try:
+            data = await asyncio.to_thread(
+                self._encode,
+                {
+                    "checkpoint": checkpoint,
+                    "metadata": get_checkpoint_metadata(config, metadata),
+                    "parent_checkpoint_id": get_checkpoint_id(config),
+                },
+            )
+            await get_redis().eval(
+                SET_LATEST_SCRIPT,
+                3,
+                _latest_key(thread_id, checkpoint_ns),
+                _writes_key(thread_id, checkpoint_ns, checkpoint["id"]),
+                _namespaces_key(thread_id),
+                checkpoint["id"],
+                data,
+                get_settings().checkpoint_cache_ttl,
+                checkpoint_ns,
+            )
+        except Exception as e:
+            logger.warning(f"Checkpoint cache write failed for {thread_id}: {e}")
+            await self._invalidate(thread_id, checkpoint_ns)
+
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await super().aput_writes(config, writes, task_id, task_path)
+        if all(channel in WRITES_IDX_MAP for channel, _ in writes):
+            return  # Upserted, see the class docstring
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        try:
+            args = await asyncio.to_thread(
+                self._encode_writes, task_id, task_path, writes
+            )
+            await get_redis().eval(
+                ADD_WRITES_SCRIPT,
+                2,
+                _latest_key(thread_id, checkpoint_ns),
+                _writes_key(thread_id, checkpoint_ns, checkpoint_id),
+                checkpoint_id,
+                get_settings().checkpoint_cache_ttl,
+                *args,
+            )
+        except Exception as e:
+            logger.warning(f"Checkpoint cache write failed for {thread_id}: {e}")
+            await self._invalidate(thread_id, checkpoint_ns)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        await invalidate_checkpoint_cache([str(thread_id)])
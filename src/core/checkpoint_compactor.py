@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from config.settings_config import get_settings
+from core.checkpoint_cache import invalidate_checkpoint_cache
+from core.monitoring import checkpoint_compacted_counter, checkpoint_table_bytes
+from core.redis_lock import acquire_lock, release_lock
+from core.redis_manager import get_redis
+from db.psycopg.checkpoint_repository import compact_thread, get_table_sizes
+
+logger = logging.getLogger(__name__)
+
+# ZSET of thread ids scored by their last activity
+PENDING_KEY = "checkpoint_compaction:pending"
+LOCK_KEY = "checkpoint_compaction:lock"
+
+# Threads compacted per run
+COMPACT_LIMIT = 50
+
+
+def _stream_key(thread_id: str) -> str:
+    # Set while a turn of the chat is streaming, thread ids are chat ids
+    return f"chat_messages_in_progress:{thread_id}"
+
+
+# Drops a compacted thread unless it was marked again meanwhile.
+# KEYS: pending / ARGV: thread id, score read before compacting
+RELEASE_SCRIPT = """
+if tonumber(redis.call('ZSCORE', KEYS[1], ARGV[1])) == tonumber(ARGV[2]) then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+class CheckpointCompactor:
+    """
+    Applies the checkpoint retention to threads that were active.
+
+    Every turn marks its thread. Once a thread has been idle for
+    `checkpoint_compaction_idle_seconds`, the compactor keeps its latest
+    `checkpoint_keep_per_thread` checkpoints plus those of sub-agents still
+    pending, and deletes the rest with their writes and blobs. Threads are
+    compacted one at a time with a `checkpoint_compaction_pause` between them,
+    so compaction never competes with turns for long.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start the periodic compaction"""
+        if self._task is not None:
+            return  # Already running
+
+        self._task = asyncio.create_task(self._run())
+        logger.info("Checkpoint compactor started")
+
+    async def stop(self) -> None:
+        """Stop the compaction, marked threads are kept for the next start"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info("Checkpoint compactor stopped")
+
+    async def mark(self, thread_id: str) -> None:
+        """Record activity on a thread, it is compacted once idle"""
+        try:
+            await get_redis().zadd(PENDING_KEY, {thread_id: time.time()})
+        except Exception as e:
+            # The thread is compacted with its next turn
+            logger.warning(f"Failed to mark thread {thread_id} for compaction: {e}")
+
+    async def mark_idle(self, thread_ids: List[str]) -> None:
+        """Queue threads with no recorded activity, recent marks are kept"""
+        if thread_ids:
+            await get_redis().zadd(
+                PENDING_KEY, {thread_id: 0 for thread_id in thread_ids}, nx=True
+            )
+
+    async def _is_idle(self, thread_id: str, score: float) -> bool:
+        # Not marked since it was picked, and no turn streaming into it
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.zscore(PENDING_KEY, thread_id)
+        pipe.exists(_stream_key(thread_id))
+        current, streaming = await pipe.execute()
+        return current == score and not streaming
+
+    async def compact(self, idle_seconds: Optional[float] = None) -> int:
+        """Compact marked threads idle for at least `idle_seconds`"""
+        redis_client = get_redis()
+        settings = get_settings()
+        if idle_seconds is None:
+            idle_seconds = settings.checkpoint_compaction_idle_seconds
+
+        lock_ttl = max(1, int(settings.checkpoint_compaction_interval * 10))
+        lock_token = await acquire_lock(LOCK_KEY, lock_ttl)
+        if lock_token is None:
+            return 0
+
+        try:
+            threads = await redis_client.zrangebyscore(
+                PENDING_KEY,
+                "-inf",
+                time.time() - idle_seconds,
+                start=0,
+                num=COMPACT_LIMIT,
+                withscores=True,
+            )
+            if not threads:
+                return 0
+
+            sizes = await get_table_sizes()
+            for table, size in sizes.items():
+                checkpoint_table_bytes.labels(table=table).set(size)
+
+            compacted = 0
+            for thread_id, score in threads:
+                deleted = await compact_thread(
+                    thread_id,
+                    settings.checkpoint_keep_per_thread,
+                    lambda: self._is_idle(thread_id, score),
+                )
+                if deleted is None:
+                    continue  # Active again, compacted once idle
+
+                for table, count in deleted.items():
+                    checkpoint_compacted_counter.labels(table=table).inc(count)
+                # Finished sub-agent namespaces may be gone
+                await invalidate_checkpoint_cache([thread_id])
+                compacted += 1
+
+                await redis_client.eval(
+                    RELEASE_SCRIPT, 1, PENDING_KEY, thread_id, repr(score)
+                )
+                await asyncio.sleep(settings.checkpoint_compaction_pause)
+
+            compacted_sizes = await get_table_sizes()
+            for table, size in compacted_sizes.items():
+                checkpoint_table_bytes.labels(table=table).set(size)
+
+            logger.info(
+                f"Compacted {compacted} threads, checkpoint tables "
+                f"{sum(sizes.values())} -> {sum(compacted_sizes.values())} bytes"
+            )
+            return compacted
+        finally:
+            await release_lock(LOCK_KEY, lock_token)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(get_settings().checkpoint_compaction_interval)
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.error(f"Checkpoint compaction failed: {e}")
+
+
+# Global instance
+checkpoint_compactor = CheckpointCompactor()
@@ -0,0 +1,40 @@
+from typing import Any
+
+import zstandard
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# Appended to the serializer's type of compressed values, e.g. "msgpack+zstd"
+COMPRESSED_SUFFIX = "+zstd"
+
+
+class CompressedSerializer(JsonPlusSerializer):
+    """
+    LangGraph's msgpack serializer with zstd compression of large values.
+
+    Checkpoint blobs and pending writes hold whole message lists, including
+    tool outputs and thinking text, and compress well. Values of at least
+    `min_bytes` are compressed and their type is suffixed, so values written
+    before, or below the threshold, are read as they are.
+    """
+
+    def __init__(self, min_bytes: int, level: int):
+        super().__init__()
+        self.min_bytes = min_bytes
+        self.level = level
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = super().dumps_typed(obj)
+        if len(data) < self.min_bytes:
+            return type_, data
+
+        # Module-level functions, compressor objects aren't thread-safe and
+        # the savers serialize in worker threads
+        return type_ + COMPRESSED_SUFFIX, zstandard.compress(data, self.level)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, value = data
+        if type_.endswith(COMPRESSED_SUFFIX):
+            type_ = type_.removesuffix(COMPRESSED_SUFFIX)
+            value = zstandard.decompress(value)
+
+        return super().loads_typed((type_, value))
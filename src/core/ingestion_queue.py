@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config.settings_config import get_settings
+from core.monitoring import ingestion_jobs_counter
+from core.redis_manager import get_redis
+from core.user_events import user_event_hub
+from enums.chat import StreamType
+from enums.ingestion import IngestionStatus
+
+logger = logging.getLogger(__name__)
+
+# ZSET of file ids scored by the time they may run next
+PENDING_KEY = "ingestion:pending"
+
+# Queues a job unless it is already queued, running or done.
+# KEYS: job, pending / ARGV: file id, now, then field/value pairs
+ENQUEUE_SCRIPT = """
+local status = redis.call('HGET', KEYS[1], 'status')
+if status and status ~= 'failed' then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'status', 'queued', 'attempts', 0, unpack(ARGV, 3))
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 1
+"""
+
+# Claims the next due job by pushing it past its lease, so a job whose worker
+# died runs again once the lease is over.
+# KEYS: pending / ARGV: now, lease end
+CLAIM_SCRIPT = """
+local jobs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 1)
+if #jobs == 0 then
+    return false
+end
+redis.call('ZADD', KEYS[1], ARGV[2], jobs[1])
+return jobs[1]
+"""
+
+# Processes a claimed job
+IngestionHandler = Callable[[Dict[str, str]], Awaitable[None]]
+
+
+def _job_key(file_id: str) -> str:
+    return f"ingestion:job:{file_id}"
+
+
+class IngestionQueue:
+    """
+    Runs the ingestion of uploaded files (parsing, embedding, description)
+    outside of the upload request.
+
+    Jobs are keyed by file id, so an upload is only ingested once however
+    often it is enqueued. They live in Redis and are shared by all workers,
+    each running `ingestion_workers` jobs at a time. A job is leased for
+    `ingestion_job_timeout`, retried with an exponential backoff from
+    `ingestion_retry_delay` up to `ingestion_max_attempts` times, and kept for
+    `ingestion_job_ttl` once ready or failed. Status changes are pushed to the
+    user's WebSockets. Once a job fails for good, the failure handler removes
+    what it left, so the file never looks ready.
+    """
+
+    def __init__(self):
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[IngestionHandler] = None
+        self._failure_handler: Optional[IngestionHandler] = None
+
+    async def start(
+        self, handler: IngestionHandler, failure_handler: IngestionHandler
+    ) -> None:
+        """Start the workers"""
+        if self._tasks:
+            return  # Already running
+
+        self._handler = handler
+        self._failure_handler = failure_handler
+        self._tasks = [
+            asyncio.create_task(self._run())
+            for _ in range(get_settings().ingestion_workers)
+        ]
+        logger.info("Ingestion queue started")
+
+    async def stop(self) -> None:
+        """Stop the workers, running jobs are retried once their lease is over"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Ingestion queue stopped")
+
+    async def enqueue(self, file_id: str, user_id: str, file_name: str) -> bool:
+        """Queue the ingestion of an uploaded file, False if already known"""
+        queued = await get_redis().eval(
+            ENQUEUE_SCRIPT,
+            2,
+            _job_key(file_id),
+            PENDING_KEY,
+            file_id,
+            time.time(),
+            "file_id",
+            file_id,
+            "user_id",
+            user_id,
+            "file_name",
+            file_name,
+        )
+        if queued:
+            ingestion_jobs_counter.labels(status=IngestionStatus.QUEUED.value).inc()
+            await self._publish(user_id, file_id, IngestionStatus.QUEUED)
+        return bool(queued)
+
+    async def get_job(self, file_id: str) -> Optional[Dict[str, str]]:
+        return await get_redis().hgetall(_job_key(file_id)) or None
+
+    async def set_status(
+        self, job: Dict[str, str], status: IngestionStatus, error: str = ""
+    ) -> None:
+        """Record a job's progress and push it to the user"""
+        await get_redis().hset(
+            _job_key(job["file_id"]), mapping={"status": status.value, "error": error}
+        )
+        await self._publish(job["user_id"], job["file_id"], status, error)
+
+    async def _publish(
+        self, user_id: str, file_id: str, status: IngestionStatus, error: str = ""
+    ) -> None:
+        await user_event_hub.publish(
+            user_id,
+            {
+                "type": StreamType.UPLOAD_STATUS.value,
+                "file_id": file_id,
+                "status": status.value,
+                "error": error or None,
+            },
+        )
+
+    async def _process(self, file_id: str) -> None:
+        redis_client = get_redis()
+        settings = get_settings()
+
+        job = await self.get_job(file_id)
+        if job is None:
+            await redis_client.zrem(PENDING_KEY, file_id)
+            return
+
+        attempts = await redis_client.hincrby(_job_key(file_id), "attempts", 1)
+        last_attempt = attempts >= settings.ingestion_max_attempts
+
+        try:
+            assert self._handler is not None
+            await asyncio.wait_for(self._handler(job), settings.ingestion_job_timeout)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            logger.error(f"Ingestion of file {file_id} failed ({attempts}): {error}")
+
+            if not last_attempt:
+                delay = settings.ingestion_retry_delay * 2 ** (attempts - 1)
+                await redis_client.zadd(PENDING_KEY, {file_id: time.time() + delay})
+                await self.set_status(job, IngestionStatus.QUEUED, error)
+                return
+
+            status = IngestionStatus.FAILED
+            await self._discard(job)
+        else:
+            status, error = IngestionStatus.READY, ""
+
+        await redis_client.zrem(PENDING_KEY, file_id)
+        await self.set_status(job, status, error)
+        ingestion_jobs_counter.labels(status=status.value).inc()
+        await redis_client.expire(_job_key(file_id), settings.ingestion_job_ttl)
+
+    async def _discard(self, job: Dict[str, str]) -> None:
+        try:
+            assert self._failure_handler is not None
+            await self._failure_handler(job)
+        except Exception as e:
+            logger.error(f"Cleanup of failed file {job['file_id']} failed: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                settings = get_settings()
+                now = time.time()
+                file_id = await get_redis().eval(
+                    CLAIM_SCRIPT,
+                    1,
+                    PENDING_KEY,
+                    now,
+                    now + settings.ingestion_job_timeout,
+                )
+                if file_id is None:
+                    await asyncio.sleep(settings.ingestion_poll_interval)
+                    continue
+
+                await self._process(file_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker failed: {e}")
+                await asyncio.sleep(get_settings().ingestion_poll_interval)
+
+
+# Global instance
+ingestion_queue = IngestionQueue()
@@ -10,9 +10,21 @@ from langgraph.store.postgres.base import PoolConfig
 from agents.embeddings import get_lang_store_embeddings
 from agents.supervisor_agent import build_supervisor_agent
 from config.settings_config import get_settings
+from core.chat_gc import chat_gc
+from core.chat_touch import chat_touch_buffer
+from core.checkpoint_cache import CachedPostgresSaver
+from core.checkpoint_compactor import checkpoint_compactor
+from core.checkpoint_serde import CompressedSerializer
+from core.ingestion_queue import ingestion_queue
+from core.parsing_pool import parsing_pool
 from core.qdrant import setup_qdrant
 from core.redis_manager import redis_manager
-from db.prisma.utils import get_db
+from core.upload_manifest import upload_sweeper
+from core.user_events import user_event_hub
+from core.write_behind import write_behind_queue
+from db.prisma.utils import disconnect_replica_db, get_db
+from db.psycopg.utils import close_pool, get_checkpointer_pool
+from services.v1.upload_service import discard_failed_upload, ingest_uploaded_file
 
 logger = logging.getLogger(__name__)
 
@@ -46,10 +58,14 @@ class PersistentAsyncResources:
                 ),
             )
 
-            self.checkpointer = cast(
-                AsyncPostgresSaver,
-                await self._exit_stack.enter_async_context(
-                    AsyncPostgresSaver.from_conn_string(self.postgres_url)
+            # A pool instead of one shared connection, so the checkpoint reads
+            # and writes of concurrent turns don't queue behind each other.
+            # It is closed with the other psycopg pools.
+            self.checkpointer = CachedPostgresSaver(
+                await get_checkpointer_pool(),
+                serde=CompressedSerializer(
+                    get_settings().checkpoint_compression_min_bytes,
+                    get_settings().checkpoint_compression_level,
                 ),
             )
 
@@ -92,9 +108,29 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # redis
     await redis_manager.connect()
 
+    # chat writes, they pin their chats to the primary in Redis
+    await write_behind_queue.start()
+
+    # chat activity timestamps
+    await chat_touch_buffer.start()
+
+    # leftovers of deleted chats
+    await chat_gc.start()
+
+    # checkpoint retention
+    await checkpoint_compactor.start()
+
     # qdrant
     setup_qdrant()
 
+    # events pushed to the user's sockets
+    await user_event_hub.start()
+
+    # upload ingestion
+    await parsing_pool.start()
+    await ingestion_queue.start(ingest_uploaded_file, discard_failed_upload)
+    await upload_sweeper.start()
+
     # embeddings
     embeddings, dims = get_lang_store_embeddings()
 
@@ -130,7 +166,17 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     logger.info(f"Shutting down {get_settings().project_info}...")
 
     # Add cleanup tasks
+    await write_behind_queue.stop()
+    await chat_touch_buffer.stop()
+    await chat_gc.stop()
+    await checkpoint_compactor.stop()
+    await upload_sweeper.stop()
+    await ingestion_queue.stop()
+    await parsing_pool.stop()
+    await user_event_hub.stop()
     await db.disconnect()
+    await disconnect_replica_db()
+    await close_pool()
     await redis_manager.disconnect()
 
     logger.info(f"{get_settings().project_info} completely shutdown")
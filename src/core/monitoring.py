@@ -1,5 +1,6 @@
 # Application metrics
 from prometheus_client import Counter, Gauge, Histogram, Info
+from psycopg_pool import AsyncConnectionPool
 
 from config.settings_config import get_settings
 
@@ -26,3 +27,81 @@ server_info.info(
         "framework": "FastAPI",
     }
 )
+
+# Chat persistence metrics
+chat_write_batch_histogram = Histogram(
+    "chat_write_behind_batch_size",
+    "Chat writes committed per group commit",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+chat_write_flush_histogram = Histogram(
+    "chat_write_behind_flush_seconds", "Chat write-behind group commit time"
+)
+chat_touch_flush_counter = Counter(
+    "chat_touch_rows_flushed_total", "Chat timestamps written by touch flushes"
+)
+chat_gc_reclaimed_counter = Counter(
+    "chat_gc_reclaimed_total",
+    "Rows and keys deleted by the chat garbage collector",
+    ["kind"],
+)
+checkpoint_compacted_counter = Counter(
+    "checkpoint_compacted_rows_total",
+    "Checkpoint rows deleted by the retention policy",
+    ["table"],
+)
+checkpoint_cache_counter = Counter(
+    "checkpoint_cache_requests_total",
+    "Latest-checkpoint reads whose blobs and writes came from Redis or Postgres",
+    ["result"],
+)
+embedding_throughput_histogram = Histogram(
+    "embedding_throughput_chunks_per_second",
+    "Embedding throughput of each upload",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+ingestion_jobs_counter = Counter(
+    "ingestion_jobs_total",
+    "Upload ingestion jobs queued and finished, by status",
+    ["status"],
+)
+postgres_pool_size = Gauge(
+    "postgres_pool_connections", "Connections open in the psycopg pool", ["pool"]
+)
+postgres_pool_available = Gauge(
+    "postgres_pool_available_connections", "Idle connections in the pool", ["pool"]
+)
+postgres_pool_waiting = Gauge(
+    "postgres_pool_waiting_requests", "Requests waiting for a connection", ["pool"]
+)
+postgres_pool_requests_counter = Counter(
+    "postgres_pool_requests_total", "Connections requested from the pool", ["pool"]
+)
+postgres_pool_queued_counter = Counter(
+    "postgres_pool_queued_requests_total",
+    "Requests that had to wait for a connection",
+    ["pool"],
+)
+postgres_pool_wait_counter = Counter(
+    "postgres_pool_wait_seconds_total",
+    "Time requests spent waiting for a connection",
+    ["pool"],
+)
+checkpoint_table_bytes = Gauge(
+    "checkpoint_table_size_bytes",
+    "Checkpoint table size before and after each compaction run",
+    ["table"],
+)
+
+
+def record_pool_stats(name: str, pool: AsyncConnectionPool) -> None:
+    """Export a psycopg pool's stats, counters grow by the activity since the last call"""
+    stats = pool.pop_stats()
+    postgres_pool_size.labels(pool=name).set(stats.get("pool_size", 0))
+    postgres_pool_available.labels(pool=name).set(stats.get("pool_available", 0))
+    postgres_pool_waiting.labels(pool=name).set(stats.get("requests_waiting", 0))
+    postgres_pool_requests_counter.labels(pool=name).inc(stats.get("requests_num", 0))
+    postgres_pool_queued_counter.labels(pool=name).inc(stats.get("requests_queued", 0))
+    postgres_pool_wait_counter.labels(pool=name).inc(
+        stats.get("requests_wait_ms", 0) / 1000
+    )
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+from config.settings_config import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ParsingPool:
+    """
+    Process pool for CPU-bound document parsing, which would otherwise hold
+    the GIL and stall the event loop.
+
+    Runs `parsing_processes` workers, started with "spawn" since forking a
+    process with running threads and connections isn't safe. Functions and
+    arguments must be picklable, i.e. module-level functions and plain values.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=get_settings().parsing_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    async def start(self) -> None:
+        """Start the pool, workers are spawned on first use"""
+        if self._executor is not None:
+            return  # Already running
+
+        self._executor = self._create_executor()
+        logger.info("Parsing pool started")
+
+    async def stop(self) -> None:
+        """Stop the pool, queued calls are cancelled"""
+        if self._executor:
+            await asyncio.to_thread(self._executor.shutdown, cancel_futures=True)
+        self._executor = None
+        logger.info("Parsing pool stopped")
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        if self._executor is None:
+            raise RuntimeError("Parsing pool is not started")
+
+        executor = self._executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, func, *args
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory), replace the pool for the
+            # next calls
+            if self._executor is executor:
+                logger.error("Parsing pool broken, restarting it")
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create_executor()
+            raise
+
+
+# Global instance
+parsing_pool = ParsingPool()
@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import re
+import time
 import uuid
 from typing import Any, Counter, Dict, List, Optional
 
@@ -27,6 +29,7 @@ from qdrant_client.models import (
 )
 
 from config.settings_config import get_settings
+from core.monitoring import embedding_throughput_histogram
 
 logger = logging.getLogger(__name__)
 
@@ -106,22 +109,50 @@ def setup_qdrant():
         _create_qdrant_collection()
 
 
-def add_documents_to_qdrant(
+async def _embed_documents(texts: List[str]) -> List[List[float]]:
+    """Embed texts in concurrent batches, vectors in the order of the texts"""
+    batch_size = get_settings().embedding_batch_size
+    semaphore = asyncio.Semaphore(get_settings().embedding_concurrency)
+
+    async def embed_batch(batch: List[str]) -> List[List[float]]:
+        async with semaphore:
+            return await embeddings.aembed_documents(batch)
+
+    batches = await asyncio.gather(
+        *(
+            embed_batch(texts[start : start + batch_size])
+            for start in range(0, len(texts), batch_size)
+        )
+    )
+    return [vector for batch in batches for vector in batch]
+
+
+async def add_documents_to_qdrant(
     documents: List[Document], ids: Optional[List[str]] = None
 ) -> UpdateResult:
     """
     Add documents to Qdrant collection without updating existing ones.
     Uses unique UUIDs to prevent ID conflicts.
     """
+    # Generate dense vectors
+    started = time.perf_counter()
+    dense_vectors = await _embed_documents([doc.page_content for doc in documents])
+    elapsed = time.perf_counter() - started
+
+    if documents:
+        throughput = len(documents) / max(elapsed, 1e-6)
+        embedding_throughput_histogram.observe(throughput)
+        logger.info(
+            f"Embedded {len(documents)} chunks in {elapsed:.2f}s "
+            f"({throughput:.1f} chunks/s)"
+        )
+
     points = []
-    for i, doc in enumerate(documents):
+    for i, (doc, dense_vector) in enumerate(zip(documents, dense_vectors)):
         # Extract text and metadata from Document
         text = doc.page_content
         metadata = doc.metadata
 
-        # Generate dense vector
-        dense_vector = embeddings.embed_query(text)
-
         # Generate sparse vector
         sparse_vector = _generate_sparse_vector(text)
 
@@ -146,8 +177,10 @@ def add_documents_to_qdrant(
         points.append(point)
 
     # Upload points - upsert with unique IDs effectively adds without updating
-    result = client.upsert(
-        collection_name=get_settings().qdrant_upload_collection_name, points=points
+    result = await asyncio.to_thread(
+        client.upsert,
+        collection_name=get_settings().qdrant_upload_collection_name,
+        points=points,
     )
     return result
 
@@ -0,0 +1,74 @@
+"""
+Routing of read-only queries to the read replica.
+
+Pure reads (chat list, history, profile, connectors) go to the replica so
+they don't compete with the turn path on the primary. To keep
+read-your-writes, every write first pins its scope (a user or a chat) to the
+primary for `postgres_replica_pin_seconds`, which must exceed the expected
+replication lag. Pinning before writing leaves no window where the write is
+committed but reads still go to the replica. The pins live in Redis, so they
+hold across workers.
+"""
+
+import logging
+
+from psycopg_pool import AsyncConnectionPool
+
+from config.settings_config import get_settings
+from core.redis_manager import get_redis
+from db.prisma.generated.client import Prisma
+from db.prisma.utils import get_db, get_replica_db
+from db.psycopg.utils import get_pool, get_replica_pool
+
+logger = logging.getLogger(__name__)
+
+
+def user_scope(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def chat_scope(chat_id: str) -> str:
+    return f"chat:{chat_id}"
+
+
+def _pin_key(scope: str) -> str:
+    return f"primary_pin:{scope}"
+
+
+async def pin_to_primary(*scopes: str) -> None:
+    """Send reads of the given scopes to the primary for a while"""
+    if not get_settings().postgres_replica_url or not scopes:
+        return
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for scope in scopes:
+            pipe.set(
+                _pin_key(scope), "1", ex=get_settings().postgres_replica_pin_seconds
+            )
+        await pipe.execute()
+    except Exception as e:
+        # Without the pin a reader could miss the write, so tell it loudly
+        logger.error(f"Failed to pin {scopes} to the primary: {e}")
+
+
+async def use_replica(scope: str) -> bool:
+    """Whether reads of the scope may go to the replica"""
+    if not get_settings().postgres_replica_url:
+        return False
+
+    try:
+        return not await get_redis().exists(_pin_key(scope))
+    except Exception as e:
+        logger.warning(f"Primary pin of {scope} unknown, reading from primary: {e}")
+        return False
+
+
+async def get_read_db(scope: str) -> Prisma:
+    """Prisma client to read the scope from"""
+    return await get_replica_db() if await use_replica(scope) else await get_db()
+
+
+async def get_read_pool(scope: str) -> AsyncConnectionPool:
+    """psycopg pool to read the scope from"""
+    return await get_replica_pool() if await use_replica(scope) else await get_pool()
@@ -0,0 +1,27 @@
+from typing import Optional
+from uuid import uuid4
+
+from core.redis_manager import get_redis
+
+# Deletes a lock only while it still holds the owner's token, so an owner
+# whose lock expired can't release the next owner's.
+# KEYS: lock / ARGV: token
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+async def acquire_lock(key: str, ttl: int) -> Optional[str]:
+    """Take a lock shared by all workers, returns its token or None if held"""
+    token = uuid4().hex
+    if not await get_redis().set(key, token, nx=True, ex=ttl):
+        return None
+    return token
+
+
+async def release_lock(key: str, token: str) -> None:
+    """Release a lock taken with `acquire_lock`, unless it expired meanwhile"""
+    await get_redis().eval(RELEASE_LOCK_SCRIPT, 1, key, token)
@@ -0,0 +1,30 @@
+from typing import Any, Optional
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        # Like FastAPI's response_model encoding, e.g. enums as their value
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class ModelResponse(ORJSONResponse):
+    """
+    Serializes a pydantic model the service already validated with orjson.
+
+    Returned from an endpoint, it skips FastAPI's second validation and
+    `jsonable_encoder` pass against `response_model`, which then only
+    documents the schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def model_response(content: BaseModel, etag: Optional[str] = None) -> ModelResponse:
+    # Headers of an injected `Response` are dropped when a response is returned
+    return ModelResponse(content, headers={"ETag": etag} if etag else None)
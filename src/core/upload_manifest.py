@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import shutil
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+from config.settings_config import get_settings
+from core.ingestion_queue import ingestion_queue
+from core.redis_lock import acquire_lock, release_lock
+from core.redis_manager import get_redis
+from enums.ingestion import IngestionStatus
+
+logger = logging.getLogger(__name__)
+
+# ZSET of file ids of partial uploads scored by their last chunk time
+ACTIVE_KEY = "upload:active"
+SWEEP_LOCK_KEY = "upload:sweep_lock"
+
+# Stale uploads swept per run
+SWEEP_LIMIT = 100
+
+# How long a request may hold the finalize lock of a file
+FINALIZE_LOCK_TTL = 60
+
+# Creates the manifest of an upload, or checks a chunk matches it.
+# KEYS: manifest, active / ARGV: file id, user id, file name, total chunks,
+# chunk size, now
+BEGIN_SCRIPT = """
+local manifest = redis.call('HMGET', KEYS[1],
+    'user_id', 'file_name', 'total_chunks', 'chunk_size')
+if not manifest[1] then
+    redis.call('HSET', KEYS[1], 'user_id', ARGV[2], 'file_name', ARGV[3],
+        'total_chunks', ARGV[4], 'chunk_size', ARGV[5])
+elseif manifest[1] ~= ARGV[2] or manifest[2] ~= ARGV[3]
+    or manifest[3] ~= ARGV[4] or manifest[4] ~= ARGV[5] then
+    return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[6], ARGV[1])
+return 1
+"""
+
+# Records a written chunk, the last one also records the file size. Returns
+# the number of chunks received, -1 if the upload was swept meanwhile.
+# KEYS: manifest, chunks, active / ARGV: file id, chunk index, size or '', now
+RECORD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+redis.call('SADD', KEYS[2], ARGV[2])
+if ARGV[3] ~= '' then
+    redis.call('HSET', KEYS[1], 'size', ARGV[3])
+end
+redis.call('ZADD', KEYS[3], ARGV[4], ARGV[1])
+return redis.call('SCARD', KEYS[2])
+"""
+
+# Drops the manifest of an upload unless a chunk arrived since it went stale.
+# KEYS: active, manifest, chunks / ARGV: file id, cutoff
+DROP_STALE_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if score and tonumber(score) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('DEL', KEYS[2], KEYS[3])
+return 1
+"""
+
+
+def _manifest_key(file_id: str) -> str:
+    return f"upload:{file_id}"
+
+
+def _chunks_key(file_id: str) -> str:
+    return f"upload:{file_id}:chunks"
+
+
+def _lock_key(file_id: str) -> str:
+    return f"upload:{file_id}:lock"
+
+
+def get_upload_dir(file_id: str) -> Path:
+    return Path(get_settings().rag_agent_upload_temp_dir) / file_id
+
+
+async def begin_chunk(
+    file_id: str, user_id: str, file_name: str, total_chunks: int, chunk_size: int
+) -> bool:
+    """Start or resume the manifest of an upload, False if the chunk doesn't match"""
+    started = await get_redis().eval(
+        BEGIN_SCRIPT,
+        2,
+        _manifest_key(file_id),
+        ACTIVE_KEY,
+        file_id,
+        user_id,
+        file_name,
+        total_chunks,
+        chunk_size,
+        time.time(),
+    )
+    return bool(started)
+
+
+async def record_chunk(
+    file_id: str, chunk_index: int, size: Optional[int]
+) -> Optional[int]:
+    """Record a written chunk, returns the chunks received or None if swept"""
+    received = await get_redis().eval(
+        RECORD_SCRIPT,
+        3,
+        _manifest_key(file_id),
+        _chunks_key(file_id),
+        ACTIVE_KEY,
+        file_id,
+        chunk_index,
+        "" if size is None else size,
+        time.time(),
+    )
+    return None if received < 0 else received
+
+
+async def get_manifest(file_id: str) -> Optional[Dict[str, str]]:
+    return await get_redis().hgetall(_manifest_key(file_id)) or None
+
+
+async def get_received_chunks(file_id: str) -> List[int]:
+    return sorted(int(i) for i in await get_redis().smembers(_chunks_key(file_id)))
+
+
+async def delete_manifest(file_id: str) -> None:
+    """Forget a finalized upload"""
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.delete(_manifest_key(file_id), _chunks_key(file_id))
+    pipe.zrem(ACTIVE_KEY, file_id)
+    await pipe.execute()
+
+
+@asynccontextmanager
+async def finalize_lock(file_id: str) -> AsyncIterator[bool]:
+    """Lock the assembly of an upload, yields False if another request holds it"""
+    lock_token = await acquire_lock(_lock_key(file_id), FINALIZE_LOCK_TTL)
+    try:
+        yield lock_token is not None
+    finally:
+        if lock_token is not None:
+            await release_lock(_lock_key(file_id), lock_token)
+
+
+async def _is_ingesting(file_id: str) -> bool:
+    job = await ingestion_queue.get_job(file_id)
+    return job is not None and job["status"] != IngestionStatus.FAILED.value
+
+
+class UploadSweeper:
+    """
+    Deletes partial uploads nobody finished: the manifest and the directory
+    of an upload whose last chunk arrived more than `upload_stale_seconds`
+    ago, checked every `upload_sweep_interval`.
+
+    Directories of the upload temp dir without a manifest (e.g. left by a
+    crash) are deleted once as old. Files being ingested are always kept.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start the periodic sweeper"""
+        if self._task is not None:
+            return  # Already running
+
+        self._task = asyncio.create_task(self._run())
+        logger.info("Upload sweeper started")
+
+    async def stop(self) -> None:
+        """Stop the sweeper"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info("Upload sweeper stopped")
+
+    async def _remove_dir(self, file_id: str) -> bool:
+        # The manifest of a finalized upload may outlive its enqueue briefly
+        if await _is_ingesting(file_id):
+            return False
+
+        await asyncio.to_thread(
+            shutil.rmtree, get_upload_dir(file_id), ignore_errors=True
+        )
+        return True
+
+    def _find_orphans(self, cutoff: float) -> List[str]:
+        upload_dir = Path(get_settings().rag_agent_upload_temp_dir)
+        if not upload_dir.is_dir():
+            return []
+
+        return [
+            path.name
+            for path in upload_dir.iterdir()
+            if path.is_dir() and path.stat().st_mtime < cutoff
+        ]
+
+    async def sweep(self) -> int:
+        """Delete stale partial uploads, returns how many"""
+        redis_client = get_redis()
+        settings = get_settings()
+
+        lock_ttl = max(1, int(settings.upload_sweep_interval * 10))
+        lock_token = await acquire_lock(SWEEP_LOCK_KEY, lock_ttl)
+        if lock_token is None:
+            return 0
+
+        try:
+            cutoff = time.time() - settings.upload_stale_seconds
+            swept = 0
+
+            file_ids = await redis_client.zrangebyscore(
+                ACTIVE_KEY, "-inf", cutoff, start=0, num=SWEEP_LIMIT
+            )
+            for file_id in file_ids:
+                dropped = await redis_client.eval(
+                    DROP_STALE_SCRIPT,
+                    3,
+                    ACTIVE_KEY,
+                    _manifest_key(file_id),
+                    _chunks_key(file_id),
+                    file_id,
+                    cutoff,
+                )
+                if dropped and await self._remove_dir(file_id):
+                    swept += 1
+
+            for file_id in await asyncio.to_thread(self._find_orphans, cutoff):
+                if not await redis_client.exists(
+                    _manifest_key(file_id)
+                ) and await self._remove_dir(file_id):
+                    swept += 1
+
+            if swept:
+                logger.info(f"Swept {swept} stale uploads")
+            return swept
+        finally:
+            await release_lock(SWEEP_LOCK_KEY, lock_token)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(get_settings().upload_sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Upload sweep failed: {e}")
+
+
+# Global instance
+upload_sweeper = UploadSweeper()
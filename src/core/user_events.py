@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket
+
+from core.redis_manager import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "user_events:"
+
+# Seconds a socket may take to accept an event before it's skipped
+SEND_TIMEOUT = 5
+
+# Events waiting for a socket, newer ones are dropped once it's full
+OUTBOX_SIZE = 100
+
+
+class UserEventHub:
+    """
+    Pushes events to the WebSockets of a user, whichever worker they're
+    connected to.
+
+    Events are published on a Redis channel per user. Each worker holds a
+    single pattern subscription for all of them and forwards every event to
+    the sockets of that user it has registered.
+
+    Each socket has its own outbox and sender task, so a slow client only
+    delays its own events and they still arrive in order. Events it can't
+    keep up with are dropped, the status endpoints have the latest state.
+
+    Everything else sent to a registered socket (the chat stream) must go
+    through `send_json`, which shares the socket's send lock with its event
+    sender, so two frames are never written at once.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._sockets: Dict[str, Dict[WebSocket, asyncio.Queue]] = defaultdict(dict)
+        self._senders: Dict[WebSocket, asyncio.Task] = {}
+        self._send_locks: Dict[WebSocket, asyncio.Lock] = {}
+
+    async def start(self) -> None:
+        """Start forwarding published events"""
+        if self._task is not None:
+            return  # Already running
+
+        self._task = asyncio.create_task(self._run())
+        logger.info("User event hub started")
+
+    async def stop(self) -> None:
+        """Stop forwarding, registered sockets stay connected"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info("User event hub stopped")
+
+    def register(self, user_id: str, websocket: WebSocket) -> None:
+        outbox: asyncio.Queue = asyncio.Queue(maxsize=OUTBOX_SIZE)
+        self._sockets[user_id][websocket] = outbox
+        self._send_locks[websocket] = asyncio.Lock()
+        self._senders[websocket] = asyncio.create_task(
+            self._send_loop(websocket, outbox)
+        )
+
+    def unregister(self, user_id: str, websocket: WebSocket) -> None:
+        sender = self._senders.pop(websocket, None)
+        if sender:
+            sender.cancel()
+        self._send_locks.pop(websocket, None)
+
+        sockets = self._sockets.get(user_id)
+        if sockets is None:
+            return
+
+        sockets.pop(websocket, None)
+        if not sockets:
+            del self._sockets[user_id]
+
+    async def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        """Send an event to every socket of the user, events aren't kept"""
+        try:
+            await get_redis().publish(CHANNEL_PREFIX + user_id, json.dumps(event))
+        except Exception as e:
+            logger.warning(f"Failed to publish event to user {user_id}: {e}")
+
+    async def send_json(self, websocket: WebSocket, data: Any) -> None:
+        """Send to a socket, after any event being written to it"""
+        lock = self._send_locks.get(websocket)
+        if lock is None:
+            await websocket.send_json(data)
+            return
+
+        async with lock:
+            await websocket.send_json(data)
+
+    async def _send_loop(self, websocket: WebSocket, outbox: asyncio.Queue) -> None:
+        lock = self._send_locks[websocket]
+        while True:
+            data = await outbox.get()
+            try:
+                async with lock:
+                    await asyncio.wait_for(websocket.send_text(data), SEND_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Closed meanwhile, its handler unregisters it, or too slow
+                pass
+
+    def _forward(self, user_id: str, data: str) -> None:
+        for outbox in self._sockets.get(user_id, {}).values():
+            try:
+                outbox.put_nowait(data)
+            except asyncio.QueueFull:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with get_redis().pubsub() as pubsub:
+                    await pubsub.psubscribe(CHANNEL_PREFIX + "*")
+                    async for message in pubsub.listen():
+                        if message["type"] == "pmessage":
+                            user_id = message["channel"].removeprefix(CHANNEL_PREFIX)
+                            self._forward(user_id, message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"User event subscription failed: {e}")
+                await asyncio.sleep(1)
+
+
+# Global instance
+user_event_hub = UserEventHub()
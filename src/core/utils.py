@@ -1,5 +1,9 @@
+import base64
+import json
 from typing import List, Union
 
+from fastapi import HTTPException
+
 
 def deep_merge(base: dict, override: dict) -> dict:
     """
@@ -43,3 +47,42 @@ def to_string(x: InputType) -> str:
         return " ".join(parts)
     else:
         raise TypeError(f"Unexpected type: {type(x)}")
+
+
+def encode_cursor(*values: Union[str, float]) -> str:
+    """
+    Encodes keyset pagination values (e.g. timestamp and id of the last row)
+    into an opaque, URL-safe cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, *types: type) -> list:
+    """
+    Decodes a cursor built by `encode_cursor` back into its values, which must
+    be of the given `types` (an int passes for a float).
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        values = None
+
+    if (
+        not isinstance(values, list)
+        or len(values) != len(types)
+        or not all(_is_of_type(value, t) for value, t in zip(values, types))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return values
+
+
+def _is_of_type(value, t: type) -> bool:
+    if isinstance(value, bool):
+        return t is bool
+    if t is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, t)
@@ -0,0 +1,336 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from psycopg import DataError, IntegrityError
+
+from config.settings_config import get_settings
+from core.monitoring import chat_write_batch_histogram, chat_write_flush_histogram
+from core.read_routing import chat_scope, pin_to_primary
+from db.psycopg.chat_repository import commit_chat_writes, get_chat
+from services.v1.chat_index_service import invalidate_chat_index
+from services.v1.message_cache_service import invalidate_messages
+
+logger = logging.getLogger(__name__)
+
+# Flush attempts on shutdown before what is still pending is given up
+STOP_FLUSH_ATTEMPTS = 5
+
+# Flush attempts of a reader waiting for a chat's writes
+SYNC_FLUSH_ATTEMPTS = 3
+
+# Writes that can never succeed, e.g. the chat was deleted meanwhile
+PERMANENT_ERRORS = (IntegrityError, DataError)
+
+
+class ChatWriteBehindQueue:
+    """
+    In-process write-behind queue for chat writes.
+
+    Message inserts, chat file index rows and chat updates (e.g. titles;
+    activity timestamps go through `ChatTouchBuffer`) from concurrent
+    turns are buffered and committed together in a single transaction (group
+    commit), either when `chat_write_batch_size` writes are pending or every
+    `chat_write_flush_interval` seconds, whichever comes first.
+
+    When a commit fails, the writes are retried one by one. Writes failing
+    for a transient reason (e.g. a pool timeout) go back to the queue and are
+    retried with an exponential backoff from `chat_write_retry_delay` up to
+    `chat_write_retry_max_delay`, they stay pending until committed. Only
+    writes Postgres rejects for good (integrity or data errors) are dropped,
+    and the caches of their chats are invalidated.
+
+    Pending writes are flushed on shutdown, so only a crash can lose the
+    writes of the last flush interval. Readers that need their own writes
+    call `sync_chat` first, which flushes until the chat has no pending
+    writes, or fails the request.
+    """
+
+    def __init__(self):
+        self._messages: List[Dict[str, Any]] = []
+        self._chat_files: List[Dict[str, Any]] = []
+        self._chat_updates: Dict[str, Dict[str, Any]] = {}
+        self._pending: Counter[str] = Counter()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._failures = 0
+        self._retry_at = 0.0
+
+    async def start(self) -> None:
+        """Start the background flusher"""
+        if self._task is not None:
+            return  # Already running
+
+        self._task = asyncio.create_task(self._run())
+        logger.info("Chat write-behind queue started")
+
+    async def stop(self) -> None:
+        """Stop the background flusher and commit everything still pending"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        for _ in range(STOP_FLUSH_ATTEMPTS):
+            await self.flush()
+            if not self._pending:
+                break
+            await asyncio.sleep(self._retry_at - time.time())
+
+        if self._pending:
+            logger.error(
+                f"Chat write-behind queue stopped with writes of "
+                f"{len(self._pending)} chats not committed"
+            )
+        else:
+            logger.info("Chat write-behind queue stopped")
+
+    async def add_message(self, data: Dict[str, Any]) -> None:
+        """Queue a `ChatMessage` row, see `commit_chat_writes` for its keys"""
+        self._messages.append(data)
+        self._pending[data["chat_id"]] += 1
+        await self._after_add()
+
+    async def add_chat_files(self, chat_id: str, file_ids: List[str]) -> None:
+        """Queue `ChatUploadFile` index rows, duplicates are skipped on commit"""
+        self._chat_files.extend(
+            {"chat_id": chat_id, "upload_file_id": file_id} for file_id in file_ids
+        )
+        self._pending[chat_id] += len(file_ids)
+        await self._after_add()
+
+    async def update_chat(self, chat_id: str, data: Dict[str, Any]) -> None:
+        """Queue a `Chat` update, merged with any pending update of the same chat"""
+        if chat_id not in self._chat_updates:
+            self._pending[chat_id] += 1
+        self._chat_updates.setdefault(chat_id, {}).update(data)
+
+        await self._after_add()
+
+    def get_pending_chat_update(self, chat_id: str) -> Dict[str, Any]:
+        """Return the not yet committed update of a chat, if any"""
+        return dict(self._chat_updates.get(chat_id, {}))
+
+    async def sync_chat(self, chat_id: str) -> None:
+        """
+        Make sure every write queued for the chat is committed.
+
+        Raises:
+            HTTPException: If the writes are still failing, a read now
+                would miss them.
+        """
+        for attempt in range(SYNC_FLUSH_ATTEMPTS):
+            if self._pending[chat_id] <= 0:
+                return
+            if attempt:
+                await asyncio.sleep(get_settings().chat_write_retry_delay)
+            await self.flush()
+
+        if self._pending[chat_id] > 0:
+            raise HTTPException(503, "Chat writes not committed yet, retry later")
+
+    async def discard_chat(self, chat_id: str) -> None:
+        """Drop pending writes of a chat that is about to be deleted"""
+        async with self._flush_lock:
+            self._messages = [
+                msg for msg in self._messages if msg["chat_id"] != chat_id
+            ]
+            self._chat_files = [
+                row for row in self._chat_files if row["chat_id"] != chat_id
+            ]
+            self._chat_updates.pop(chat_id, None)
+            self._pending.pop(chat_id, None)
+
+    async def flush(self) -> None:
+        """Commit all pending writes in one transaction"""
+        async with self._flush_lock:
+            messages, self._messages = self._messages, []
+            chat_files, self._chat_files = self._chat_files, []
+            chat_updates, self._chat_updates = self._chat_updates, {}
+            if not messages and not chat_files and not chat_updates:
+                return
+
+            start_time = time.time()
+            try:
+                # Readers of these chats must not hit a lagging replica. It
+                # never raises, a Redis error isn't a reason to split the batch
+                await pin_to_primary(
+                    *{chat_scope(row["chat_id"]) for row in messages + chat_files},
+                    *[chat_scope(chat_id) for chat_id in chat_updates],
+                )
+            except asyncio.CancelledError:
+                self._put_back(messages, chat_files, chat_updates)
+                raise
+
+            try:
+                await commit_chat_writes(messages, chat_files, chat_updates)
+                failed: tuple[List, List, Dict] = ([], [], {})
+            except asyncio.CancelledError:
+                # Stopped mid-commit, the final flush retries them
+                self._put_back(messages, chat_files, chat_updates)
+                raise
+            except Exception as e:
+                logger.error(f"Group commit failed, retrying writes one by one: {e}")
+                failed = await self._commit_one_by_one(
+                    messages, chat_files, chat_updates
+                )
+
+            failed_messages, failed_chat_files, failed_updates = failed
+            failed_rows = {id(row) for row in failed_messages + failed_chat_files}
+            self._release(
+                [row for row in messages + chat_files if id(row) not in failed_rows],
+                [chat_id for chat_id in chat_updates if chat_id not in failed_updates],
+            )
+
+            if failed_messages or failed_chat_files or failed_updates:
+                self._requeue(failed_messages, failed_chat_files, failed_updates)
+            else:
+                self._failures = 0
+
+            chat_write_batch_histogram.observe(
+                len(messages) + len(chat_files) + len(chat_updates)
+            )
+            chat_write_flush_histogram.observe(time.time() - start_time)
+
+    def _release(self, rows: List[Dict[str, Any]], chat_ids: Iterable[str]) -> None:
+        # Committed or dropped, no longer pending
+        for row in rows:
+            self._pending[row["chat_id"]] -= 1
+        for chat_id in chat_ids:
+            self._pending[chat_id] -= 1
+        self._pending = +self._pending  # drop non-positive counts
+
+    def _put_back(
+        self,
+        messages: List[Dict[str, Any]],
+        chat_files: List[Dict[str, Any]],
+        chat_updates: Dict[str, Dict[str, Any]],
+    ) -> None:
+        # Ahead of newer writes, so they are committed in order
+        self._messages = messages + self._messages
+        self._chat_files = chat_files + self._chat_files
+        for chat_id, data in chat_updates.items():
+            if chat_id in self._chat_updates:
+                # Merged into the newer update, which is already counted
+                self._pending[chat_id] -= 1
+            self._chat_updates[chat_id] = {
+                **data,
+                **self._chat_updates.get(chat_id, {}),
+            }
+
+    def _requeue(
+        self,
+        messages: List[Dict[str, Any]],
+        chat_files: List[Dict[str, Any]],
+        chat_updates: Dict[str, Dict[str, Any]],
+    ) -> None:
+        """Put writes that failed back in the queue and back off"""
+        self._put_back(messages, chat_files, chat_updates)
+
+        settings = get_settings()
+        delay = min(
+            settings.chat_write_retry_delay * 2**self._failures,
+            settings.chat_write_retry_max_delay,
+        )
+        self._failures += 1
+        self._retry_at = time.time() + delay
+        logger.warning(
+            f"Requeued {len(messages) + len(chat_files) + len(chat_updates)} "
+            f"chat writes, retrying in {delay:.1f}s"
+        )
+
+    async def _after_add(self) -> None:
+        if self._task is None:
+            # No flusher (e.g. scripts), write through
+            await self.flush()
+        elif len(self._messages) + len(self._chat_files) + len(self._chat_updates) >= (
+            get_settings().chat_write_batch_size
+        ):
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            # Backing off after a failed commit
+            await asyncio.sleep(max(0.0, self._retry_at - time.time()))
+
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    timeout=get_settings().chat_write_flush_interval,
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Chat write-behind flush failed: {e}")
+
+    async def _commit_one_by_one(
+        self,
+        messages: List[Dict[str, Any]],
+        chat_files: List[Dict[str, Any]],
+        chat_updates: Dict[str, Dict[str, Any]],
+    ) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """Commit each write alone, returns the writes to retry"""
+        failed_messages: List[Dict[str, Any]] = []
+        failed_chat_files: List[Dict[str, Any]] = []
+        failed_updates: Dict[str, Dict[str, Any]] = {}
+        dropped: set[str] = set()
+
+        for msg in messages:
+            try:
+                await commit_chat_writes([msg], [], {})
+            except PERMANENT_ERRORS as e:
+                logger.error(f"Dropping chat message {msg['id']}: {e}")
+                dropped.add(msg["chat_id"])
+            except Exception:
+                failed_messages.append(msg)
+
+        for row in chat_files:
+            try:
+                await commit_chat_writes([], [row], {})
+            except PERMANENT_ERRORS as e:
+                logger.error(
+                    f"Dropping file {row['upload_file_id']} of chat {row['chat_id']}: {e}"
+                )
+                dropped.add(row["chat_id"])
+            except Exception:
+                failed_chat_files.append(row)
+
+        for chat_id, data in chat_updates.items():
+            try:
+                await commit_chat_writes([], [], {chat_id: data})
+            except PERMANENT_ERRORS as e:
+                logger.error(f"Dropping update of chat {chat_id}: {e}")
+                dropped.add(chat_id)
+            except Exception:
+                failed_updates[chat_id] = data
+
+        for chat_id in dropped:
+            await self._invalidate_dropped(chat_id)
+
+        return failed_messages, failed_chat_files, failed_updates
+
+    async def _invalidate_dropped(self, chat_id: str) -> None:
+        # The caches were updated when the writes were queued, they must not
+        # keep showing what never made it to Postgres
+        try:
+            await invalidate_messages(chat_id)
+            chat = await get_chat(chat_id)
+            if chat:
+                await invalidate_chat_index(chat.userId)
+        except Exception as e:
+            logger.error(f"Failed to invalidate caches of chat {chat_id}: {e}")
+
+
+# Global instance
+write_behind_queue = ChatWriteBehindQueue()
@@ -1,5 +1,6 @@
 from async_lru import alru_cache
 
+from config.settings_config import get_settings
 from db.prisma.generated.client import Prisma
 
 prisma = Prisma()
@@ -18,3 +19,29 @@ async def get_db():
         await prisma.connect()
     # Return the connected Prisma client
     return prisma
+
+
+@alru_cache()
+async def get_replica_db():
+    """
+    Asynchronously retrieves a Prisma client for the read replica.
+
+    Falls back to the primary client when no replica is configured. Only use
+    it for reads that tolerate replication lag, see `core.read_routing`.
+    """
+    replica_url = get_settings().postgres_replica_url
+    if not replica_url:
+        return await get_db()
+
+    replica = Prisma(datasource={"url": replica_url})
+    await replica.connect()
+    return replica
+
+
+async def disconnect_replica_db() -> None:
+    """Disconnects the replica client if it was connected"""
+    if get_replica_db.cache_info().currsize:
+        replica = await get_replica_db()
+        if replica is not prisma and replica.is_connected():
+            await replica.disconnect()
+        get_replica_db.cache_clear()
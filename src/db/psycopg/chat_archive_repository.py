@@ -0,0 +1,156 @@
+"""
+Moves the messages of inactive chats to `ChatArchive` and back.
+
+Both directions lock the chat row first, so an archival can't race with the
+rehydration of the same chat.
+"""
+
+import json
+import zlib
+from typing import Any, Dict, List
+
+from psycopg.types.json import Jsonb
+
+from db.psycopg.utils import get_pool
+
+# Skips chats that became active since they were selected for archival
+LOCK_INACTIVE_CHAT_QUERY = """
+SELECT id FROM "Chat"
+WHERE id = %(chat_id)s AND timestamp < %(cutoff)s AND NOT "isArchived"
+FOR UPDATE
+"""
+
+LOCK_ARCHIVED_CHAT_QUERY = """
+SELECT id FROM "Chat" WHERE id = %(chat_id)s AND "isArchived" FOR UPDATE
+"""
+
+ARCHIVED_MESSAGES_QUERY = """
+SELECT
+    m.id, m.content, m.role, m.agent, m.timestamp, m."groupId" AS group_id,
+    m."createdAt" AS created_at, m."updatedAt" AS updated_at,
+    COALESCE(
+        array_agg(j."B") FILTER (WHERE j."B" IS NOT NULL), '{}'
+    ) AS upload_file_ids
+FROM "ChatMessage" m
+LEFT JOIN "_ChatMessageToUploadFile" j ON j."A" = m.id
+WHERE m."chatId" = %(chat_id)s
+GROUP BY m.id
+"""
+
+INSERT_ARCHIVE_QUERY = """
+INSERT INTO "ChatArchive" ("chatId", data, "messageCount")
+VALUES (%(chat_id)s, %(data)s, %(message_count)s)
+"""
+
+# Links to upload files go with the messages through the cascade
+DELETE_MESSAGES_QUERY = """
+DELETE FROM "ChatMessage" WHERE "chatId" = %(chat_id)s AND id = ANY(%(ids)s)
+"""
+
+DELETE_ARCHIVE_QUERY = """
+DELETE FROM "ChatArchive" WHERE "chatId" = %(chat_id)s RETURNING data
+"""
+
+SET_ARCHIVED_QUERY = """
+UPDATE "Chat" SET "isArchived" = %(archived)s WHERE id = %(chat_id)s
+"""
+
+# Messages written while the chat was archived are kept as they are
+RESTORE_MESSAGE_QUERY = """
+INSERT INTO "ChatMessage" (
+    id, "chatId", content, role, agent, timestamp, "groupId",
+    "createdAt", "updatedAt"
+)
+VALUES (
+    %(id)s, %(chat_id)s, %(content)s, %(role)s::"Role", %(agent)s,
+    %(timestamp)s, %(group_id)s, %(created_at)s::timestamp,
+    %(updated_at)s::timestamp
+)
+ON CONFLICT (id) DO NOTHING
+"""
+
+# Files deleted since the archival are skipped
+RESTORE_MESSAGE_FILE_QUERY = """
+INSERT INTO "_ChatMessageToUploadFile" ("A", "B")
+SELECT %(message_id)s, id FROM "UploadFile" WHERE id = %(upload_file_id)s
+ON CONFLICT DO NOTHING
+"""
+
+
+async def archive_chat(chat_id: str, cutoff: float) -> int:
+    """
+    Move the messages of a chat inactive since `cutoff` to its archive.
+    Returns the number of archived messages, 0 when the chat was skipped.
+    """
+    pool = await get_pool()
+
+    async with pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+        await cur.execute(
+            LOCK_INACTIVE_CHAT_QUERY, {"chat_id": chat_id, "cutoff": cutoff}
+        )
+        if not await cur.fetchone():
+            return 0
+
+        await cur.execute(ARCHIVED_MESSAGES_QUERY, {"chat_id": chat_id})
+        messages = await cur.fetchall()
+        if not messages:
+            return 0
+
+        data = zlib.compress(json.dumps(messages, default=str).encode())
+        await cur.execute(
+            INSERT_ARCHIVE_QUERY,
+            {"chat_id": chat_id, "data": data, "message_count": len(messages)},
+        )
+        await cur.execute(
+            DELETE_MESSAGES_QUERY,
+            {"chat_id": chat_id, "ids": [msg["id"] for msg in messages]},
+        )
+        await cur.execute(SET_ARCHIVED_QUERY, {"chat_id": chat_id, "archived": True})
+
+    return len(messages)
+
+
+async def restore_chat(chat_id: str) -> int:
+    """
+    Move the archived messages of a chat back to `ChatMessage`. Returns the
+    number of restored messages, 0 when the chat wasn't archived (anymore).
+    """
+    pool = await get_pool()
+
+    async with pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+        await cur.execute(LOCK_ARCHIVED_CHAT_QUERY, {"chat_id": chat_id})
+        if not await cur.fetchone():
+            return 0
+
+        await cur.execute(DELETE_ARCHIVE_QUERY, {"chat_id": chat_id})
+        archive = await cur.fetchone()
+
+        messages: List[Dict[str, Any]] = []
+        if archive:
+            messages = json.loads(zlib.decompress(archive["data"]))
+
+        if messages:
+            await cur.executemany(
+                RESTORE_MESSAGE_QUERY,
+                [
+                    {
+                        **msg,
+                        "chat_id": chat_id,
+                        "content": Jsonb(msg["content"]),
+                        "agent": Jsonb(msg["agent"]) if msg["agent"] else None,
+                    }
+                    for msg in messages
+                ],
+            )
+
+            message_files = [
+                {"message_id": msg["id"], "upload_file_id": file_id}
+                for msg in messages
+                for file_id in msg["upload_file_ids"]
+            ]
+            if message_files:
+                await cur.executemany(RESTORE_MESSAGE_FILE_QUERY, message_files)
+
+        await cur.execute(SET_ARCHIVED_QUERY, {"chat_id": chat_id, "archived": False})
+
+    return len(messages)
@@ -0,0 +1,272 @@
+"""
+Bulk export and import of a user's chats as flat records.
+
+The export streams every table through server-side cursors within one
+snapshot, so memory stays constant whatever the history size. The import
+COPYs records into temporary staging tables in batches and inserts them from
+there, skipping rows that already exist, so a backup can be restored twice.
+"""
+
+import json
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List
+
+from psycopg import AsyncCursor
+from psycopg.types.json import Jsonb
+
+from db.psycopg.utils import get_pool
+
+# Rows fetched per round trip by the server-side cursors
+FETCH_SIZE = 1000
+
+# Records staged per type before they are inserted
+IMPORT_BATCH_SIZE = 5000
+
+# Record type, then the query streaming it. Parents come before children, so
+# an import can insert them in the same order.
+EXPORT_QUERIES = [
+    (
+        "upload_file",
+        """
+        SELECT id, filename, description,
+            "createdAt" AS created_at, "updatedAt" AS updated_at
+        FROM "UploadFile" WHERE "userId" = %(user_id)s
+        ORDER BY id
+        """,
+    ),
+    (
+        "chat",
+        """
+        SELECT id, title, "isTitleSet" AS is_title_set, timestamp,
+            "createdAt" AS created_at, "updatedAt" AS updated_at
+        FROM "Chat" WHERE "userId" = %(user_id)s
+        ORDER BY id
+        """,
+    ),
+    (
+        "chat_file",
+        """
+        SELECT cf."chatId" AS chat_id, cf."uploadFileId" AS upload_file_id,
+            cf."createdAt" AS created_at
+        FROM "ChatUploadFile" cf
+        JOIN "Chat" c ON c.id = cf."chatId"
+        WHERE c."userId" = %(user_id)s
+        ORDER BY cf."chatId", cf."uploadFileId"
+        """,
+    ),
+    (
+        "message",
+        """
+        SELECT m.id, m."chatId" AS chat_id, m.content, m.role, m.agent,
+            m.timestamp, m."groupId" AS group_id,
+            m."createdAt" AS created_at, m."updatedAt" AS updated_at,
+            ARRAY(
+                SELECT j."B" FROM "_ChatMessageToUploadFile" j WHERE j."A" = m.id
+            ) AS upload_file_ids
+        FROM "ChatMessage" m
+        JOIN "Chat" c ON c.id = m."chatId"
+        WHERE c."userId" = %(user_id)s
+        ORDER BY m."chatId", m.timestamp, m.id
+        """,
+    ),
+]
+
+# Archived messages are exported like live ones, one archive in memory at once
+ARCHIVES_QUERY = """
+SELECT a."chatId" AS chat_id, a.data
+FROM "ChatArchive" a
+JOIN "Chat" c ON c.id = a."chatId"
+WHERE c."userId" = %(user_id)s
+ORDER BY a."chatId"
+"""
+
+# Record type, staging table, its columns and the insert from staging
+IMPORT_TABLES: Dict[str, tuple[str, List[str], str]] = {
+    "upload_file": (
+        "import_upload_file",
+        ["id", "filename", "description", "created_at", "updated_at"],
+        """
+        INSERT INTO "UploadFile"
+            (id, filename, description, "userId", "createdAt", "updatedAt")
+        SELECT id, filename, description, %(user_id)s, created_at, updated_at
+        FROM import_upload_file
+        ON CONFLICT DO NOTHING
+        """,
+    ),
+    "chat": (
+        "import_chat",
+        ["id", "title", "is_title_set", "timestamp", "created_at", "updated_at"],
+        """
+        INSERT INTO "Chat"
+            (id, title, "isTitleSet", timestamp, "userId", "createdAt", "updatedAt")
+        SELECT id, title, is_title_set, timestamp, %(user_id)s, created_at, updated_at
+        FROM import_chat
+        ON CONFLICT DO NOTHING
+        """,
+    ),
+    "chat_file": (
+        "import_chat_file",
+        ["chat_id", "upload_file_id", "created_at"],
+        """
+        INSERT INTO "ChatUploadFile" ("chatId", "uploadFileId", "createdAt")
+        SELECT s.chat_id, s.upload_file_id, s.created_at
+        FROM import_chat_file s
+        JOIN "Chat" c ON c.id = s.chat_id AND c."userId" = %(user_id)s
+        JOIN "UploadFile" u ON u.id = s.upload_file_id AND u."userId" = %(user_id)s
+        ON CONFLICT DO NOTHING
+        """,
+    ),
+    "message": (
+        "import_message",
+        [
+            "id",
+            "chat_id",
+            "content",
+            "role",
+            "agent",
+            "timestamp",
+            "group_id",
+            "created_at",
+            "updated_at",
+        ],
+        """
+        INSERT INTO "ChatMessage" (
+            id, "chatId", content, role, agent, timestamp, "groupId",
+            "createdAt", "updatedAt"
+        )
+        SELECT s.id, s.chat_id, s.content, s.role::"Role", s.agent, s.timestamp,
+            s.group_id, s.created_at, s.updated_at
+        FROM import_message s
+        JOIN "Chat" c ON c.id = s.chat_id AND c."userId" = %(user_id)s
+        ON CONFLICT DO NOTHING
+        """,
+    ),
+    "message_file": (
+        "import_message_file",
+        ["message_id", "upload_file_id"],
+        """
+        INSERT INTO "_ChatMessageToUploadFile" ("A", "B")
+        SELECT s.message_id, s.upload_file_id
+        FROM import_message_file s
+        JOIN "ChatMessage" m ON m.id = s.message_id
+        JOIN "Chat" c ON c.id = m."chatId" AND c."userId" = %(user_id)s
+        JOIN "UploadFile" u ON u.id = s.upload_file_id AND u."userId" = %(user_id)s
+        ON CONFLICT DO NOTHING
+        """,
+    ),
+}
+
+CREATE_STAGING_QUERIES = [
+    """
+    CREATE TEMP TABLE import_upload_file (
+        id text, filename text, description text,
+        created_at timestamp(3), updated_at timestamp(3)
+    ) ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE import_chat (
+        id text, title text, is_title_set boolean, timestamp float8,
+        created_at timestamp(3), updated_at timestamp(3)
+    ) ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE import_chat_file (
+        chat_id text, upload_file_id text, created_at timestamp(3)
+    ) ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE import_message (
+        id text, chat_id text, content jsonb, role text, agent jsonb,
+        timestamp float8, group_id text,
+        created_at timestamp(3), updated_at timestamp(3)
+    ) ON COMMIT DROP
+    """,
+    """
+    CREATE TEMP TABLE import_message_file (
+        message_id text, upload_file_id text
+    ) ON COMMIT DROP
+    """,
+]
+
+
+async def iter_user_records(user_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """Yield every record of the user's chats, each with its "type" """
+    pool = await get_pool()
+    params = {"user_id": user_id}
+
+    async with pool.connection() as conn, conn.transaction():
+        # One snapshot for every table, so the records are consistent
+        await conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+
+        for record_type, query in EXPORT_QUERIES:
+            async with conn.cursor(name=f"export_{record_type}") as cur:
+                cur.itersize = FETCH_SIZE
+                await cur.execute(query, params)
+                async for row in cur:
+                    yield {"type": record_type, **row}
+
+        async with conn.cursor(name="export_archive") as cur:
+            cur.itersize = 1  # Each archive holds a whole chat
+            await cur.execute(ARCHIVES_QUERY, params)
+            async for archive in cur:
+                for msg in json.loads(zlib.decompress(archive["data"])):
+                    yield {"type": "message", "chat_id": archive["chat_id"], **msg}
+
+
+async def _flush(
+    cur: AsyncCursor, staged: Dict[str, List[tuple]], user_id: str
+) -> None:
+    # Parents first, the order of IMPORT_TABLES
+    for record_type, (table, columns, insert_query) in IMPORT_TABLES.items():
+        rows = staged[record_type]
+        if not rows:
+            continue
+
+        async with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                await copy.write_row(row)
+
+        await cur.execute(insert_query, {"user_id": user_id})
+        await cur.execute(f"TRUNCATE {table}")
+        rows.clear()
+
+
+async def import_user_records(
+    user_id: str, records: AsyncIterable[Dict[str, Any]]
+) -> Dict[str, int]:
+    """
+    Import exported records into the user's account in one transaction.
+    Returns the number of records read per type.
+    """
+    pool = await get_pool()
+
+    staged: Dict[str, List[tuple]] = {record_type: [] for record_type in IMPORT_TABLES}
+    counts: Dict[str, int] = {record_type: 0 for record_type in IMPORT_TABLES}
+
+    async with pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+        for query in CREATE_STAGING_QUERIES:
+            await cur.execute(query)
+
+        async for record in records:
+            record_type = record.get("type")
+            if record_type not in IMPORT_TABLES or record_type == "message_file":
+                raise ValueError(f"Unknown record type: {record_type}")
+
+            _, columns, _ = IMPORT_TABLES[record_type]
+            row = {**record}
+            if record_type == "message":
+                row["content"] = Jsonb(row["content"])
+                row["agent"] = Jsonb(row["agent"]) if row.get("agent") else None
+                staged["message_file"].extend(
+                    (row["id"], file_id) for file_id in row.get("upload_file_ids", [])
+                )
+            staged[record_type].append(tuple(row.get(column) for column in columns))
+            counts[record_type] += 1
+
+            if any(len(rows) >= IMPORT_BATCH_SIZE for rows in staged.values()):
+                await _flush(cur, staged, user_id)
+
+        await _flush(cur, staged, user_id)
+
+    del counts["message_file"]
+    return counts
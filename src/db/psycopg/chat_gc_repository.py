@@ -0,0 +1,99 @@
+"""
+Batched deletes of what LangGraph keeps for a chat outside of Prisma's tables:
+checkpoints of the chat's thread and memories in the chat's store namespace.
+"""
+
+from typing import Dict, List
+
+from psycopg import sql
+
+from db.psycopg.utils import get_pool
+
+# Children before parents, so a crash mid-way never leaves a checkpoint whose
+# blobs are already gone
+CHECKPOINT_TABLES = ("checkpoint_writes", "checkpoint_blobs", "checkpoints")
+
+# One bounded batch per statement keeps each delete's locks and WAL short
+DELETE_BATCH_QUERY = """
+DELETE FROM {table}
+WHERE ctid = ANY(ARRAY(
+    SELECT ctid FROM {table} WHERE {column} = ANY(%(values)s) LIMIT %(limit)s
+))
+"""
+
+# Threads of LangGraph are chat ids
+ORPHAN_THREADS_QUERY = """
+SELECT DISTINCT t.thread_id FROM {table} t
+WHERE NOT EXISTS (SELECT 1 FROM "Chat" c WHERE c.id = t.thread_id)
+ORDER BY t.thread_id
+LIMIT %(limit)s
+"""
+
+# Memory namespaces are "memories.<user_id>.<chat_id>"
+ORPHAN_MEMORY_PREFIXES_QUERY = """
+SELECT DISTINCT s.prefix FROM store s
+WHERE s.prefix LIKE 'memories.%%.%%'
+AND NOT EXISTS (
+    SELECT 1 FROM "Chat" c WHERE c.id = split_part(s.prefix, '.', 3)
+)
+ORDER BY s.prefix
+LIMIT %(limit)s
+"""
+
+
+def memory_prefix(user_id: str, chat_id: str) -> str:
+    # Namespace ("memories", user_id, chat_id) as stored by AsyncPostgresStore
+    return f"memories.{user_id}.{chat_id}"
+
+
+async def _delete_in_batches(
+    table: str, column: str, values: List[str], batch_size: int
+) -> int:
+    pool = await get_pool()
+    query = sql.SQL(DELETE_BATCH_QUERY).format(
+        table=sql.Identifier(table), column=sql.Identifier(column)
+    )
+
+    deleted = 0
+    async with pool.connection() as conn:
+        while True:
+            cur = await conn.execute(query, {"values": values, "limit": batch_size})
+            deleted += cur.rowcount
+            if cur.rowcount < batch_size:
+                return deleted
+
+
+async def delete_checkpoints(thread_ids: List[str], batch_size: int) -> Dict[str, int]:
+    """Delete every checkpoint row of the threads, returns counts per table"""
+    return {
+        table: await _delete_in_batches(table, "thread_id", thread_ids, batch_size)
+        for table in CHECKPOINT_TABLES
+    }
+
+
+async def delete_memories(prefixes: List[str], batch_size: int) -> int:
+    """Delete store items of the namespaces, their vectors cascade"""
+    return await _delete_in_batches("store", "prefix", prefixes, batch_size)
+
+
+async def find_orphan_thread_ids(limit: int) -> List[str]:
+    pool = await get_pool()
+
+    thread_ids: set[str] = set()
+    async with pool.connection() as conn:
+        for table in CHECKPOINT_TABLES:
+            cur = await conn.execute(
+                sql.SQL(ORPHAN_THREADS_QUERY).format(table=sql.Identifier(table)),
+                {"limit": limit},
+            )
+            thread_ids.update(row["thread_id"] for row in await cur.fetchall())
+
+    return sorted(thread_ids)
+
+
+async def find_orphan_memory_prefixes(limit: int) -> List[str]:
+    pool = await get_pool()
+
+    async with pool.connection() as conn:
+        cur = await conn.execute(ORPHAN_MEMORY_PREFIXES_QUERY, {"limit": limit})
+        return [row["prefix"] for row in await cur.fetchall()]
@@ -0,0 +1,332 @@
+"""
+Hand-written SQL for the chat hot paths, run on the psycopg pool.
+
+Prisma stays the owner of the schema and migrations and serves every other
+query. These statements target the tables it generates, so column names
+follow `prisma/schema.prisma`.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from psycopg import sql
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool
+
+from db.prisma.generated.models import Chat
+from db.psycopg.utils import get_pool
+
+CHAT_COLUMNS = (
+    'id, title, "isTitleSet", "isArchived", timestamp, "userId", "createdAt", '
+    '"updatedAt"'
+)
+
+SELECT_CHAT_QUERY = f'SELECT {CHAT_COLUMNS} FROM "Chat" WHERE id = %(id)s'
+
+SELECT_USER_CHAT_QUERY = (
+    f'SELECT {CHAT_COLUMNS} FROM "Chat" WHERE id = %(id)s AND "userId" = %(user_id)s'
+)
+
+INSERT_CHAT_QUERY = f"""
+INSERT INTO "Chat" (id, title, timestamp, "userId", "updatedAt")
+VALUES (%(id)s, %(title)s, %(timestamp)s, %(user_id)s, NOW())
+RETURNING {CHAT_COLUMNS}
+"""
+
+INSERT_MESSAGE_QUERY = """
+INSERT INTO "ChatMessage"
+    (id, "chatId", content, role, agent, timestamp, "groupId", "updatedAt")
+VALUES (
+    %(id)s, %(chat_id)s, %(content)s, %(role)s::"Role", %(agent)s,
+    %(timestamp)s, %(group_id)s, NOW()
+)
+ON CONFLICT (id) DO NOTHING
+"""
+
+# Prisma's implicit many-to-many table: "A" is the message, "B" the file
+INSERT_MESSAGE_FILE_QUERY = """
+INSERT INTO "_ChatMessageToUploadFile" ("A", "B")
+VALUES (%(message_id)s, %(upload_file_id)s)
+ON CONFLICT DO NOTHING
+"""
+
+INSERT_CHAT_FILE_QUERY = """
+INSERT INTO "ChatUploadFile" ("chatId", "uploadFileId")
+VALUES (%(chat_id)s, %(upload_file_id)s)
+ON CONFLICT DO NOTHING
+"""
+
+# A page of history with the upload files of each message in one statement.
+# The total is an uncorrelated subquery, so Postgres computes it once.
+# Thinking messages (system role) are cut to their first line, with the
+# length of the full content so clients can tell what they're missing
+THINKING_STUB_COLUMNS = """
+    CASE WHEN m.role = 'system' AND jsonb_typeof(m.content) = 'string'
+        THEN to_jsonb(split_part(btrim(m.content #>> '{}', E' \\n'), E'\\n', 1))
+        ELSE m.content
+    END AS content,
+    CASE WHEN m.role = 'system' AND jsonb_typeof(m.content) = 'string'
+        THEN length(m.content #>> '{}')
+    END AS content_length"""
+
+MESSAGES_PAGE_QUERY = """
+SELECT
+    m.id, {content}, m.role, m.agent, m.timestamp,
+    m."chatId" AS chat_id, m."groupId" AS group_id,
+    COALESCE(f.files, '[]'::json) AS upload_files
+    {total}
+FROM "ChatMessage" m
+LEFT JOIN LATERAL (
+    SELECT json_agg(
+        json_build_object(
+            'id', u.id, 'filename', u.filename, 'description', u.description
+        )
+    ) AS files
+    FROM "_ChatMessageToUploadFile" j
+    JOIN "UploadFile" u ON u.id = j."B"
+    WHERE j."A" = m.id
+) f ON TRUE
+WHERE m."chatId" = %(chat_id)s {keyset}
+ORDER BY m.timestamp DESC, m.id DESC
+LIMIT %(limit)s
+"""
+
+FIRST_PAGE_TOTAL = (
+    ', (SELECT count(*) FROM "ChatMessage" WHERE "chatId" = %(chat_id)s) AS total'
+)
+
+NEXT_PAGE_KEYSET = "AND (m.timestamp, m.id) < (%(timestamp)s::float8, %(id)s)"
+
+# Keyed by (next page, thinking stubs)
+MESSAGES_PAGE_QUERIES = {
+    (is_next, stub_thinking): MESSAGES_PAGE_QUERY.format(
+        content=THINKING_STUB_COLUMNS if stub_thinking else "m.content",
+        total="" if is_next else FIRST_PAGE_TOTAL,
+        keyset=NEXT_PAGE_KEYSET if is_next else "",
+    )
+    for is_next in (False, True)
+    for stub_thinking in (False, True)
+}
+
+MESSAGE_QUERY = MESSAGES_PAGE_QUERY.format(
+    content="m.content", total="", keyset="AND m.id = %(id)s"
+)
+
+# Ranks every match of the user's chats, but only builds the snippets of the
+# returned page. The keyset is (rank, id), both descending. Snippets are HTML:
+# the content is escaped before the matches are wrapped in <mark>.
+SEARCH_MESSAGES_QUERY = """
+WITH q AS (SELECT websearch_to_tsquery('simple', %(query)s) AS query),
+hits AS (
+    SELECT
+        m.id, m."chatId", m.role, m.timestamp, m.content,
+        ts_rank(m."contentSearch", q.query) AS rank
+    FROM "ChatMessage" m
+    JOIN "Chat" c ON c.id = m."chatId"
+    CROSS JOIN q
+    WHERE c."userId" = %(user_id)s
+    AND m."contentSearch" @@ q.query
+    AND m.role IN ('user', 'assistant')
+),
+page AS (
+    SELECT * FROM hits
+    WHERE %(rank)s::real IS NULL OR (rank, id) < (%(rank)s::real, %(id)s)
+    ORDER BY rank DESC, id DESC
+    LIMIT %(limit)s
+)
+SELECT
+    p.id, p."chatId" AS chat_id, c.title AS chat_title, p.role, p.timestamp,
+    p.rank,
+    ts_headline(
+        'simple',
+        replace(replace(replace(
+            p.content #>> '{}', '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+        q.query,
+        'MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<mark>, StopSel=</mark>'
+    ) AS snippet
+FROM page p
+JOIN "Chat" c ON c.id = p."chatId"
+CROSS JOIN q
+ORDER BY p.rank DESC, p.id DESC
+"""
+
+ASKED_FILES_QUERY = """
+SELECT u.id, u.filename, u.description
+FROM "ChatUploadFile" cf
+JOIN "UploadFile" u ON u.id = cf."uploadFileId"
+WHERE cf."chatId" = %(chat_id)s
+ORDER BY cf."createdAt"
+"""
+
+
+async def get_chat(
+    chat_id: str,
+    user_id: Optional[str] = None,
+    pool: Optional[AsyncConnectionPool] = None,
+) -> Optional[Chat]:
+    pool = pool or await get_pool()
+
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            SELECT_USER_CHAT_QUERY if user_id else SELECT_CHAT_QUERY,
+            {"id": chat_id, "user_id": user_id},
+        )
+        row = await cur.fetchone()
+
+    return Chat(**row) if row else None
+
+
+async def create_chat(chat_id: str, user_id: str, title: str, timestamp: float) -> Chat:
+    pool = await get_pool()
+
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            INSERT_CHAT_QUERY,
+            {
+                "id": chat_id,
+                "user_id": user_id,
+                "title": title,
+                "timestamp": timestamp,
+            },
+        )
+        row = await cur.fetchone()
+
+    return Chat(**row)  # type: ignore
+
+
+async def commit_chat_writes(
+    messages: List[Dict[str, Any]],
+    chat_files: List[Dict[str, Any]],
+    chat_updates: Dict[str, Dict[str, Any]],
+) -> None:
+    """
+    Write messages, chat file index rows and chat updates in one transaction.
+
+    Messages are dicts with id, chat_id, content, role, agent, timestamp,
+    group_id and upload_file_ids. Chat updates map a chat id to the `Chat`
+    columns to set. Rows that already exist are skipped, so a retried commit
+    is harmless.
+    """
+    pool = await get_pool()
+
+    async with pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+        if messages:
+            await cur.executemany(
+                INSERT_MESSAGE_QUERY,
+                [
+                    {
+                        **msg,
+                        "content": Jsonb(msg["content"]),
+                        "agent": Jsonb(msg["agent"]) if msg["agent"] else None,
+                    }
+                    for msg in messages
+                ],
+            )
+
+            message_files = [
+                {"message_id": msg["id"], "upload_file_id": file_id}
+                for msg in messages
+                for file_id in msg["upload_file_ids"]
+            ]
+            if message_files:
+                await cur.executemany(INSERT_MESSAGE_FILE_QUERY, message_files)
+
+        if chat_files:
+            await cur.executemany(INSERT_CHAT_FILE_QUERY, chat_files)
+
+        for chat_id, data in chat_updates.items():
+            await cur.execute(
+                sql.SQL(
+                    'UPDATE "Chat" SET {}, "updatedAt" = NOW() WHERE id = %(id)s'
+                ).format(
+                    sql.SQL(", ").join(
+                        sql.SQL("{} = {}").format(
+                            sql.Identifier(column), sql.Placeholder(column)
+                        )
+                        for column in data
+                    )
+                ),
+                {**data, "id": chat_id},
+            )
+
+
+async def get_messages_page(
+    chat_id: str,
+    limit: int,
+    after: Optional[tuple[float, str]] = None,
+    pool: Optional[AsyncConnectionPool] = None,
+    stub_thinking: bool = False,
+) -> tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    Return up to `limit` messages, newest first, older than the `after`
+    (timestamp, id) keyset if given. The total count is only computed for the
+    first page. With `stub_thinking`, thinking messages only carry their first
+    line and `content_length`.
+    """
+    pool = pool or await get_pool()
+
+    params: Dict[str, Any] = {"chat_id": chat_id, "limit": limit}
+    if after:
+        params["timestamp"], params["id"] = after
+
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            MESSAGES_PAGE_QUERIES[(after is not None, stub_thinking)], params
+        )
+        rows = await cur.fetchall()
+
+    total = None
+    if not after:
+        total = rows[0].pop("total") if rows else 0
+        for row in rows[1:]:
+            row.pop("total")
+
+    return rows, total
+
+
+async def get_message(
+    chat_id: str, message_id: str, pool: Optional[AsyncConnectionPool] = None
+) -> Optional[Dict[str, Any]]:
+    """Return one message of the chat with its full content"""
+    pool = pool or await get_pool()
+
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            MESSAGE_QUERY, {"chat_id": chat_id, "id": message_id, "limit": 1}
+        )
+        return await cur.fetchone()
+
+
+async def search_messages(
+    user_id: str,
+    query: str,
+    limit: int,
+    after: Optional[tuple[float, str]] = None,
+    pool: Optional[AsyncConnectionPool] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Return up to `limit` messages of the user's chats matching a web-style
+    query, best first, after the `after` (rank, id) keyset if given.
+    """
+    pool = pool or await get_pool()
+
+    rank, last_id = after or (None, None)
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            SEARCH_MESSAGES_QUERY,
+            {
+                "user_id": user_id,
+                "query": query,
+                "limit": limit,
+                "rank": rank,
+                "id": last_id,
+            },
+        )
+        return await cur.fetchall()
+
+
+async def get_asked_files(chat_id: str) -> List[Dict[str, Any]]:
+    pool = await get_pool()
+
+    async with pool.connection() as conn:
+        cur = await conn.execute(ASKED_FILES_QUERY, {"chat_id": chat_id})
+        return await cur.fetchall()
@@ -0,0 +1,186 @@
+"""
+Retention of LangGraph checkpoints: what `AsyncPostgresSaver` keeps for a
+thread beyond the checkpoints still needed to resume it.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from psycopg import Rollback
+
+from db.psycopg.chat_gc_repository import CHECKPOINT_TABLES
+from db.psycopg.utils import get_pool
+
+# Serializes compactions of a thread, e.g. the CLI and a worker
+LOCK_THREAD_QUERY = "SELECT pg_advisory_xact_lock(hashtext(%(thread_id)s))"
+
+# Keeps the latest `keep` checkpoints of the thread's root namespace. A
+# subgraph namespace (a sub-agent run) keeps only its latest checkpoint, and
+# only while it is newer than the root's latest one, i.e. the sub-agent is
+# still pending (e.g. interrupted for a confirmation). Checkpoint ids are
+# time-ordered, so they compare like their creation time.
+DELETE_CHECKPOINTS_QUERY = """
+WITH ranked AS (
+    SELECT
+        checkpoint_ns, checkpoint_id,
+        row_number() OVER (
+            PARTITION BY checkpoint_ns ORDER BY checkpoint_id DESC
+        ) AS rank
+    FROM checkpoints
+    WHERE thread_id = %(thread_id)s
+),
+root AS (
+    SELECT max(checkpoint_id) AS latest_id FROM checkpoints
+    WHERE thread_id = %(thread_id)s AND checkpoint_ns = ''
+)
+DELETE FROM checkpoints c
+USING ranked r, root
+WHERE c.thread_id = %(thread_id)s
+AND c.checkpoint_ns = r.checkpoint_ns
+AND c.checkpoint_id = r.checkpoint_id
+AND (
+    (r.checkpoint_ns = '' AND r.rank > %(keep)s)
+    OR (r.checkpoint_ns <> '' AND (r.rank > 1 OR r.checkpoint_id < root.latest_id))
+)
+RETURNING
+    c.checkpoint_ns, c.checkpoint_id,
+    c.checkpoint -> 'channel_versions' AS channel_versions
+"""
+
+# Pending writes of deleted checkpoints
+DELETE_WRITES_QUERY = """
+DELETE FROM checkpoint_writes w
+USING unnest(%(namespaces)s::text[], %(checkpoint_ids)s::text[])
+    AS d(checkpoint_ns, checkpoint_id)
+WHERE w.thread_id = %(thread_id)s
+AND w.checkpoint_ns = d.checkpoint_ns
+AND w.checkpoint_id = d.checkpoint_id
+"""
+
+# Channel values older than any kept checkpoint refers to. A put writes its
+# blobs before its checkpoint row, so blobs no checkpoint refers to yet may
+# belong to a turn running right now. Versions only grow, so such blobs are
+# always newer than what the kept checkpoints refer to, and are kept. A
+# namespace left without checkpoints only loses the versions its deleted
+# checkpoints referred to. Versions are zero-padded, so they compare as text.
+DELETE_BLOBS_QUERY = """
+WITH kept AS (
+    SELECT c.checkpoint_ns, v.key AS channel, min(v.value) AS min_version
+    FROM checkpoints c
+    CROSS JOIN LATERAL jsonb_each_text(c.checkpoint -> 'channel_versions') v
+    WHERE c.thread_id = %(thread_id)s
+    GROUP BY c.checkpoint_ns, v.key
+),
+deleted AS (
+    SELECT * FROM unnest(
+        %(namespaces)s::text[], %(channels)s::text[], %(versions)s::text[]
+    ) AS d(checkpoint_ns, channel, max_version)
+)
+DELETE FROM checkpoint_blobs b
+WHERE b.thread_id = %(thread_id)s
+AND (
+    EXISTS (
+        SELECT 1 FROM kept k
+        WHERE k.checkpoint_ns = b.checkpoint_ns AND k.channel = b.channel
+        AND b.version < k.min_version
+    )
+    OR (
+        NOT EXISTS (
+            SELECT 1 FROM kept k
+            WHERE k.checkpoint_ns = b.checkpoint_ns AND k.channel = b.channel
+        )
+        AND EXISTS (
+            SELECT 1 FROM deleted d
+            WHERE d.checkpoint_ns = b.checkpoint_ns AND d.channel = b.channel
+            AND b.version <= d.max_version
+        )
+    )
+)
+"""
+
+THREAD_IDS_QUERY = """
+SELECT DISTINCT thread_id FROM checkpoints
+WHERE %(after)s::text IS NULL OR thread_id > %(after)s
+ORDER BY thread_id
+LIMIT %(limit)s
+"""
+
+TABLE_SIZES_QUERY = """
+SELECT relname AS name, pg_total_relation_size(oid) AS bytes
+FROM pg_class
+WHERE relname = ANY(%(tables)s) AND relkind = 'r'
+"""
+
+
+async def compact_thread(
+    thread_id: str, keep: int, is_idle: Callable[[], Awaitable[bool]]
+) -> Optional[Dict[str, int]]:
+    """
+    Apply the retention to one thread, returns deleted rows per table.
+    `is_idle` is checked before the deletes commit, they're rolled back and
+    None is returned if the thread became active meanwhile.
+    """
+    pool = await get_pool()
+    params: Dict[str, Any] = {"thread_id": thread_id, "keep": keep}
+
+    async with pool.connection() as conn:
+        async with conn.transaction(), conn.cursor() as cur:
+            await cur.execute(LOCK_THREAD_QUERY, params)
+
+            await cur.execute(DELETE_CHECKPOINTS_QUERY, params)
+            deleted = await cur.fetchall()
+
+            max_versions: Dict[tuple[str, str], str] = {}
+            for row in deleted:
+                for channel, version in (row["channel_versions"] or {}).items():
+                    key = (row["checkpoint_ns"], channel)
+                    max_versions[key] = max(max_versions.get(key, ""), str(version))
+
+            await cur.execute(
+                DELETE_WRITES_QUERY,
+                {
+                    **params,
+                    "namespaces": [row["checkpoint_ns"] for row in deleted],
+                    "checkpoint_ids": [row["checkpoint_id"] for row in deleted],
+                },
+            )
+            writes = cur.rowcount
+            await cur.execute(
+                DELETE_BLOBS_QUERY,
+                {
+                    **params,
+                    "namespaces": [ns for ns, _ in max_versions],
+                    "channels": [channel for _, channel in max_versions],
+                    "versions": list(max_versions.values()),
+                },
+            )
+            blobs = cur.rowcount
+
+            if not await is_idle():
+                raise Rollback()
+
+            return {
+                "checkpoints": len(deleted),
+                "checkpoint_writes": writes,
+                "checkpoint_blobs": blobs,
+            }
+
+    # Rolled back
+    return None
+
+
+async def get_table_sizes() -> Dict[str, int]:
+    """Size on disk of the checkpoint tables, indexes and TOAST included"""
+    pool = await get_pool()
+
+    async with pool.connection() as conn:
+        cur = await conn.execute(TABLE_SIZES_QUERY, {"tables": list(CHECKPOINT_TABLES)})
+        return {row["name"]: row["bytes"] for row in await cur.fetchall()}
+
+
+async def get_thread_ids(after: Optional[str], limit: int) -> List[str]:
+    """Page through every thread that has checkpoints"""
+    pool = await get_pool()
+
+    async with pool.connection() as conn:
+        cur = await conn.execute(THREAD_IDS_QUERY, {"after": after, "limit": limit})
+        return [row["thread_id"] for row in await cur.fetchall()]
@@ -0,0 +1,103 @@
+from typing import Any, Dict
+
+from async_lru import alru_cache
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from config.settings_config import get_settings
+
+
+async def _open_pool(
+    conninfo: str, min_size: int, max_size: int, **kwargs: Any
+) -> AsyncConnectionPool:
+    pool = AsyncConnectionPool(
+        conninfo=conninfo,
+        min_size=min_size,
+        max_size=max_size,
+        kwargs={"autocommit": True, "row_factory": dict_row, **kwargs},
+        open=False,
+    )
+    await pool.open()
+    return pool
+
+
+@alru_cache()
+async def get_pool() -> AsyncConnectionPool:
+    """
+    Asynchronously retrieves the psycopg connection pool used for hand-written
+    SQL on the chat hot paths.
+
+    The pool is opened on first use and shared afterwards. Connections return
+    rows as dicts and run in autocommit mode unless a transaction is opened.
+    """
+    settings = get_settings()
+    return await _open_pool(
+        settings.postgres_database_url,
+        settings.postgres_pool_min_size,
+        settings.postgres_pool_max_size,
+    )
+
+
+@alru_cache()
+async def get_replica_pool() -> AsyncConnectionPool:
+    """
+    Asynchronously retrieves the psycopg pool of the read replica, or the
+    primary pool when no replica is configured.
+    """
+    replica_url = get_settings().postgres_replica_url
+    if not replica_url:
+        return await get_pool()
+
+    return await _open_pool(
+        replica_url,
+        get_settings().postgres_pool_min_size,
+        get_settings().postgres_pool_max_size,
+    )
+
+
+@alru_cache()
+async def get_checkpointer_pool() -> AsyncConnectionPool:
+    """
+    Asynchronously retrieves the pool backing LangGraph's checkpointer, sized
+    apart from the chat pool since every graph step of every running turn
+    reads or writes checkpoints.
+    """
+    settings = get_settings()
+    return await _open_pool(
+        settings.postgres_database_url,
+        settings.checkpoint_pool_min_size,
+        settings.checkpoint_pool_max_size,
+        # AsyncPostgresSaver's pipelines don't support prepared statements
+        prepare_threshold=0,
+    )
+
+
+async def get_open_pools() -> Dict[str, AsyncConnectionPool]:
+    """The pools opened so far by name, for metrics"""
+    pools = {}
+    if get_pool.cache_info().currsize:
+        pools["primary"] = await get_pool()
+    if get_replica_pool.cache_info().currsize and get_settings().postgres_replica_url:
+        pools["replica"] = await get_replica_pool()
+    if get_checkpointer_pool.cache_info().currsize:
+        pools["checkpointer"] = await get_checkpointer_pool()
+    return pools
+
+
+async def close_pool() -> None:
+    """Closes the pools that were opened"""
+    if get_checkpointer_pool.cache_info().currsize:
+        pool = await get_checkpointer_pool()
+        await pool.close()
+        get_checkpointer_pool.cache_clear()
+
+    if get_replica_pool.cache_info().currsize:
+        pool = await get_replica_pool()
+        if get_settings().postgres_replica_url:
+            await pool.close()
+        get_replica_pool.cache_clear()
+
+    if get_pool.cache_info().currsize:
+        pool = await get_pool()
+        await pool.close()
+        get_pool.cache_clear()
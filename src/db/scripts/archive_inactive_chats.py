@@ -0,0 +1,86 @@
+"""
+Archive the messages of chats inactive for `chat_archive_after_days`.
+
+Each chat's messages are compressed into a single `ChatArchive` row and
+removed from `ChatMessage`, which keeps the hot table and its indexes bounded
+by recent activity. An archived chat is rehydrated when it is opened again.
+It is idempotent and safe to run while the service is up, e.g. nightly.
+
+Usage (after `prisma db push`):
+    PYTHONPATH=src python -m db.scripts.archive_inactive_chats
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from config.settings_config import get_settings
+from core.chat_touch import chat_touch_buffer
+from core.redis_manager import redis_manager
+from db.prisma.utils import get_db
+from db.psycopg.chat_archive_repository import archive_chat
+from db.psycopg.utils import close_pool
+from services.v1.message_cache_service import invalidate_messages
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+async def archive_inactive_chats() -> int:
+    await redis_manager.connect()
+    db = await get_db()
+
+    cutoff = (
+        datetime.now(timezone.utc)
+        - timedelta(days=get_settings().chat_archive_after_days)
+    ).timestamp()
+
+    total = 0
+    cursor = None
+    while True:
+        # Archived chats leave the filter, so page on the id rather than a
+        # Prisma cursor that skips the first row
+        chats = await db.chat.find_many(
+            where={
+                "timestamp": {"lt": cutoff},
+                "isArchived": False,
+                **({"id": {"gt": cursor}} if cursor else {}),
+            },
+            take=BATCH_SIZE,
+            order={"id": "asc"},
+        )
+        if not chats:
+            break
+
+        # Activity still buffered in Redis counts too, whether or not a flush
+        # could run meanwhile
+        pending = await chat_touch_buffer.get_pending_timestamps(
+            [chat.id for chat in chats]
+        )
+
+        archived = 0
+        for chat in chats:
+            if pending.get(chat.id, 0) >= cutoff:
+                continue
+
+            count = await archive_chat(chat.id, cutoff)
+            if count:
+                await invalidate_messages(chat.id)
+                archived += count
+
+        total += archived
+        cursor = chats[-1].id
+        logger.info(f"Archived {archived} messages up to chat {cursor}")
+
+    await close_pool()
+    await db.disconnect()
+    await redis_manager.disconnect()
+
+    return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    total = asyncio.run(archive_inactive_chats())
+    logger.info(f"Archival finished, {total} messages archived")
@@ -0,0 +1,63 @@
+"""
+Backfill the `ChatUploadFile` index from existing chat messages.
+
+Chats created before the index existed only link their files through
+`ChatMessage.uploadFiles`. This copies those links into `ChatUploadFile`, one
+batch of chats at a time. It is idempotent and safe to run while the service
+is up.
+
+Usage (after `prisma db push`):
+    PYTHONPATH=src python -m db.scripts.backfill_chat_upload_files
+"""
+
+import asyncio
+import logging
+
+from db.prisma.utils import get_db
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# "A" is the ChatMessage id and "B" the UploadFile id of Prisma's implicit
+# many-to-many table between the two models
+BACKFILL_QUERY = """
+INSERT INTO "ChatUploadFile" ("chatId", "uploadFileId", "createdAt")
+SELECT m."chatId", j."B", MIN(m."createdAt")
+FROM "_ChatMessageToUploadFile" j
+JOIN "ChatMessage" m ON m.id = j."A"
+WHERE m."chatId" = ANY($1::text[])
+GROUP BY m."chatId", j."B"
+ON CONFLICT DO NOTHING
+"""
+
+
+async def backfill_chat_upload_files() -> int:
+    db = await get_db()
+
+    total = 0
+    cursor = None
+    while True:
+        chats = await db.chat.find_many(
+            take=BATCH_SIZE,
+            skip=1 if cursor else None,
+            cursor={"id": cursor} if cursor else None,
+            order={"id": "asc"},
+        )
+        if not chats:
+            break
+
+        inserted = await db.execute_raw(BACKFILL_QUERY, [chat.id for chat in chats])
+        total += inserted
+        cursor = chats[-1].id
+        logger.info(f"Backfilled {inserted} chat files up to chat {cursor}")
+
+    await db.disconnect()
+
+    return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    total = asyncio.run(backfill_chat_upload_files())
+    logger.info(f"Backfill finished, {total} chat files indexed")
@@ -0,0 +1,59 @@
+"""
+Export or import a user's chats as NDJSON, e.g. for backups or to migrate an
+account between databases.
+
+Both directions stream, so memory stays constant whatever the history size.
+Import keeps existing rows, so it is safe to rerun. Upload file metadata is
+included, the file contents and their vectors are not.
+
+Usage:
+    PYTHONPATH=src python -m db.scripts.chat_data export USER_ID chats.ndjson
+    PYTHONPATH=src python -m db.scripts.chat_data import USER_ID chats.ndjson
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import AsyncIterator
+
+from core.redis_manager import redis_manager
+from db.psycopg.utils import close_pool
+from services.v1.chat_export_service import export_user_chats, import_user_chats
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 1024 * 1024
+
+
+async def _read_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as file:
+        while chunk := file.read(READ_SIZE):
+            yield chunk
+
+
+async def main(command: str, user_id: str, path: str) -> None:
+    await redis_manager.connect()
+
+    if command == "export":
+        with open(path, "wb") as file:
+            async for line in export_user_chats(user_id):
+                file.write(line)
+        logger.info(f"Exported chats of user {user_id} to {path}")
+    else:
+        counts = await import_user_chats(user_id, _read_chunks(path))
+        logger.info(f"Imported {counts.model_dump()} into user {user_id}")
+
+    await close_pool()
+    await redis_manager.disconnect()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("user_id")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.command, args.user_id, args.path))
@@ -0,0 +1,56 @@
+"""
+Apply the checkpoint retention to every existing thread.
+
+The compactor only sees threads that had a turn since it was deployed. This
+queues all threads that have checkpoints and compacts them, idle ones only,
+with the same throttling as the background compaction. It is idempotent and
+safe to run while the service is up.
+
+Usage:
+    PYTHONPATH=src python -m db.scripts.compact_checkpoints
+"""
+
+import asyncio
+import logging
+
+from core.checkpoint_compactor import checkpoint_compactor
+from core.redis_manager import redis_manager
+from db.psycopg.checkpoint_repository import get_thread_ids
+from db.psycopg.utils import close_pool
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+async def compact_checkpoints() -> int:
+    await redis_manager.connect()
+
+    cursor = None
+    while True:
+        thread_ids = await get_thread_ids(cursor, BATCH_SIZE)
+        if not thread_ids:
+            break
+
+        await checkpoint_compactor.mark_idle(thread_ids)
+        cursor = thread_ids[-1]
+
+    total = 0
+    while True:
+        compacted = await checkpoint_compactor.compact()
+        if not compacted:
+            break
+
+        total += compacted
+        logger.info(f"Compacted {total} threads so far")
+
+    await close_pool()
+    await redis_manager.disconnect()
+
+    return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    total = asyncio.run(compact_checkpoints())
+    logger.info(f"Compaction finished, {total} threads compacted")
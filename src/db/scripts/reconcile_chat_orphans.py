@@ -0,0 +1,63 @@
+"""
+Collect checkpoints and memories of chats that no longer exist.
+
+Chats deleted before the garbage collector existed, or whose scheduling
+failed, left their LangGraph checkpoints and store memories behind. This
+finds them, queues them for the collector and collects them right away. It
+is idempotent and safe to run while the service is up.
+
+Usage:
+    PYTHONPATH=src python -m db.scripts.reconcile_chat_orphans
+"""
+
+import asyncio
+import logging
+
+from core.chat_gc import chat_gc
+from core.redis_manager import redis_manager
+from db.psycopg.chat_gc_repository import (
+    find_orphan_memory_prefixes,
+    find_orphan_thread_ids,
+)
+from db.psycopg.utils import close_pool
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+
+
+async def reconcile_chat_orphans() -> int:
+    await redis_manager.connect()
+
+    total = 0
+    while True:
+        thread_ids = await find_orphan_thread_ids(BATCH_SIZE)
+        prefixes = await find_orphan_memory_prefixes(BATCH_SIZE)
+        if not thread_ids and not prefixes:
+            break
+
+        for thread_id in thread_ids:
+            await chat_gc.schedule(None, thread_id)
+        for prefix in prefixes:
+            _, user_id, chat_id = prefix.split(".", 2)
+            await chat_gc.schedule(user_id, chat_id)
+
+        collected = await chat_gc.collect(min_age=0)
+        if not collected:
+            # A running worker holds the collector, it picks the queue up
+            logger.info("Collector busy, orphans left queued")
+            break
+
+        total += collected
+        logger.info(f"Collected {collected} orphaned chats")
+
+    await close_pool()
+    await redis_manager.disconnect()
+
+    return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    total = asyncio.run(reconcile_chat_orphans())
+    logger.info(f"Reconciliation finished, {total} orphaned chats collected")
@@ -0,0 +1,65 @@
+"""
+Turn `ChatMessage.contentSearch` into a generated tsvector column.
+
+Prisma declares the column and its GIN index but can't declare the
+generation expression. This replaces the plain column created by
+`prisma db push` with a generated one and recreates the index. It only
+changes anything the first time and is safe to rerun after every push.
+
+Usage (after `prisma db push`):
+    PYTHONPATH=src python -m db.scripts.setup_message_search
+"""
+
+import asyncio
+import logging
+
+from db.psycopg.utils import close_pool, get_pool
+
+logger = logging.getLogger(__name__)
+
+IS_GENERATED_QUERY = """
+SELECT attgenerated = 's' AS generated FROM pg_attribute
+WHERE attrelid = '"ChatMessage"'::regclass AND attname = 'contentSearch'
+"""
+
+# 'simple' doesn't stem or drop stop words, so it works for every language.
+# Only plain text content is indexed, confirmations are JSON objects.
+SETUP_QUERIES = [
+    'ALTER TABLE "ChatMessage" DROP COLUMN IF EXISTS "contentSearch"',
+    """
+    ALTER TABLE "ChatMessage" ADD COLUMN "contentSearch" tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector(
+            'simple',
+            CASE WHEN jsonb_typeof(content) = 'string' THEN content #>> '{}' END
+        )
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS "ChatMessage_contentSearch_idx"
+    ON "ChatMessage" USING GIN ("contentSearch")
+    """,
+]
+
+
+async def setup_message_search() -> None:
+    pool = await get_pool()
+
+    async with pool.connection() as conn:
+        cur = await conn.execute(IS_GENERATED_QUERY)
+        row = await cur.fetchone()
+        if row and row["generated"]:
+            logger.info("contentSearch is already generated")
+        else:
+            # Rewrites the table once, run it off-peak on large histories
+            async with conn.transaction():
+                for query in SETUP_QUERIES:
+                    await conn.execute(query)
+            logger.info("contentSearch generated and indexed")
+
+    await close_pool()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(setup_message_search())
@@ -21,6 +21,7 @@ class StreamType(str, Enum):
     ERROR = "error"
     CHECKING_TITLE = "checking_title"
     GENERATED_TITLE = "generated_title"
+    UPLOAD_STATUS = "upload_status"
 
 
 class ApproveType(str, Enum):
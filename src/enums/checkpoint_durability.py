@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class CheckpointDurability(str, Enum):
+    # Every step of the agent, needed to interrupt and resume inside it
+    STEP = "step"
+    # Only the supervisor's step once the agent has finished
+    TURN = "turn"
@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class IngestionStatus(str, Enum):
+    QUEUED = "queued"
+    PARSING = "parsing"
+    EMBEDDING = "embedding"
+    DESCRIBING = "describing"
+    READY = "ready"
+    FAILED = "failed"
@@ -1,20 +1,12 @@
-import logging
-
 import uvicorn
 
-from config.logging_config import setup_logging
 from config.settings_config import get_settings
-from core.app_factory import create_app
-
-setup_logging()
-
-logger = logging.getLogger(__name__)
-
-app = create_app()
 
+# Only the server is started here, the app lives in app.py: parsing pool
+# workers are spawned, and re-import this module without running the guard.
 if __name__ == "__main__":
     uvicorn.run(
-        "main:app",
+        "app:app",
         host=get_settings().host,
         port=get_settings().port,
         lifespan="on",
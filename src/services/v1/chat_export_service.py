@@ -0,0 +1,76 @@
+import json
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Set
+
+from fastapi import HTTPException
+from psycopg import DataError
+
+from api.v1.schema.chat import ChatImportResponse
+from core.write_behind import write_behind_queue
+from db.psycopg.chat_export_repository import import_user_records, iter_user_records
+from services.v1.chat_index_service import invalidate_chat_index
+from services.v1.message_cache_service import invalidate_messages
+
+logger = logging.getLogger(__name__)
+
+
+async def export_user_chats(user_id: str) -> AsyncIterator[bytes]:
+    """Stream the user's chats, messages and upload file metadata as NDJSON"""
+    # Queued messages belong in the export
+    await write_behind_queue.flush()
+
+    async for record in iter_user_records(user_id):
+        yield (json.dumps(record, default=str) + "\n").encode()
+
+
+def _parse_record(line: bytes, chat_ids: Set[str]) -> Dict[str, Any]:
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("Every line must be a JSON object")
+
+    if record.get("type") == "chat":
+        chat_ids.add(record["id"])
+    elif record.get("type") == "message":
+        chat_ids.add(record["chat_id"])
+    return record
+
+
+async def _iter_records(
+    chunks: AsyncIterable[bytes], chat_ids: Set[str]
+) -> AsyncIterator[Dict[str, Any]]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_record(line, chat_ids)
+
+    if buffer.strip():
+        yield _parse_record(buffer, chat_ids)
+
+
+async def import_user_chats(
+    user_id: str, chunks: AsyncIterable[bytes]
+) -> ChatImportResponse:
+    """Import an NDJSON export into the user's account, existing rows are kept"""
+    chat_ids: Set[str] = set()
+
+    try:
+        counts = await import_user_records(user_id, _iter_records(chunks, chat_ids))
+    except (ValueError, KeyError, TypeError, DataError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import: {e}")
+
+    # Imported messages may land in chats that are already cached
+    await invalidate_chat_index(user_id, chat_ids)
+    for chat_id in chat_ids:
+        await invalidate_messages(chat_id)
+
+    logger.info(f"Imported chats of user {user_id}: {counts}")
+
+    return ChatImportResponse(
+        upload_files=counts["upload_file"],
+        chats=counts["chat"],
+        chat_files=counts["chat_file"],
+        messages=counts["message"],
+    )
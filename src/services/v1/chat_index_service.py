@@ -0,0 +1,309 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import uuid4
+
+from api.v1.schema.chat import ChatResponse, ChatsResponse
+from config.settings_config import get_settings
+from core.chat_touch import chat_touch_buffer
+from core.redis_manager import get_redis
+from core.utils import decode_cursor, encode_cursor
+from db.prisma.utils import get_db
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 100
+
+# Meta hash field changed on every index write, chat fields always hold a ":"
+VERSION_FIELD = "version"
+
+# Fills the index with chats read from Postgres, except chats removed since:
+# their deletion may have committed after the read.
+# KEYS: index, meta, state, removed / ARGV: ttl, version, then chat id,
+# timestamp, title and preview ('' if none) of each chat
+REBUILD_SCRIPT = """
+for i = 3, #ARGV, 4 do
+    local chat_id = ARGV[i]
+    if redis.call('SISMEMBER', KEYS[4], chat_id) == 0 then
+        redis.call('ZADD', KEYS[1], 'GT', ARGV[i + 1], chat_id)
+        redis.call('HSETNX', KEYS[2], chat_id .. ':title', ARGV[i + 2])
+        if ARGV[i + 3] ~= '' then
+            redis.call('HSETNX', KEYS[2], chat_id .. ':preview', ARGV[i + 3])
+        end
+    end
+end
+redis.call('HSET', KEYS[2], 'version', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+redis.call('SET', KEYS[3], 'ready', 'EX', ARGV[1])
+return 1
+"""
+
+# Latest user or assistant message of each chat, one index lookup per chat
+LAST_MESSAGES_QUERY = """
+SELECT c.id AS "chatId", m.content
+FROM unnest($1::text[]) AS c(id)
+CROSS JOIN LATERAL (
+    SELECT content FROM "ChatMessage"
+    WHERE "chatId" = c.id AND role IN ('user', 'assistant')
+    ORDER BY timestamp DESC, id DESC
+    LIMIT 1
+) m
+"""
+
+
+def _index_key(user_id: str) -> str:
+    # ZSET of chat ids scored by chat timestamp
+    return f"chat_index:{user_id}"
+
+
+def _meta_key(user_id: str) -> str:
+    # HASH of "<chat_id>:title", "<chat_id>:preview" and the index version
+    return f"chat_index_meta:{user_id}"
+
+
+def _state_key(user_id: str) -> str:
+    # "building" while rebuilt from Postgres, "ready" once complete
+    return f"chat_index_state:{user_id}"
+
+
+def _removed_key(user_id: str) -> str:
+    # SET of deleted chat ids, a rebuild doesn't add them back
+    return f"chat_index_removed:{user_id}"
+
+
+def to_preview(content: Any) -> Optional[str]:
+    if not isinstance(content, str):
+        return None
+
+    preview = " ".join(content.split())[:PREVIEW_LENGTH]
+    return preview or None
+
+
+async def _invalidate(user_id: str, error: Exception) -> None:
+    logger.warning(f"Chat index of user {user_id} invalidated: {error}")
+    try:
+        await get_redis().delete(_state_key(user_id))
+    except Exception as e:
+        logger.error(f"Failed to invalidate chat index of user {user_id}: {e}")
+
+
+async def index_chat(
+    user_id: str, chat_id: str, timestamp: float, title: Optional[str] = None
+) -> None:
+    """Add or move a chat in the user's index, if the index is built"""
+    redis_client = get_redis()
+
+    try:
+        if not await redis_client.exists(_state_key(user_id)):
+            return
+
+        ttl = get_settings().chat_index_ttl
+        pipe = redis_client.pipeline(transaction=False)
+        # GT keeps the newest timestamp when writes race with a rebuild
+        pipe.zadd(_index_key(user_id), {chat_id: timestamp}, gt=True)
+        if title is not None:
+            pipe.hset(_meta_key(user_id), f"{chat_id}:title", title)
+        pipe.hset(_meta_key(user_id), VERSION_FIELD, uuid4().hex)
+        for key in (_index_key(user_id), _meta_key(user_id), _state_key(user_id)):
+            pipe.expire(key, ttl)
+        await pipe.execute()
+    except Exception as e:
+        await _invalidate(user_id, e)
+
+
+async def set_chat_preview(user_id: str, chat_id: str, content: Any) -> None:
+    """Store the last-message preview of a chat, if the index is built"""
+    preview = to_preview(content)
+    if preview is None:
+        return
+
+    redis_client = get_redis()
+
+    try:
+        if not await redis_client.exists(_state_key(user_id)):
+            return
+
+        await redis_client.hset(
+            _meta_key(user_id),
+            mapping={f"{chat_id}:preview": preview, VERSION_FIELD: uuid4().hex},
+        )
+    except Exception as e:
+        await _invalidate(user_id, e)
+
+
+async def remove_chat(user_id: str, chat_id: str) -> None:
+    """Drop a deleted chat from the user's index"""
+    redis_client = get_redis()
+
+    try:
+        ttl = get_settings().chat_index_ttl
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.sadd(_removed_key(user_id), chat_id)
+        pipe.zrem(_index_key(user_id), chat_id)
+        pipe.hdel(_meta_key(user_id), f"{chat_id}:title", f"{chat_id}:preview")
+        pipe.hset(_meta_key(user_id), VERSION_FIELD, uuid4().hex)
+        for key in (
+            _index_key(user_id),
+            _meta_key(user_id),
+            _state_key(user_id),
+            _removed_key(user_id),
+        ):
+            pipe.expire(key, ttl)
+        await pipe.execute()
+    except Exception as e:
+        await _invalidate(user_id, e)
+
+
+async def invalidate_chat_index(user_id: str, chat_ids: Iterable[str] = ()) -> None:
+    """
+    Rebuild the user's index on the next read, e.g. after a bulk import.
+    `chat_ids` were created again, e.g. imported after their deletion, and
+    may be indexed again.
+    """
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.delete(_state_key(user_id))
+        if chat_ids:
+            pipe.srem(_removed_key(user_id), *chat_ids)
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to invalidate chat index of user {user_id}: {e}")
+
+
+async def get_last_message_previews(chat_ids: List[str]) -> Dict[str, str]:
+    if not chat_ids:
+        return {}
+
+    db = await get_db()
+
+    rows = await db.query_raw(LAST_MESSAGES_QUERY, chat_ids)
+
+    previews = {}
+    for row in rows:
+        preview = to_preview(row["content"])
+        if preview is not None:
+            previews[row["chatId"]] = preview
+
+    return previews
+
+
+async def rebuild_chat_index(user_id: str) -> None:
+    """Rebuild the user's index from Postgres, the source of truth"""
+    redis_client = get_redis()
+    ttl = get_settings().chat_index_ttl
+
+    # Concurrent writes already land in the index while it is being built
+    await redis_client.set(_state_key(user_id), "building", ex=ttl)
+
+    db = await get_db()
+    chats = await db.chat.find_many(where={"userId": user_id})
+    timestamps = await chat_touch_buffer.get_fresh_timestamps(
+        {chat.id: chat.timestamp for chat in chats}
+    )
+    previews = await get_last_message_previews(list(timestamps))
+
+    await redis_client.eval(
+        REBUILD_SCRIPT,
+        4,
+        _index_key(user_id),
+        _meta_key(user_id),
+        _state_key(user_id),
+        _removed_key(user_id),
+        ttl,
+        uuid4().hex,
+        *[
+            value
+            for chat in chats
+            for value in (
+                chat.id,
+                timestamps[chat.id],
+                chat.title,
+                previews.get(chat.id, ""),
+            )
+        ],
+    )
+
+    logger.info(f"Chat index of user {user_id} rebuilt with {len(chats)} chats")
+
+
+async def get_chat_index_version(user_id: str) -> Optional[str]:
+    """Version of the user's index, None when the index isn't ready"""
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.get(_state_key(user_id))
+        pipe.hget(_meta_key(user_id), VERSION_FIELD)
+        state, version = await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Chat index version of user {user_id} unavailable: {e}")
+        return None
+
+    return version if state == "ready" else None
+
+
+async def get_indexed_chat_list(
+    user_id: str, limit: int, cursor: Optional[str] = None
+) -> Optional[ChatsResponse]:
+    """
+    Serve a chat list page from the user's index, rebuilding it first if
+    needed. Returns None when the index can't answer, so the caller falls
+    back to Postgres.
+    """
+    redis_client = get_redis()
+
+    if await redis_client.get(_state_key(user_id)) != "ready":
+        await rebuild_chat_index(user_id)
+
+    index_key = _index_key(user_id)
+    max_score: Any = "+inf"
+    last_id = None
+    if cursor:
+        max_score, last_id = decode_cursor(cursor, float, str)
+
+    # Equal timestamps are ordered by id desc, like the Postgres keyset
+    items: List[tuple[str, float]] = []
+    offset = 0
+    while len(items) < limit + 1:
+        batch = await redis_client.zrevrangebyscore(
+            index_key, max_score, "-inf", start=offset, num=limit + 1, withscores=True
+        )
+        if not batch:
+            break
+        offset += len(batch)
+        items.extend(
+            (chat_id, score)
+            for chat_id, score in batch
+            if last_id is None or score < max_score or chat_id < last_id
+        )
+
+    has_next_page = len(items) > limit
+    paginated = items[:limit]
+
+    total = await redis_client.zcard(index_key)
+    meta: List[Optional[str]] = []
+    if paginated:
+        meta = await redis_client.hmget(
+            _meta_key(user_id),
+            [
+                f"{chat_id}:{field}"
+                for chat_id, _ in paginated
+                for field in ("title", "preview")
+            ],
+        )
+
+    chats: List[ChatResponse] = []
+    for i, (chat_id, score) in enumerate(paginated):
+        title, preview = meta[2 * i], meta[2 * i + 1]
+        if title is None:
+            await _invalidate(user_id, ValueError(f"Missing title of chat {chat_id}"))
+            return None
+        chats.append(
+            ChatResponse(id=chat_id, title=title, timestamp=score, last_message=preview)
+        )
+
+    return ChatsResponse(
+        total=total,
+        next_cursor=(
+            encode_cursor(paginated[-1][1], paginated[-1][0]) if has_next_page else None
+        ),
+        chats=chats,
+    )
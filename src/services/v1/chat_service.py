@@ -1,6 +1,8 @@
 import json
+import logging
 from datetime import datetime, timezone
 from typing import List, Optional
+from uuid import uuid4
 
 from fastapi import HTTPException, status
 
@@ -11,16 +13,52 @@ from api.v1.schema.chat import (
     ChatMessagesResponse,
     ChatMessageUploadFile,
     ChatResponse,
+    ChatSearchResponse,
+    ChatSearchResult,
     ChatsResponse,
     ConfirmationChatMessage,
 )
+from config.settings_config import get_settings
+from core.chat_gc import chat_gc
+from core.chat_touch import chat_touch_buffer
+from core.etag import make_etag
+from core.read_routing import (
+    chat_scope,
+    get_read_db,
+    get_read_pool,
+    pin_to_primary,
+    user_scope,
+)
+from core.utils import decode_cursor, encode_cursor
+from core.write_behind import write_behind_queue
 from db.prisma.generated._fields import Json
 from db.prisma.generated.enums import Role
 from db.prisma.generated.models import Chat
 from db.prisma.generated.models import ChatMessage as PrismaChatMessage
 from db.prisma.generated.models import Connector
+from db.prisma.generated.types import ChatWhereInput
 from db.prisma.utils import get_db
+from db.psycopg import chat_archive_repository, chat_repository
 from enums.chat import ApproveType, ChatRole
+from services.v1.chat_index_service import (
+    get_chat_index_version,
+    get_indexed_chat_list,
+    get_last_message_previews,
+    index_chat,
+    remove_chat,
+    set_chat_preview,
+)
+from services.v1.message_cache_service import (
+    cache_new_messages,
+    get_cache_generation,
+    get_cache_version,
+    get_cached_first_page,
+    invalidate_messages,
+    patch_cached_message,
+    warm_messages,
+)
+
+logger = logging.getLogger(__name__)
 
 
 async def get_chat(user_id: str, chat_id: str) -> Chat:
@@ -30,68 +68,117 @@ async def get_chat(user_id: str, chat_id: str) -> Chat:
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    return chat
+    # Touches not flushed yet, best effort since Redis may be what failed
+    timestamps = {chat.id: chat.timestamp}
+    try:
+        timestamps = await chat_touch_buffer.get_fresh_timestamps(timestamps)
+    except Exception as e:
+        logger.warning(f"Pending touch of chat {chat_id} unavailable: {e}")
+
+    return chat.model_copy(
+        update={
+            **write_behind_queue.get_pending_chat_update(chat_id),
+            "timestamp": timestamps[chat.id],
+        }
+    )
+
+
+async def _rehydrate_chat(chat: Chat) -> None:
+    """Bring back the messages of an archived chat that is opened again"""
+    if not chat.isArchived:
+        return
+
+    await pin_to_primary(chat_scope(chat.id))
+    restored = await chat_archive_repository.restore_chat(chat.id)
+    await invalidate_messages(chat.id)
+
+    logger.info(f"Rehydrated {restored} archived messages of chat {chat.id}")
 
 
 async def update_chat_title(user_id: str, chat_id: str, title: str) -> Chat:
-    db = await get_db()
+    chat = await get_chat(user_id, chat_id)
 
-    updated_chat = await db.chat.update(
-        where={"id": chat_id},
-        data={
-            "title": title.strip(),
-            "timestamp": datetime.now(timezone.utc).timestamp(),
-            "isTitleSet": True,
-        },
-    )
-    if not updated_chat:
-        raise HTTPException(status_code=404, detail="Chat not found")
+    timestamp = datetime.now(timezone.utc).timestamp()
+    data = {"title": title.strip(), "isTitleSet": True}
+    await pin_to_primary(user_scope(user_id), chat_scope(chat_id))
+    await write_behind_queue.update_chat(chat_id, data)
+    await chat_touch_buffer.touch(chat_id, timestamp)
+    await index_chat(user_id, chat_id, timestamp, data["title"])
 
-    return updated_chat
+    return chat.model_copy(update={**data, "timestamp": timestamp})
 
 
 async def upsert_chat(user_id: str, chat_id: Optional[str] = None) -> tuple[bool, Chat]:
-    db = await get_db()
-
     if chat_id:
-        updated_chat = await db.chat.update(
-            where={"id": chat_id},
-            data={"timestamp": datetime.now(timezone.utc).timestamp()},
-        )
-        if not updated_chat:
+        chat = await chat_repository.get_chat(chat_id)
+        if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
 
-        return False, updated_chat
+        await _rehydrate_chat(chat)
+
+        timestamp = datetime.now(timezone.utc).timestamp()
+        await chat_touch_buffer.touch(chat_id, timestamp)
+        await index_chat(chat.userId, chat_id, timestamp)
+
+        # Pending writes (e.g. a title not yet committed) win over the stored row
+        return False, chat.model_copy(
+            update={
+                **write_behind_queue.get_pending_chat_update(chat_id),
+                "isArchived": False,
+                "timestamp": timestamp,
+            }
+        )
 
-    return True, await db.chat.create(
-        data={
-            "title": "New Chat",
-            "timestamp": datetime.now(timezone.utc).timestamp(),
-            "userId": user_id,
-        },
+    new_chat_id = str(uuid4())
+    await pin_to_primary(user_scope(user_id), chat_scope(new_chat_id))
+    created_chat = await chat_repository.create_chat(
+        new_chat_id, user_id, "New Chat", datetime.now(timezone.utc).timestamp()
     )
+    await index_chat(
+        user_id, created_chat.id, created_chat.timestamp, created_chat.title
+    )
+
+    return True, created_chat
 
 
 async def save_user_message(
-    chat_id: str, group_id: str, message: str, upload_files: List[ChatMessageUploadFile]
-) -> PrismaChatMessage:
-    db = await get_db()
+    user_id: str,
+    chat_id: str,
+    group_id: str,
+    message: str,
+    upload_files: List[ChatMessageUploadFile],
+) -> ChatMessage:
+    user_message: ChatMessage = {
+        "id": str(uuid4()),
+        "chat_id": chat_id,
+        "role": ChatRole.USER,
+        "timestamp": datetime.now(timezone.utc).timestamp(),
+        "content": message.strip(),
+        "group_id": group_id,
+        "upload_files": upload_files,
+        "agent": None,
+    }
 
-    message = message.strip()
-    return await db.chatmessage.create(
-        data={
-            "chatId": chat_id,
-            "content": Json(message),
+    await write_behind_queue.add_message(
+        {
+            "id": user_message["id"],
+            "chat_id": chat_id,
+            "content": user_message["content"],
             "role": Role.user,
-            "groupId": group_id,
-            "timestamp": datetime.now(timezone.utc).timestamp(),
-            "uploadFiles": (
-                {"connect": [{"id": file["id"]} for file in upload_files]}
-                if upload_files
-                else {"connect": []}
-            ),
+            "agent": None,
+            "timestamp": user_message["timestamp"],
+            "group_id": group_id,
+            "upload_file_ids": [file["id"] for file in upload_files],
         }
     )
+    if upload_files:
+        await write_behind_queue.add_chat_files(
+            chat_id, [file["id"] for file in upload_files]
+        )
+    await set_chat_preview(user_id, chat_id, user_message["content"])
+    await cache_new_messages(chat_id, [ChatMessageResponse(**user_message)])
+
+    return user_message
 
 
 def _is_non_empty_content(content: str | ConfirmationChatMessage) -> bool:
@@ -102,27 +189,31 @@ def _is_non_empty_content(content: str | ConfirmationChatMessage) -> bool:
     return False
 
 
-async def save_bot_messages(messages: list[ChatMessage]) -> None:
+async def save_bot_messages(user_id: str, messages: list[ChatMessage]) -> None:
+    messages = [msg for msg in messages if _is_non_empty_content(msg["content"])]
     if not messages:
         return
 
-    db = await get_db()
-
-    await db.chatmessage.create_many(
-        data=[
+    for msg in messages:
+        await write_behind_queue.add_message(
             {
                 "id": str(msg["id"]),
-                "chatId": msg["chat_id"],
-                "content": Json(msg["content"]),  # type: ignore
+                "chat_id": msg["chat_id"],
+                "content": msg["content"],
                 "role": Role(msg["role"]),
-                "groupId": msg["group_id"],
+                "agent": msg.get("agent"),
                 "timestamp": msg["timestamp"],
-                "agent": Json(msg["agent"]) if msg.get("agent") else None,  # type: ignore
+                "group_id": msg["group_id"],
+                "upload_file_ids": [],
             }
-            for msg in messages
-            if _is_non_empty_content(msg["content"])
-        ]
-    )
+        )
+
+    chat_id = messages[0]["chat_id"]
+    await cache_new_messages(chat_id, [ChatMessageResponse(**msg) for msg in messages])
+
+    answers = [msg for msg in messages if msg["role"] == ChatRole.ASSISTANT]
+    if answers:
+        await set_chat_preview(user_id, chat_id, answers[-1]["content"])
 
 
 async def update_confirmation_message_approve(
@@ -134,12 +225,15 @@ async def update_confirmation_message_approve(
 ) -> PrismaChatMessage:
     db = await get_db()
 
+    await write_behind_queue.sync_chat(chat_id)
+
     message = await db.chatmessage.find_first(
         where={"id": msg_id, "chatId": chat_id, "groupId": group_id}
     )
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
 
+    await pin_to_primary(chat_scope(chat_id))
     updated = await db.chatmessage.update(
         where={"id": msg_id},
         data={"content": Json({**message.content, "approve": approve, **(data or {})})},
@@ -148,86 +242,223 @@ async def update_confirmation_message_approve(
     if not updated:
         raise HTTPException(status_code=404, detail="Message not found")
 
+    await patch_cached_message(chat_id, _to_message_response(updated))
+
     return updated
 
 
-async def get_messages_by_chat_id(
-    user_id: str, chat_id: str, limit: int, cursor: Optional[str] = None
+def _to_message_response(mes: PrismaChatMessage) -> ChatMessageResponse:
+    return ChatMessageResponse(
+        id=mes.id,
+        content=mes.content,
+        agent=(
+            Agent(id=str(mes.agent["id"]), name=str(mes.agent["name"]))
+            if mes.agent
+            else None
+        ),
+        role=ChatRole(mes.role),
+        timestamp=mes.timestamp,
+        chat_id=mes.chatId,
+        group_id=mes.groupId,
+        upload_files=[
+            ChatMessageUploadFile(
+                id=file.id, filename=file.filename, description=file.description
+            )
+            for file in (mes.uploadFiles or [])
+        ],
+    )
+
+
+def _paginate_messages(
+    messages: List[ChatMessageResponse], limit: int, total: Optional[int]
 ) -> ChatMessagesResponse:
-    db = await get_db()
+    has_next_page = len(messages) > limit
+    paginated_messages = messages[:limit]
 
-    chat = await db.chat.find_first(where={"id": chat_id, "userId": user_id})
+    return ChatMessagesResponse(
+        total=total,
+        next_cursor=(
+            encode_cursor(paginated_messages[-1].timestamp, paginated_messages[-1].id)
+            if has_next_page
+            else None
+        ),
+        messages=paginated_messages,
+    )
+
+
+def _to_thinking_stub(message: ChatMessageResponse) -> ChatMessageResponse:
+    # Same cut as the repository's THINKING_STUB_COLUMNS
+    if message.role != ChatRole.SYSTEM or not isinstance(message.content, str):
+        return message
+
+    return message.model_copy(
+        update={
+            "content": message.content.strip(" \n").split("\n", 1)[0],
+            "content_length": len(message.content),
+        }
+    )
+
+
+async def get_messages_by_chat_id(
+    user_id: str,
+    chat_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    stub_thinking: bool = False,
+) -> ChatMessagesResponse:
+    chat = await chat_repository.get_chat(
+        chat_id, user_id, await get_read_pool(chat_scope(chat_id))
+    )
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
 
-    total = await db.chatmessage.count(where={"chatId": chat_id})
-    query_args = {
-        "where": {"chatId": chat_id},
-        "order": {"timestamp": "desc"},
-        "take": limit + 1,  # Fetch one extra to check for next page
-    }
+    await _rehydrate_chat(chat)
+
+    if not cursor:
+        cached = await get_cached_first_page(chat_id, limit)
+        if cached is not None:
+            cached_messages, total = cached
+            if stub_thinking:
+                cached_messages = [_to_thinking_stub(mes) for mes in cached_messages]
+            return _paginate_messages(cached_messages, limit, total)
 
+    await write_behind_queue.sync_chat(chat_id)
+    # After the sync, so its commit pins the chat to the primary
+    pool = await get_read_pool(chat_scope(chat_id))
+
+    # Only the first page carries the total, later pages skip the count
+    take = limit + 1  # Fetch one extra to check for next page
+    generation = None
+    after = None
     if cursor:
-        query_args["cursor"] = {"id": cursor}
-        query_args["skip"] = 1  # Skip the cursor itself
+        timestamp, last_id = decode_cursor(cursor, float, str)
+        after = (timestamp, last_id)
+    elif not stub_thinking:
+        # Read enough for the recent-messages cache in the same query, stubs
+        # never go to the cache
+        take = max(take, get_settings().message_cache_size)
+        generation = await get_cache_generation(chat_id)
+
+    rows, total = await chat_repository.get_messages_page(
+        chat_id, take, after, pool, stub_thinking
+    )
+    messages = [ChatMessageResponse(**row) for row in rows]
 
-    messages = await db.chatmessage.find_many(
-        **query_args, include={"uploadFiles": True}
+    if total is not None:
+        await warm_messages(chat_id, generation, messages, total)
+
+    return _paginate_messages(messages, limit, total)
+
+
+async def get_thinking_message(
+    user_id: str, chat_id: str, message_id: str
+) -> ChatMessageResponse:
+    """Full content of a thinking message, stubbed in the history"""
+    chat = await chat_repository.get_chat(
+        chat_id, user_id, await get_read_pool(chat_scope(chat_id))
     )
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
 
-    has_next_page = len(messages) > limit
-    next_cursor = messages[-1].id if has_next_page else None
-    paginated_messages = messages[:limit]
+    await _rehydrate_chat(chat)
+    await write_behind_queue.sync_chat(chat_id)
 
-    return ChatMessagesResponse(
-        total=total,
-        next_cursor=next_cursor,
-        messages=[
-            ChatMessageResponse(
-                id=mes.id,
-                content=mes.content,
-                agent=(
-                    Agent(id=str(mes.agent["id"]), name=str(mes.agent["name"]))
-                    if mes.agent
-                    else None
-                ),
-                role=ChatRole(mes.role),
-                timestamp=mes.timestamp,
-                chat_id=mes.chatId,
-                group_id=mes.groupId,
-                upload_files=[
-                    ChatMessageUploadFile(
-                        id=file.id, filename=file.filename, description=file.description
-                    )
-                    for file in (mes.uploadFiles or [])
-                ],
-            )
-            for mes in paginated_messages
-        ],
+    row = await chat_repository.get_message(
+        chat_id, message_id, await get_read_pool(chat_scope(chat_id))
     )
+    if not row or row["role"] != ChatRole.SYSTEM:
+        raise HTTPException(status_code=404, detail="Thinking message not found")
 
+    return ChatMessageResponse(**row)
 
-async def get_chat_list(
+
+async def get_messages_etag(
+    user_id: str,
+    chat_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    stub_thinking: bool = False,
+) -> Optional[str]:
+    """
+    ETag of a history page, None when the chat isn't found or the message
+    cache can't vouch for it. The first read of a chat warms the cache, later
+    ones get an ETag.
+    """
+    chat = await chat_repository.get_chat(
+        chat_id, user_id, await get_read_pool(chat_scope(chat_id))
+    )
+    if not chat:
+        return None
+
+    # Drops the cache, so the rehydrated page isn't tagged with the empty one
+    await _rehydrate_chat(chat)
+
+    version = await get_cache_version(chat_id)
+    if version is None:
+        return None
+
+    return make_etag("messages", chat_id, limit, cursor, stub_thinking, *version)
+
+
+async def get_chat_list_etag(
     user_id: str, limit: int, cursor: Optional[str] = None
-) -> ChatsResponse:
-    db = await get_db()
+) -> Optional[str]:
+    """ETag of a chat list page, None when the chat index can't vouch for it"""
+    version = await get_chat_index_version(user_id)
+    if version is None:
+        return None
+
+    return make_etag("chats", user_id, limit, cursor, version)
 
-    total = await db.chat.count(where={"userId": user_id})
-    query_args = {
-        "where": {"userId": user_id},
-        "order": {"timestamp": "desc"},
-        "take": limit + 1,  # Fetch one extra to check for next page
-    }
 
+async def get_chat_list(
+    user_id: str, limit: int, cursor: Optional[str] = None
+) -> ChatsResponse:
+    try:
+        indexed_chats = await get_indexed_chat_list(user_id, limit, cursor)
+        if indexed_chats is not None:
+            return indexed_chats
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning(f"Chat index unavailable, reading chats from Postgres: {e}")
+
+    db = await get_read_db(user_scope(user_id))
+
+    # Only the first page carries the total, later pages skip the count
+    total = None
+    where: ChatWhereInput = {"userId": user_id}
     if cursor:
-        query_args["cursor"] = {"id": cursor}
-        query_args["skip"] = 1  # Skip the cursor itself
+        timestamp, last_id = decode_cursor(cursor, float, str)
+        where["OR"] = [
+            {"timestamp": {"lt": timestamp}},
+            {"timestamp": timestamp, "id": {"lt": last_id}},
+        ]
+    else:
+        total = await db.chat.count(where=where)
 
-    chats = await db.chat.find_many(**query_args)
+    chats = await db.chat.find_many(
+        where=where,
+        order=[{"timestamp": "desc"}, {"id": "desc"}],
+        take=limit + 1,  # Fetch one extra to check for next page
+    )
 
     has_next_page = len(chats) > limit
-    next_cursor = chats[-1].id if has_next_page else None
     paginated_chats = chats[:limit]
+    next_cursor = (
+        encode_cursor(paginated_chats[-1].timestamp, paginated_chats[-1].id)
+        if has_next_page
+        else None
+    )
+
+    previews = await get_last_message_previews([chat.id for chat in paginated_chats])
+
+    # Touches not flushed yet, best effort since Redis may be what failed
+    timestamps = {chat.id: chat.timestamp for chat in paginated_chats}
+    try:
+        timestamps = await chat_touch_buffer.get_fresh_timestamps(timestamps)
+    except Exception as e:
+        logger.warning(f"Pending chat touches unavailable: {e}")
 
     return ChatsResponse(
         total=total,
@@ -236,20 +467,69 @@ async def get_chat_list(
             ChatResponse(
                 id=chat.id,
                 title=chat.title,
-                timestamp=chat.timestamp,
+                timestamp=timestamps[chat.id],
+                last_message=previews.get(chat.id),
             )
             for chat in paginated_chats
         ],
     )
 
 
+async def search_chat_messages(
+    user_id: str, query: str, limit: int, cursor: Optional[str] = None
+) -> ChatSearchResponse:
+    after = None
+    if cursor:
+        rank, last_id = decode_cursor(cursor, float, str)
+        after = (rank, last_id)
+
+    rows = await chat_repository.search_messages(
+        user_id,
+        query,
+        limit + 1,  # Fetch one extra to check for next page
+        after,
+        await get_read_pool(user_scope(user_id)),
+    )
+
+    has_next_page = len(rows) > limit
+    paginated_rows = rows[:limit]
+
+    return ChatSearchResponse(
+        next_cursor=(
+            encode_cursor(paginated_rows[-1]["rank"], paginated_rows[-1]["id"])
+            if has_next_page
+            else None
+        ),
+        results=[
+            ChatSearchResult(
+                message_id=row["id"],
+                chat_id=row["chat_id"],
+                chat_title=row["chat_title"],
+                role=ChatRole(row["role"]),
+                timestamp=row["timestamp"],
+                snippet=row["snippet"],
+                rank=row["rank"],
+            )
+            for row in paginated_rows
+        ],
+    )
+
+
 async def delete_chat_of_user(user_id: str, chat_id: str) -> None:
     db = await get_db()
 
-    deleted = await db.chat.delete_many(where={"id": chat_id, "userId": user_id})
-    if deleted == 0:
+    chat = await db.chat.find_first(where={"id": chat_id, "userId": user_id})
+    if not chat:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Chat Not Found")
 
+    await write_behind_queue.discard_chat(chat_id)
+
+    await pin_to_primary(user_scope(user_id), chat_scope(chat_id))
+    await db.chat.delete(where={"id": chat_id})
+    await remove_chat(user_id, chat_id)
+    await invalidate_messages(chat_id)
+    await chat_gc.schedule(user_id, chat_id)
+
 
 async def get_connectors(user_id: str) -> List[Connector]:
     db = await get_db()
@@ -271,19 +551,6 @@ async def get_user_fullname(user_id: str) -> str:
 
 
 async def get_asked_files(chat_id: str) -> List[ChatMessageUploadFile]:
-    db = await get_db()
-
-    results = await db.chatmessage.find_many(
-        where={"chatId": chat_id}, include={"uploadFiles": True}
-    )
-
-    files_dict = {
-        file.id: file
-        for chatmessage in results
-        for file in (chatmessage.uploadFiles or [])
-    }
+    await write_behind_queue.sync_chat(chat_id)
 
-    return [
-        {"id": file.id, "filename": file.filename, "description": file.description}
-        for file in files_dict.values()
-    ]
+    return await chat_repository.get_asked_files(chat_id)  # type: ignore
@@ -4,6 +4,8 @@ from fastapi import HTTPException, status
 from fastapi.responses import RedirectResponse
 
 from api.v1.schema.connector import ConnectorsResponse
+from core.etag import make_etag
+from core.read_routing import get_read_db, pin_to_primary, user_scope
 from db.prisma.generated.enums import ConnectorType as PrismaConnectorType
 from db.prisma.utils import get_db
 from enums.connector_type import ConnectorType
@@ -22,6 +24,7 @@ async def upsert_connector_of_user(
 
     db = await get_db()
 
+    await pin_to_primary(user_scope(user_id))
     await db.connector.upsert(
         where={"connector_id": connector_id},
         data={
@@ -37,8 +40,20 @@ async def upsert_connector_of_user(
     return RedirectResponse(current_uri, status_code=status.HTTP_302_FOUND)
 
 
+async def get_connectors_etag(user_id: str) -> str:
+    db = await get_read_db(user_scope(user_id))
+
+    version = await db.query_first(
+        'SELECT count(*) AS count, max("updatedAt") AS updated_at '
+        'FROM "Connector" WHERE "userId" = $1',
+        user_id,
+    )
+
+    return make_etag("connectors", user_id, version["count"], version["updated_at"])
+
+
 async def get_connectors_of_user(user_id: str) -> ConnectorsResponse:
-    db = await get_db()
+    db = await get_read_db(user_scope(user_id))
 
     connectors = await db.connector.find_many(
         where={"userId": user_id}, order={"createdAt": "asc"}
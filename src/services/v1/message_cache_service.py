@@ -0,0 +1,240 @@
+import logging
+from typing import List, Optional
+
+from api.v1.schema.chat import ChatMessageResponse
+from config.settings_config import get_settings
+from core.redis_manager import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Every write bumps the generation, so a warm-up that read Postgres before the
+# write can't overwrite the cache with a stale page, and the history's ETag
+# changes. A missing generation starts from the current time in microseconds
+# rather than 0, so one never comes back after its key expired.
+START_GENERATION = """
+local function start_generation(key)
+    if redis.call('EXISTS', key) == 0 then
+        local now = redis.call('TIME')
+        redis.call('SET', key, now[1] .. string.format('%06d', tonumber(now[2])))
+    end
+end
+"""
+
+# Appends only go to a warm cache, so a partial list never looks complete.
+# KEYS: list, count, generation / ARGV: size, ttl, messages oldest first
+APPEND_SCRIPT = f"""{START_GENERATION}
+start_generation(KEYS[3])
+redis.call('INCR', KEYS[3])
+redis.call('EXPIRE', KEYS[3], ARGV[2])
+if redis.call('EXISTS', KEYS[1]) == 0 or redis.call('EXISTS', KEYS[2]) == 0 then
+    return 0
+end
+for i = 3, #ARGV do
+    redis.call('LPUSH', KEYS[1], ARGV[i])
+end
+redis.call('LTRIM', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+redis.call('INCRBY', KEYS[2], #ARGV - 2)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# KEYS: list, generation / ARGV: ttl, message id, message
+PATCH_SCRIPT = f"""{START_GENERATION}
+start_generation(KEYS[2])
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+for i, item in ipairs(items) do
+    if cjson.decode(item)['id'] == ARGV[2] then
+        redis.call('LSET', KEYS[1], i - 1, ARGV[3])
+        return 1
+    end
+end
+return 0
+"""
+
+# KEYS: list, count, generation / ARGV: ttl
+INVALIDATE_SCRIPT = f"""{START_GENERATION}
+redis.call('DEL', KEYS[1], KEYS[2])
+start_generation(KEYS[3])
+redis.call('INCR', KEYS[3])
+redis.call('EXPIRE', KEYS[3], ARGV[1])
+"""
+
+# Starts the generation of a chat not written lately, so it has a version.
+# KEYS: list, count, generation / ARGV: generation, ttl, total, messages newest first
+WARM_SCRIPT = f"""{START_GENERATION}
+if tonumber(redis.call('GET', KEYS[3]) or '0') ~= tonumber(ARGV[1]) then
+    return 0
+end
+start_generation(KEYS[3])
+redis.call('EXPIRE', KEYS[3], ARGV[2])
+redis.call('DEL', KEYS[1])
+for i = 4, #ARGV do
+    redis.call('RPUSH', KEYS[1], ARGV[i])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('SET', KEYS[2], ARGV[3], 'EX', ARGV[2])
+return 1
+"""
+
+
+def _messages_key(chat_id: str) -> str:
+    # LIST of the newest serialized messages, newest first
+    return f"chat_recent_messages:{chat_id}"
+
+
+def _count_key(chat_id: str) -> str:
+    return f"chat_message_count:{chat_id}"
+
+
+def _generation_key(chat_id: str) -> str:
+    return f"chat_message_generation:{chat_id}"
+
+
+async def invalidate_messages(chat_id: str) -> None:
+    try:
+        await get_redis().eval(
+            INVALIDATE_SCRIPT,
+            3,
+            _messages_key(chat_id),
+            _count_key(chat_id),
+            _generation_key(chat_id),
+            get_settings().message_cache_ttl,
+        )
+    except Exception as e:
+        logger.error(f"Failed to invalidate message cache of chat {chat_id}: {e}")
+
+
+async def cache_new_messages(chat_id: str, messages: List[ChatMessageResponse]) -> None:
+    """Prepend newly saved messages (oldest first) to a warm cache"""
+    if not messages:
+        return
+
+    try:
+        await get_redis().eval(
+            APPEND_SCRIPT,
+            3,
+            _messages_key(chat_id),
+            _count_key(chat_id),
+            _generation_key(chat_id),
+            get_settings().message_cache_size,
+            get_settings().message_cache_ttl,
+            *[msg.model_dump_json() for msg in messages],
+        )
+    except Exception as e:
+        logger.warning(f"Message cache append failed for chat {chat_id}: {e}")
+        await invalidate_messages(chat_id)
+
+
+async def patch_cached_message(chat_id: str, message: ChatMessageResponse) -> None:
+    """Replace a cached message in place, if it is still among the newest ones"""
+    try:
+        await get_redis().eval(
+            PATCH_SCRIPT,
+            2,
+            _messages_key(chat_id),
+            _generation_key(chat_id),
+            get_settings().message_cache_ttl,
+            message.id,
+            message.model_dump_json(),
+        )
+    except Exception as e:
+        logger.warning(f"Message cache patch failed for chat {chat_id}: {e}")
+        await invalidate_messages(chat_id)
+
+
+async def get_cache_generation(chat_id: str) -> Optional[int]:
+    """Read before loading messages from Postgres, then pass to `warm_messages`"""
+    try:
+        return int(await get_redis().get(_generation_key(chat_id)) or 0)
+    except Exception as e:
+        logger.warning(f"Message cache read failed for chat {chat_id}: {e}")
+        return None
+
+
+async def get_cache_version(chat_id: str) -> Optional[tuple[int, int]]:
+    """
+    Generation and message count of a chat, which change with every write
+    (committed or not), or None when the cache is cold and can't vouch for them
+    """
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.get(_generation_key(chat_id))
+        pipe.get(_count_key(chat_id))
+        generation, count = await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Message cache read failed for chat {chat_id}: {e}")
+        return None
+
+    if generation is None or count is None:
+        return None
+
+    return int(generation), int(count)
+
+
+async def warm_messages(
+    chat_id: str,
+    generation: Optional[int],
+    messages: List[ChatMessageResponse],
+    total: int,
+) -> None:
+    """Fill the cache with the newest messages (newest first) read from Postgres"""
+    if not messages or generation is None:
+        return
+
+    try:
+        await get_redis().eval(
+            WARM_SCRIPT,
+            3,
+            _messages_key(chat_id),
+            _count_key(chat_id),
+            _generation_key(chat_id),
+            generation,
+            get_settings().message_cache_ttl,
+            total,
+            *[
+                msg.model_dump_json()
+                for msg in messages[: get_settings().message_cache_size]
+            ],
+        )
+    except Exception as e:
+        logger.warning(f"Message cache warm-up failed for chat {chat_id}: {e}")
+
+
+async def get_cached_first_page(
+    chat_id: str, limit: int
+) -> Optional[tuple[List[ChatMessageResponse], int]]:
+    """
+    Return up to `limit + 1` newest messages and the total count, or None when
+    the cache can't answer.
+    """
+    if limit >= get_settings().message_cache_size:
+        return None
+
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.lrange(_messages_key(chat_id), 0, -1)
+        pipe.get(_count_key(chat_id))
+        items, total = await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Message cache read failed for chat {chat_id}: {e}")
+        return None
+
+    if not items or total is None:
+        return None
+
+    # Appends land in commit order, which concurrent turns may interleave,
+    # so order like the Postgres keyset
+    messages = sorted(
+        (ChatMessageResponse.model_validate_json(item) for item in items),
+        key=lambda msg: (msg.timestamp, msg.id),
+        reverse=True,
+    )
+
+    total = int(total)
+    if len(messages) <= limit and total > len(messages):
+        return None  # Older messages exist but aren't cached
+
+    return messages[: limit + 1], total
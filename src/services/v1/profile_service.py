@@ -1,14 +1,28 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from fastapi import HTTPException
 
 from api.v1.schema.profile import ProfileResponse
+from core.etag import make_etag
+from core.read_routing import get_read_db, pin_to_primary, user_scope
 from db.prisma.generated.types import UserUpdateInput
 from db.prisma.utils import get_db
 
 
+async def get_profile_etag(user_id: str) -> Optional[str]:
+    db = await get_read_db(user_scope(user_id))
+
+    user = await db.query_first(
+        'SELECT "updatedAt" AS updated_at FROM "User" WHERE id = $1', user_id
+    )
+    if not user:
+        return None
+
+    return make_etag("profile", user_id, user["updated_at"])
+
+
 async def get_profile_of_user(user_id: str) -> ProfileResponse:
-    db = await get_db()
+    db = await get_read_db(user_scope(user_id))
 
     user = await db.user.find_first_or_raise(where={"id": user_id})
 
@@ -59,6 +73,7 @@ async def update_profile_of_user(
             status_code=400, detail="No valid fields were provided to update."
         )
 
+    await pin_to_primary(user_scope(user_id))
     updated_user = await db.user.update(
         where={"id": user_id},
         data=UserUpdateInput(**update_data),
@@ -0,0 +1,219 @@
+"""
+Document parsing of uploaded files, run in the parsing process pool.
+
+Functions here take and return picklable values and import nothing from the
+app beyond LangChain, so pool workers stay light to start.
+"""
+
+from typing import List
+
+import pymupdf
+from langchain.schema import Document
+from langchain.text_splitter import Language, RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import (
+    CSVLoader,
+    JSONLoader,
+    PyMuPDFLoader,
+    TextLoader,
+    UnstructuredEmailLoader,
+    UnstructuredExcelLoader,
+    UnstructuredFileLoader,
+    UnstructuredHTMLLoader,
+    UnstructuredPowerPointLoader,
+    UnstructuredRTFLoader,
+    UnstructuredWordDocumentLoader,
+    UnstructuredXMLLoader,
+)
+
+SUPPORTED_EXTENSIONS = {
+    # Text files
+    ".txt": TextLoader,
+    ".md": TextLoader,
+    ".markdown": TextLoader,
+    ".rst": TextLoader,
+    ".rtf": UnstructuredRTFLoader,
+    # PDF files
+    ".pdf": PyMuPDFLoader,
+    # CSV and data files
+    ".csv": CSVLoader,
+    ".tsv": CSVLoader,  # Tab-separated values
+    # Microsoft Office documents
+    ".docx": UnstructuredWordDocumentLoader,
+    ".doc": UnstructuredWordDocumentLoader,
+    ".xlsx": UnstructuredExcelLoader,
+    ".xls": UnstructuredExcelLoader,
+    ".pptx": UnstructuredPowerPointLoader,
+    ".ppt": UnstructuredPowerPointLoader,
+    # Structured data
+    ".json": JSONLoader,
+    ".jsonl": JSONLoader,
+    ".xml": UnstructuredXMLLoader,
+    ".yaml": UnstructuredFileLoader,
+    ".yml": UnstructuredFileLoader,
+    # Web formats
+    ".html": UnstructuredHTMLLoader,
+    ".htm": UnstructuredHTMLLoader,
+    # Email formats
+    ".eml": UnstructuredEmailLoader,
+    ".msg": UnstructuredEmailLoader,
+    # OpenDocument formats (LibreOffice)
+    ".odt": UnstructuredFileLoader,  # OpenDocument Text
+    ".ods": UnstructuredFileLoader,  # OpenDocument Spreadsheet
+    ".odp": UnstructuredFileLoader,  # OpenDocument Presentation
+    # Code files (treated as text)
+    ".py": TextLoader,
+    ".js": TextLoader,
+    ".ts": TextLoader,
+    ".java": TextLoader,
+    ".cpp": TextLoader,
+    ".c": TextLoader,
+    ".cs": TextLoader,
+    ".php": TextLoader,
+    ".rb": TextLoader,
+    ".go": TextLoader,
+    ".rs": TextLoader,
+    ".sql": TextLoader,
+    # Configuration files
+    ".ini": TextLoader,
+    ".cfg": TextLoader,
+    ".conf": TextLoader,
+    ".env": TextLoader,
+    # Log files
+    ".log": TextLoader,
+    # Subtitle files
+    ".srt": TextLoader,
+    ".vtt": TextLoader,
+}
+
+
+def _get_loader(file_path: str, file_extension: str):
+    """Get appropriate loader for file type"""
+    loader_class = SUPPORTED_EXTENSIONS.get(file_extension.lower())
+    if not loader_class:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+
+    # Special handling for different file types
+    if file_extension.lower() == ".json":
+        return loader_class(file_path, jq_schema=".", text_content=False)
+    elif file_extension.lower() == ".jsonl":
+        return loader_class(
+            file_path, jq_schema=".", text_content=False, json_lines=True
+        )
+    elif file_extension.lower() in [".tsv"]:
+        # Handle tab-separated values
+        return CSVLoader(file_path, csv_args={"delimiter": "\t"})
+    elif file_extension.lower() in [".yaml", ".yml", ".odt", ".ods", ".odp"]:
+        return UnstructuredFileLoader(file_path)
+    elif file_extension.lower() in [
+        ".py",
+        ".js",
+        ".ts",
+        ".java",
+        ".cpp",
+        ".c",
+        ".cs",
+        ".php",
+        ".rb",
+        ".go",
+        ".rs",
+        ".sql",
+        ".ini",
+        ".cfg",
+        ".conf",
+        ".env",
+        ".log",
+        ".srt",
+        ".vtt",
+        ".md",
+        ".markdown",
+        ".rst",
+    ]:
+        # Handle code and text files with encoding
+        return TextLoader(file_path, encoding="utf-8")
+
+    return loader_class(file_path)
+
+
+def _get_language_from_extension(file_extension: str) -> Language | None:
+    """Map file extensions to Language enum values for code-aware splitting"""
+    language_map = {
+        ".py": Language.PYTHON,
+        ".js": Language.JS,
+        ".ts": Language.TS,
+        ".java": Language.JAVA,
+        ".cpp": Language.CPP,
+        ".c": Language.C,
+        ".cs": Language.CSHARP,
+        ".php": Language.PHP,
+        ".rb": Language.RUBY,
+        ".go": Language.GO,
+        ".rs": Language.RUST,
+        ".html": Language.HTML,
+        ".htm": Language.HTML,
+        ".md": Language.MARKDOWN,
+        ".markdown": Language.MARKDOWN,
+    }
+    return language_map.get(file_extension.lower())
+
+
+def load_text(file_path: str) -> List[Document]:
+    """Load a file as plain text, the fallback of every loader"""
+    loader = TextLoader(file_path, encoding="utf-8")
+    return loader.load()
+
+
+def load_documents(file_path: str, file_extension: str) -> List[Document]:
+    """Load a whole file with the loader of its type"""
+    try:
+        loader = _get_loader(file_path, file_extension)
+        return loader.load()
+    except Exception as e:
+        # Fallback to TextLoader for unsupported file types
+        try:
+            return load_text(file_path)
+        except Exception:
+            raise ValueError(f"Could not process file {file_path}: {str(e)}")
+
+
+def count_pdf_pages(file_path: str) -> int:
+    with pymupdf.open(file_path) as pdf:
+        return pdf.page_count
+
+
+def load_pdf_pages(file_path: str, start: int, end: int) -> List[Document]:
+    """Load pages [start, end) of a PDF, one document per page like PyMuPDFLoader"""
+    with pymupdf.open(file_path) as pdf:
+        metadata = {
+            **{key: value for key, value in pdf.metadata.items() if value},
+            "source": file_path,
+            "file_path": file_path,
+            "total_pages": pdf.page_count,
+        }
+        return [
+            Document(
+                page_content=pdf[page].get_text(), metadata={**metadata, "page": page}
+            )
+            for page in range(start, end)
+        ]
+
+
+def split_documents(documents: List[Document], file_extension: str) -> List[Document]:
+    """Split documents into chunks, code-aware for programming languages"""
+    language = _get_language_from_extension(file_extension)
+
+    if language:
+        # Use code-aware splitter for programming languages
+        text_splitter = RecursiveCharacterTextSplitter.from_language(
+            language=language,
+            chunk_size=1000,
+            chunk_overlap=200,
+        )
+    else:
+        # Use default text splitter for other file types
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200,
+            length_function=len,
+        )
+
+    return text_splitter.split_documents(documents)
@@ -1,187 +1,91 @@
+import asyncio
 import logging
+import os
 import re
 import shutil
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, BinaryIO, Dict, List, Optional
 
-import aiofiles
 import ollama
 from fastapi import HTTPException, UploadFile
 from langchain.schema import Document
-from langchain.text_splitter import Language, RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import (
-    CSVLoader,
-    JSONLoader,
-    PyMuPDFLoader,
-    TextLoader,
-    UnstructuredEmailLoader,
-    UnstructuredExcelLoader,
-    UnstructuredFileLoader,
-    UnstructuredHTMLLoader,
-    UnstructuredPowerPointLoader,
-    UnstructuredRTFLoader,
-    UnstructuredWordDocumentLoader,
-    UnstructuredXMLLoader,
-)
 
-from api.v1.schema.chat import UploadFileChunkResponse
+from api.v1.schema.chat import (
+    UploadFileChunkResponse,
+    UploadFileChunksResponse,
+    UploadFileStatusResponse,
+)
 from config.settings_config import get_settings
+from core.ingestion_queue import ingestion_queue
+from core.parsing_pool import parsing_pool
 from core.qdrant import add_documents_to_qdrant, delete_documents
+from core.read_routing import pin_to_primary, user_scope
+from core.upload_manifest import (
+    begin_chunk,
+    delete_manifest,
+    finalize_lock,
+    get_manifest,
+    get_received_chunks,
+    get_upload_dir,
+    record_chunk,
+)
 from db.prisma.utils import get_db
+from enums.ingestion import IngestionStatus
+from services.v1.upload_parser import (
+    count_pdf_pages,
+    load_documents,
+    load_pdf_pages,
+    load_text,
+    split_documents,
+)
 
 logger = logging.getLogger(__name__)
 
-SUPPORTED_EXTENSIONS = {
-    # Text files
-    ".txt": TextLoader,
-    ".md": TextLoader,
-    ".markdown": TextLoader,
-    ".rst": TextLoader,
-    ".rtf": UnstructuredRTFLoader,
-    # PDF files
-    ".pdf": PyMuPDFLoader,
-    # CSV and data files
-    ".csv": CSVLoader,
-    ".tsv": CSVLoader,  # Tab-separated values
-    # Microsoft Office documents
-    ".docx": UnstructuredWordDocumentLoader,
-    ".doc": UnstructuredWordDocumentLoader,
-    ".xlsx": UnstructuredExcelLoader,
-    ".xls": UnstructuredExcelLoader,
-    ".pptx": UnstructuredPowerPointLoader,
-    ".ppt": UnstructuredPowerPointLoader,
-    # Structured data
-    ".json": JSONLoader,
-    ".jsonl": JSONLoader,
-    ".xml": UnstructuredXMLLoader,
-    ".yaml": UnstructuredFileLoader,
-    ".yml": UnstructuredFileLoader,
-    # Web formats
-    ".html": UnstructuredHTMLLoader,
-    ".htm": UnstructuredHTMLLoader,
-    # Email formats
-    ".eml": UnstructuredEmailLoader,
-    ".msg": UnstructuredEmailLoader,
-    # OpenDocument formats (LibreOffice)
-    ".odt": UnstructuredFileLoader,  # OpenDocument Text
-    ".ods": UnstructuredFileLoader,  # OpenDocument Spreadsheet
-    ".odp": UnstructuredFileLoader,  # OpenDocument Presentation
-    # Code files (treated as text)
-    ".py": TextLoader,
-    ".js": TextLoader,
-    ".ts": TextLoader,
-    ".java": TextLoader,
-    ".cpp": TextLoader,
-    ".c": TextLoader,
-    ".cs": TextLoader,
-    ".php": TextLoader,
-    ".rb": TextLoader,
-    ".go": TextLoader,
-    ".rs": TextLoader,
-    ".sql": TextLoader,
-    # Configuration files
-    ".ini": TextLoader,
-    ".cfg": TextLoader,
-    ".conf": TextLoader,
-    ".env": TextLoader,
-    # Log files
-    ".log": TextLoader,
-    # Subtitle files
-    ".srt": TextLoader,
-    ".vtt": TextLoader,
-}
-
-
-def _get_loader(file_path: str, file_extension: str):
-    """Get appropriate loader for file type"""
-    loader_class = SUPPORTED_EXTENSIONS.get(file_extension.lower())
-    if not loader_class:
-        raise ValueError(f"Unsupported file type: {file_extension}")
-
-    # Special handling for different file types
-    if file_extension.lower() == ".json":
-        return loader_class(file_path, jq_schema=".", text_content=False)
-    elif file_extension.lower() == ".jsonl":
-        return loader_class(
-            file_path, jq_schema=".", text_content=False, json_lines=True
+# Bytes copied from a spooled chunk per write, bounds the memory of an upload
+UPLOAD_BUFFER_SIZE = 1024 * 1024
+
+
+async def _load_documents(file_path: str, file_extension: str) -> List[Document]:
+    if file_extension.lower() != ".pdf":
+        return await parsing_pool.run(load_documents, file_path, file_extension)
+
+    # Page ranges are parsed in parallel, then put back in order
+    try:
+        total_pages = await parsing_pool.run(count_pdf_pages, file_path)
+        shard_size = get_settings().parsing_pages_per_shard
+        shards = await asyncio.gather(
+            *(
+                parsing_pool.run(
+                    load_pdf_pages,
+                    file_path,
+                    start,
+                    min(start + shard_size, total_pages),
+                )
+                for start in range(0, total_pages, shard_size)
+            )
         )
-    elif file_extension.lower() in [".tsv"]:
-        # Handle tab-separated values
-        return CSVLoader(file_path, csv_args={"delimiter": "\t"})
-    elif file_extension.lower() in [".yaml", ".yml", ".odt", ".ods", ".odp"]:
-        return UnstructuredFileLoader(file_path)
-    elif file_extension.lower() in [
-        ".py",
-        ".js",
-        ".ts",
-        ".java",
-        ".cpp",
-        ".c",
-        ".cs",
-        ".php",
-        ".rb",
-        ".go",
-        ".rs",
-        ".sql",
-        ".ini",
-        ".cfg",
-        ".conf",
-        ".env",
-        ".log",
-        ".srt",
-        ".vtt",
-        ".md",
-        ".markdown",
-        ".rst",
-    ]:
-        # Handle code and text files with encoding
-        return TextLoader(file_path, encoding="utf-8")
-
-    return loader_class(file_path)
-
-
-def _get_language_from_extension(file_extension: str) -> Language | None:
-    """Map file extensions to Language enum values for code-aware splitting"""
-    language_map = {
-        ".py": Language.PYTHON,
-        ".js": Language.JS,
-        ".ts": Language.TS,
-        ".java": Language.JAVA,
-        ".cpp": Language.CPP,
-        ".c": Language.C,
-        ".cs": Language.CSHARP,
-        ".php": Language.PHP,
-        ".rb": Language.RUBY,
-        ".go": Language.GO,
-        ".rs": Language.RUST,
-        ".html": Language.HTML,
-        ".htm": Language.HTML,
-        ".md": Language.MARKDOWN,
-        ".markdown": Language.MARKDOWN,
-    }
-    return language_map.get(file_extension.lower())
-
-
-def _process_file(
+    except Exception as e:
+        # Fallback to TextLoader, like the other file types
+        try:
+            return await parsing_pool.run(load_text, file_path)
+        except Exception:
+            raise ValueError(f"Could not process file {file_path}: {str(e)}")
+
+    return [doc for shard in shards for doc in shard]
+
+
+async def _process_file(
     user_id: str,
     file_id: str,
     file_path: str,
     metadata: Optional[Dict[str, Any]] = None,
 ) -> List[Document]:
-    """Process a file and return chunked documents"""
+    """Process a file in the parsing pool and return chunked documents"""
     file_extension = Path(file_path).suffix
 
-    try:
-        loader = _get_loader(file_path, file_extension)
-        documents = loader.load()
-    except Exception as e:
-        # Fallback to TextLoader for unsupported file types
-        try:
-            loader = TextLoader(file_path, encoding="utf-8")
-            documents = loader.load()
-        except Exception:
-            raise ValueError(f"Could not process file {file_path}: {str(e)}")
+    documents = await _load_documents(file_path, file_extension)
 
     # Add metadata to documents
     for doc in documents:
@@ -192,25 +96,7 @@ def _process_file(
         doc.metadata["file_extension"] = file_extension
         doc.metadata["processed_at"] = datetime.now().isoformat()
 
-    # Choose appropriate text splitter based on file type
-    language = _get_language_from_extension(file_extension)
-
-    if language:
-        # Use code-aware splitter for programming languages
-        text_splitter = RecursiveCharacterTextSplitter.from_language(
-            language=language,
-            chunk_size=1000,
-            chunk_overlap=200,
-        )
-    else:
-        # Use default text splitter for other file types
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-
-    chunks = text_splitter.split_documents(documents)
+    chunks = await parsing_pool.run(split_documents, documents, file_extension)
 
     # Add chunk metadata
     for i, split in enumerate(chunks):
@@ -240,6 +126,97 @@ def _get_description(documents: List[Document]):
     return description
 
 
+async def ingest_uploaded_file(job: Dict[str, str]) -> None:
+    """
+    Parse, embed and describe a merged upload, run by the ingestion queue.
+    The merged file is kept until it succeeds, for the next attempt.
+    """
+    user_id, file_id, file_name = job["user_id"], job["file_id"], job["file_name"]
+    temp_dir = get_upload_dir(file_id)
+
+    await ingestion_queue.set_status(job, IngestionStatus.PARSING)
+    docs = await _process_file(user_id, file_id, str(temp_dir / file_name))
+
+    await ingestion_queue.set_status(job, IngestionStatus.EMBEDDING)
+    # Stable point ids, a retry overwrites what a failed attempt stored
+    ids = [
+        str(uuid.uuid5(uuid.NAMESPACE_URL, f"{file_id}:{i}")) for i in range(len(docs))
+    ]
+    await add_documents_to_qdrant(docs, ids)
+
+    await ingestion_queue.set_status(job, IngestionStatus.DESCRIBING)
+    description = await asyncio.to_thread(_get_description, docs)
+
+    db = await get_db()
+    updated = await db.uploadfile.update(
+        where={"id": file_id}, data={"description": description}
+    )
+    if updated is None:
+        # Deleted while it was ingested, drop what was stored meanwhile
+        await asyncio.to_thread(
+            delete_documents, {"user_id": user_id, "file_id": file_id}
+        )
+
+    await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
+
+
+async def discard_failed_upload(job: Dict[str, str]) -> None:
+    """
+    Remove what an upload whose ingestion failed for good left: its points,
+    its row (stored at enqueue) and its merged file. Without the row, chats
+    can't reference the file and its status isn't reported as ready once the
+    job expires.
+    """
+    user_id, file_id = job["user_id"], job["file_id"]
+
+    await asyncio.to_thread(delete_documents, {"user_id": user_id, "file_id": file_id})
+
+    await pin_to_primary(user_scope(user_id))
+    db = await get_db()
+    await db.uploadfile.delete_many(where={"id": file_id, "userId": user_id})
+
+    await asyncio.to_thread(shutil.rmtree, get_upload_dir(file_id), ignore_errors=True)
+
+
+def _write_chunk(chunk: BinaryIO, file_path: Path, offset: int, chunk_size: int) -> int:
+    """
+    Copy a chunk spooled by Starlette to its offset in the file, returns its
+    size. Runs in a worker thread.
+    """
+    size = chunk.seek(0, os.SEEK_END)
+    if size > chunk_size:
+        raise HTTPException(400, "Chunk larger than chunk_size")
+
+    chunk.seek(0)
+    with open(file_path, "r+b") as f:
+        if size and hasattr(os, "posix_fallocate"):
+            # Reserve the range first, a full disk fails before any copy
+            os.posix_fallocate(f.fileno(), offset, size)
+        f.seek(offset)
+        shutil.copyfileobj(chunk, f, UPLOAD_BUFFER_SIZE)
+    return size
+
+
+async def _get_chunk_size(
+    chunk: UploadFile, file_id: str, chunk_index: int, total_chunks: int
+) -> int:
+    """
+    chunk_size of a client that doesn't send it: the one of the upload, or
+    else the size of this chunk, which only the last one may not have
+    """
+    manifest = await get_manifest(file_id)
+    if manifest is not None:
+        return int(manifest["chunk_size"])
+
+    if chunk_index == total_chunks - 1 and total_chunks > 1:
+        raise HTTPException(400, "chunk_size is required to send the last chunk first")
+
+    size = chunk.size if chunk.size is not None else chunk.file.seek(0, os.SEEK_END)
+    if not size and total_chunks > 1:
+        raise HTTPException(400, "Only the last chunk may be empty")
+    return size
+
+
 async def upload_file_chunks(
     chunk: UploadFile,
     user_id: str,
@@ -247,54 +224,143 @@ async def upload_file_chunks(
     file_name: str,
     chunk_index: int,
     total_chunks: int,
+    chunk_size: Optional[int] = None,
 ) -> UploadFileChunkResponse:
-    temp_dir = Path(get_settings().rag_agent_upload_temp_dir) / file_id
-    chunks_dir = temp_dir / "chunks"
-    chunks_dir.mkdir(parents=True, exist_ok=True)
-
-    # Save the incoming chunk
-    chunk_path = chunks_dir / f"chunk_{chunk_index}"
-    async with aiofiles.open(chunk_path, "wb") as f:
-        content = await chunk.read()
-        await f.write(content)
-
-    # If it's the last chunk, merge all parts
-    if chunk_index == total_chunks - 1:
-        final_path = temp_dir / file_name
-        async with aiofiles.open(final_path, "wb") as outfile:
-            for i in range(total_chunks):
-                part = chunks_dir / f"chunk_{i}"
-                if not part.exists():
-                    raise HTTPException(400, f"Missing chunk {i}")
-                async with aiofiles.open(part, "rb") as infile:
-                    data = await infile.read()
-                    await outfile.write(data)
+    """
+    Write a chunk in place in the uploaded file. Every chunk but the last has
+    `chunk_size` bytes; clients that don't send it get the size of the first
+    chunk received.
+    """
+    if chunk_index >= total_chunks:
+        raise HTTPException(400, "chunk_index out of range")
+
+    # A chunk resent after the file was assembled
+    job = await ingestion_queue.get_job(file_id)
+    if job and job["status"] != IngestionStatus.FAILED.value:
+        if job["user_id"] != user_id:
+            raise HTTPException(409, "file_id already in use")
+        return UploadFileChunkResponse(
+            file_name=file_name,
+            file_id=file_id,
+            complete=True,
+            status=IngestionStatus(job["status"]),
+        )
 
-        try:
-            docs = _process_file(user_id, file_id, str(final_path))
-            add_documents_to_qdrant(docs)
-            description = _get_description(docs)
+    if chunk_size is None:
+        chunk_size = await _get_chunk_size(chunk, file_id, chunk_index, total_chunks)
+
+    if not await begin_chunk(file_id, user_id, file_name, total_chunks, chunk_size):
+        raise HTTPException(409, "Chunk doesn't match the upload of this file_id")
+
+    # Chunks are written in place in the final file, in any order and in
+    # parallel, so there is no merge
+    temp_dir = get_upload_dir(file_id)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    final_path = temp_dir / file_name
+    final_path.touch(exist_ok=True)
+
+    offset = chunk_index * chunk_size
+    size = await asyncio.to_thread(
+        _write_chunk, chunk.file, final_path, offset, chunk_size
+    )
+    is_last = chunk_index == total_chunks - 1
+    if not is_last and size != chunk_size:
+        raise HTTPException(400, "Only the last chunk may be smaller than chunk_size")
+
+    received = await record_chunk(
+        file_id, chunk_index, offset + size if is_last else None
+    )
+    if received is None:
+        raise HTTPException(409, "Upload expired, start it over")
+    if received < total_chunks:
+        return UploadFileChunkResponse(
+            file_name=file_name, file_id=file_id, complete=False
+        )
+
+    # Whichever chunk completes the file assembles it, once
+    async with finalize_lock(file_id) as acquired:
+        manifest = await get_manifest(file_id) if acquired else None
+        if manifest is not None:
+            # Drops what an earlier, longer attempt wrote past the end
+            await asyncio.to_thread(os.truncate, final_path, int(manifest["size"]))
 
+            # Stored now, so messages can reference the file while it is
+            # ingested, the description is set once it is ready
+            await pin_to_primary(user_scope(user_id))
             db = await get_db()
-            await db.uploadfile.create(
+            await db.uploadfile.upsert(
+                where={"id": file_id},
                 data={
-                    "id": file_id,
-                    "filename": file_name,
-                    "description": description,
-                    "userId": user_id,
-                }
+                    "create": {
+                        "id": file_id,
+                        "filename": file_name,
+                        "description": "",
+                        "userId": user_id,
+                    },
+                    "update": {},
+                },
             )
-        except Exception as e:
-            logger.error(f"Processing error: {e}")
-            raise HTTPException(500, "File processing failed")
-        finally:
-            shutil.rmtree(temp_dir)
 
+            # Parsing, embedding and the description run in the background,
+            # their progress is pushed to the user's sockets
+            await ingestion_queue.enqueue(file_id, user_id, file_name)
+            await delete_manifest(file_id)
+
+    # Without the lock, another request may still be assembling the file
+    job = await ingestion_queue.get_job(file_id)
+    if not job or job["status"] == IngestionStatus.FAILED.value:
         return UploadFileChunkResponse(
-            file_name=file_name, file_id=file_id, complete=True
+            file_name=file_name, file_id=file_id, complete=False
         )
 
-    return UploadFileChunkResponse(file_name=file_name, file_id=file_id, complete=False)
+    return UploadFileChunkResponse(
+        file_name=file_name,
+        file_id=file_id,
+        complete=True,
+        status=IngestionStatus(job["status"]),
+    )
+
+
+async def get_upload_chunks(user_id: str, file_id: str) -> UploadFileChunksResponse:
+    """Chunks received so far of a partial upload, to resume it"""
+    manifest = await get_manifest(file_id)
+    if not manifest or manifest["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+    return UploadFileChunksResponse(
+        file_id=file_id,
+        file_name=manifest["file_name"],
+        total_chunks=int(manifest["total_chunks"]),
+        chunk_size=int(manifest["chunk_size"]),
+        received=await get_received_chunks(file_id),
+    )
+
+
+async def get_upload_status(user_id: str, file_id: str) -> UploadFileStatusResponse:
+    job = await ingestion_queue.get_job(file_id)
+    if job and job["user_id"] == user_id:
+        return UploadFileStatusResponse(
+            file_id=file_id,
+            file_name=job["file_name"],
+            status=IngestionStatus(job["status"]),
+            attempts=int(job["attempts"]),
+            error=job.get("error") or None,
+        )
+
+    # The job expired, failed uploads are deleted so a stored file is ready
+    db = await get_db()
+    upload_file = await db.uploadfile.find_first(
+        where={"userId": user_id, "id": file_id}
+    )
+    if not upload_file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    return UploadFileStatusResponse(
+        file_id=file_id,
+        file_name=upload_file.filename,
+        status=IngestionStatus.READY,
+        attempts=0,
+    )
 
 
 async def delete_uploaded_file(user_id: str, file_id: str) -> None:
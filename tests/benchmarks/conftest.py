@@ -0,0 +1,121 @@
+"""
+Benchmarks, deselected by default: run them with `pytest -m benchmark`.
+
+Each one times an optimized path against the one it replaced, on the same
+data, and reports both in the terminal summary. They need the services of
+the paths they time, like the tests (see tests/conftest.py), and point the
+app's own clients at them.
+"""
+
+import os
+import statistics
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, List
+
+import pytest
+import pytest_asyncio
+from psycopg import Connection
+from psycopg.rows import DictRow, dict_row
+
+from config.settings_config import get_settings
+from db.prisma.utils import disconnect_replica_db, get_db, prisma
+from db.psycopg.utils import close_pool
+
+for app_env, test_env in (
+    ("POSTGRES_DATABASE_URL", "TEST_DATABASE_URL"),
+    ("REDIS_URL", "TEST_REDIS_URL"),
+):
+    if os.environ.get(test_env):
+        os.environ[app_env] = os.environ[test_env]
+get_settings.cache_clear()
+
+# Emptied after every benchmark seeding the database
+TABLES = (
+    '"User"',
+    '"Connector"',
+    '"Chat"',
+    '"ChatMessage"',
+    '"UploadFile"',
+    '"ChatArchive"',
+    '"ChatUploadFile"',
+    '"_ChatMessageToUploadFile"',
+)
+
+_RESULTS: List[str] = []
+
+
+class Bench:
+    """Times calls and reports their p50 and p99"""
+
+    def __init__(self, title: str):
+        _RESULTS.append(title)
+
+    def time(self, name: str, func: Callable[[], Any], runs: int) -> List[float]:
+        func()  # Warm up
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        self.report(name, timings)
+        return timings
+
+    async def time_async(
+        self, name: str, func: Callable[[], Awaitable[Any]], runs: int
+    ) -> List[float]:
+        await func()  # Warm up
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            await func()
+            timings.append(time.perf_counter() - start)
+        self.report(name, timings)
+        return timings
+
+    def report(self, name: str, timings: List[float]) -> None:
+        timings = sorted(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.note(
+            f"{name}: p50 {statistics.median(timings) * 1000:.2f} ms, "
+            f"p99 {p99 * 1000:.2f} ms ({len(timings)} runs)"
+        )
+
+    def note(self, line: str) -> None:
+        _RESULTS.append(f"  {line}")
+
+
+@pytest.fixture
+def bench(request) -> Bench:
+    return Bench(request.node.name)
+
+
+@pytest_asyncio.fixture
+async def app_db() -> AsyncIterator[Connection[DictRow]]:
+    """
+    A connection to seed the database with, in autocommit so the app's
+    clients see the rows. The tables are emptied afterwards, and the app's
+    clients, bound to the benchmark's event loop, closed.
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    with Connection.connect(url, autocommit=True, row_factory=dict_row) as conn:
+        try:
+            yield conn
+        finally:
+            conn.execute(f"TRUNCATE {', '.join(TABLES)} CASCADE")
+            await close_pool()
+            await disconnect_replica_db()
+            if prisma.is_connected():
+                await prisma.disconnect()
+            get_db.cache_clear()
+
+
+def pytest_terminal_summary(terminalreporter) -> None:
+    if not _RESULTS:
+        return
+
+    terminalreporter.write_sep("=", "benchmarks")
+    for line in _RESULTS:
+        terminalreporter.write_line(line)
@@ -0,0 +1,101 @@
+"""
+Archival of inactive chats (user-035) at tens of millions of messages: the
+history page and the hot table before and after the archival job, and the
+rehydration of archived chats. ARCHIVE_BENCH_MESSAGES sets the history size.
+"""
+
+import os
+import random
+import time
+
+import pytest
+
+from db.psycopg import chat_repository
+from db.psycopg.chat_archive_repository import restore_chat
+from db.scripts.archive_inactive_chats import archive_inactive_chats
+
+pytestmark = pytest.mark.benchmark
+
+MESSAGES = int(os.environ.get("ARCHIVE_BENCH_MESSAGES", 20_000_000))
+MESSAGES_PER_CHAT = 100
+CHATS = MESSAGES // MESSAGES_PER_CHAT
+# One chat in ten was active within CHAT_ARCHIVE_AFTER_DAYS
+ACTIVE_EVERY = 10
+RUNS = 500
+
+SEED_QUERIES = [
+    """
+    INSERT INTO "User" (id, "firstName", "nickName", timezone, language, "updatedAt")
+    VALUES ('user', 'Test', 'test', 'UTC', 'en', NOW())
+    """,
+    f"""
+    INSERT INTO "Chat" (id, title, timestamp, "userId", "updatedAt")
+    SELECT
+        'chat-' || c, 'Chat ' || c,
+        CASE WHEN c % {ACTIVE_EVERY} = 0 THEN extract(epoch FROM NOW()) ELSE c END,
+        'user', NOW()
+    FROM generate_series(1, {CHATS}) c
+    """,
+    f"""
+    INSERT INTO "ChatMessage"
+        (id, "chatId", content, role, timestamp, "groupId", "updatedAt")
+    SELECT
+        'message-' || m, 'chat-' || (m % {CHATS} + 1),
+        to_jsonb('Some answer text about message ' || m),
+        (CASE WHEN m % 2 = 0 THEN 'user' ELSE 'assistant' END)::"Role",
+        m, 'group-' || (m / 2), NOW()
+    FROM generate_series(1, {MESSAGES}) m
+    """,
+    'ANALYZE "Chat", "ChatMessage"',
+]
+
+HOT_TABLE_QUERY = """
+SELECT
+    (SELECT count(*) FROM "ChatMessage") AS messages,
+    pg_indexes_size('"ChatMessage"') AS index_bytes
+"""
+
+
+@pytest.mark.asyncio
+async def test_archive_inactive_chats(bench, app_db, redis_client):
+    for query in SEED_QUERIES:
+        app_db.execute(query)
+
+    active = [f"chat-{c}" for c in range(ACTIVE_EVERY, CHATS + 1, ACTIVE_EVERY)]
+    inactive = [f"chat-{c}" for c in range(1, CHATS + 1) if c % ACTIVE_EVERY]
+
+    async def active_page():
+        await chat_repository.get_messages_page(random.choice(active), 21)
+
+    def note_hot_table(when: str) -> None:
+        row = app_db.execute(HOT_TABLE_QUERY).fetchone()
+        assert row is not None
+        bench.note(
+            f"{when}: {row['messages']} hot messages, "
+            f"{row['index_bytes'] / 1024**2:.0f} MB of indexes"
+        )
+
+    note_hot_table("before")
+    await bench.time_async("page before", active_page, RUNS)
+
+    start = time.perf_counter()
+    archived = await archive_inactive_chats()
+    elapsed = time.perf_counter() - start
+    bench.note(
+        f"archived {archived} messages of {len(inactive)} chats in {elapsed:.0f} s"
+    )
+
+    # Deleted rows leave the indexes once vacuumed, like autovacuum would
+    app_db.execute('VACUUM ANALYZE "ChatMessage"')
+    note_hot_table("after")
+    await bench.time_async("page after", active_page, RUNS)
+
+    timings = []
+    for chat_id in random.sample(inactive, RUNS):
+        start = time.perf_counter()
+        restored = await restore_chat(chat_id)
+        timings.append(time.perf_counter() - start)
+        assert restored == MESSAGES_PER_CHAT
+    bench.report("rehydration", timings)
+
+    assert archived == len(inactive) * MESSAGES_PER_CHAT
@@ -0,0 +1,137 @@
+"""
+NDJSON export and import (user-039): the streaming export against paging
+through every chat's history like a client of the history API had to, and
+the import of that export, in time and peak Python memory.
+EXPORT_BENCH_MESSAGES sets the history size.
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict
+
+import pytest
+
+from db.psycopg import chat_repository
+from db.psycopg.chat_export_repository import import_user_records, iter_user_records
+
+pytestmark = pytest.mark.benchmark
+
+MESSAGES = int(os.environ.get("EXPORT_BENCH_MESSAGES", 500_000))
+CHATS = 2000
+FILES = 100
+PAGE_SIZE = 100
+
+SEED_QUERIES = [
+    """
+    INSERT INTO "User" (id, "firstName", "nickName", timezone, language, "updatedAt")
+    VALUES ('user', 'Test', 'test', 'UTC', 'en', NOW())
+    """,
+    f"""
+    INSERT INTO "UploadFile" (id, filename, description, "userId", "updatedAt")
+    SELECT 'file-' || f, 'file' || f || '.pdf', 'About topic ' || f, 'user', NOW()
+    FROM generate_series(1, {FILES}) f
+    """,
+    f"""
+    INSERT INTO "Chat" (id, title, timestamp, "userId", "updatedAt")
+    SELECT 'chat-' || c, 'Chat ' || c, c, 'user', NOW()
+    FROM generate_series(1, {CHATS}) c
+    """,
+    f"""
+    INSERT INTO "ChatMessage"
+        (id, "chatId", content, role, timestamp, "groupId", "updatedAt")
+    SELECT
+        'message-' || m, 'chat-' || (m % {CHATS} + 1),
+        to_jsonb(repeat('Some answer text. ', 20)),
+        (CASE WHEN m % 2 = 0 THEN 'user' ELSE 'assistant' END)::"Role",
+        m, 'group-' || (m / 2), NOW()
+    FROM generate_series(1, {MESSAGES}) m
+    """,
+    f"""
+    INSERT INTO "_ChatMessageToUploadFile" ("A", "B")
+    SELECT 'message-' || m, 'file-' || (m % {FILES} + 1)
+    FROM generate_series(10, {MESSAGES}, 10) m
+    """,
+    'ANALYZE "Chat", "ChatMessage", "UploadFile", "_ChatMessageToUploadFile"',
+]
+
+# Rows of the user, imported again after the export
+DELETE_QUERIES = [
+    """DELETE FROM "Chat" WHERE "userId" = 'user'""",
+    """DELETE FROM "UploadFile" WHERE "userId" = 'user'""",
+]
+
+
+async def _measure(func: Callable[[], Awaitable[Any]]) -> tuple[Any, float, int]:
+    """Result, seconds and peak traced bytes of a call"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = await func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, time.perf_counter() - start, peak
+
+
+@pytest.mark.asyncio
+async def test_export_and_import(bench, app_db, tmp_path):
+    for query in SEED_QUERIES:
+        app_db.execute(query)
+    path = tmp_path / "chats.ndjson"
+
+    async def page_every_chat() -> int:
+        count = 0
+        for chat in range(1, CHATS + 1):
+            messages = []
+            after = None
+            while True:
+                rows, _ = await chat_repository.get_messages_page(
+                    f"chat-{chat}", PAGE_SIZE, after
+                )
+                messages.extend(rows)
+                if len(rows) < PAGE_SIZE:
+                    break
+                after = (rows[-1]["timestamp"], rows[-1]["id"])
+            count += len(messages)
+        return count
+
+    async def export() -> int:
+        count = 0
+        with open(path, "w") as file:
+            async for record in iter_user_records("user"):
+                file.write(json.dumps(record, default=str) + "\n")
+                count += record["type"] == "message"
+        return count
+
+    async def read_export() -> AsyncIterator[Dict[str, Any]]:
+        with open(path) as file:
+            for line in file:
+                yield json.loads(line)
+
+    async def import_export() -> Dict[str, int]:
+        return await import_user_records("user", read_export())
+
+    paged, paging_time, paging_peak = await _measure(page_every_chat)
+    exported, export_time, export_peak = await _measure(export)
+    for query in DELETE_QUERIES:
+        app_db.execute(query)
+    counts, import_time, import_peak = await _measure(import_export)
+
+    mb = 1024 * 1024
+    bench.note(
+        f"paging every chat: {paging_time:.1f} s, {paging_peak / mb:.1f} MB peak"
+    )
+    bench.note(
+        f"export: {export_time:.1f} s, {export_peak / mb:.1f} MB peak, "
+        f"{path.stat().st_size / mb:.0f} MB of NDJSON"
+    )
+    bench.note(
+        f"import: {import_time:.1f} s, {import_peak / mb:.1f} MB peak, "
+        f"{sum(counts.values()) / import_time:.0f} records/s"
+    )
+
+    assert paged == exported == counts["message"] == MESSAGES
+    row = app_db.execute('SELECT count(*) AS count FROM "ChatMessage"').fetchone()
+    assert row is not None and row["count"] == MESSAGES
@@ -0,0 +1,226 @@
+"""
+Chat hot paths (user-032): the psycopg repository against the Prisma
+queries it replaced, on a chat with a long history and asked files.
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from db.prisma.generated._fields import Json
+from db.prisma.generated.enums import Role
+from db.prisma.utils import get_db
+from db.psycopg import chat_repository
+
+pytestmark = pytest.mark.benchmark
+
+RUNS = 200
+MESSAGES = 2000
+FILES = 20
+# A first page read for the recent-messages cache, see MESSAGE_CACHE_SIZE
+PAGE_SIZE = 120
+
+SEED_QUERIES = [
+    """
+    INSERT INTO "User" (id, "firstName", "nickName", timezone, language, "updatedAt")
+    VALUES ('user', 'Test', 'test', 'UTC', 'en', NOW())
+    """,
+    """
+    INSERT INTO "Chat" (id, title, timestamp, "userId", "updatedAt")
+    VALUES ('chat', 'Chat', 0, 'user', NOW())
+    """,
+    f"""
+    INSERT INTO "UploadFile" (id, filename, description, "userId", "updatedAt")
+    SELECT 'file-' || f, 'file' || f || '.pdf', 'About topic ' || f, 'user', NOW()
+    FROM generate_series(1, {FILES}) f
+    """,
+    f"""
+    INSERT INTO "ChatMessage"
+        (id, "chatId", content, role, timestamp, "groupId", "updatedAt")
+    SELECT
+        'message-' || m, 'chat', to_jsonb(repeat('Some answer text. ', 20)),
+        (CASE WHEN m % 2 = 0 THEN 'user' ELSE 'assistant' END)::"Role",
+        m, 'group-' || (m / 2), NOW()
+    FROM generate_series(1, {MESSAGES}) m
+    """,
+    # Every tenth message asks a file
+    f"""
+    INSERT INTO "_ChatMessageToUploadFile" ("A", "B")
+    SELECT 'message-' || m, 'file-' || (m / 10 % {FILES} + 1)
+    FROM generate_series(10, {MESSAGES}, 10) m
+    """,
+    """
+    INSERT INTO "ChatUploadFile" ("chatId", "uploadFileId")
+    SELECT DISTINCT 'chat', "B" FROM "_ChatMessageToUploadFile"
+    """,
+    'ANALYZE "Chat", "ChatMessage", "UploadFile", "_ChatMessageToUploadFile"',
+]
+
+# The keyset of a page in the middle of the history
+AFTER = (MESSAGES / 2, f"message-{MESSAGES // 2}")
+
+
+@pytest.fixture
+def seeded_db(app_db):
+    for query in SEED_QUERIES:
+        app_db.execute(query)
+    return app_db
+
+
+@pytest.mark.asyncio
+async def test_get_chat(bench, seeded_db):
+    db = await get_db()
+
+    async def prisma():
+        await db.chat.find_first(where={"id": "chat", "userId": "user"})
+
+    async def psycopg():
+        await chat_repository.get_chat("chat", "user")
+
+    await bench.time_async("prisma", prisma, RUNS)
+    await bench.time_async("psycopg", psycopg, RUNS)
+
+
+@pytest.mark.asyncio
+async def test_messages_first_page(bench, seeded_db):
+    db = await get_db()
+
+    async def prisma():
+        await db.chatmessage.count(where={"chatId": "chat"})
+        return await db.chatmessage.find_many(
+            where={"chatId": "chat"},
+            order=[{"timestamp": "desc"}, {"id": "desc"}],
+            take=PAGE_SIZE,
+            include={"uploadFiles": True},
+        )
+
+    async def psycopg():
+        rows, _ = await chat_repository.get_messages_page("chat", PAGE_SIZE)
+        return rows
+
+    await bench.time_async("prisma", prisma, RUNS)
+    await bench.time_async("psycopg", psycopg, RUNS)
+
+    messages, rows = await prisma(), await psycopg()
+    assert [m.id for m in messages] == [row["id"] for row in rows]
+    assert [len(m.uploadFiles or []) for m in messages] == [
+        len(row["upload_files"]) for row in rows
+    ]
+
+
+@pytest.mark.asyncio
+async def test_messages_next_page(bench, seeded_db):
+    db = await get_db()
+    timestamp, last_id = AFTER
+
+    async def prisma():
+        return await db.chatmessage.find_many(
+            where={
+                "chatId": "chat",
+                "OR": [
+                    {"timestamp": {"lt": timestamp}},
+                    {"timestamp": timestamp, "id": {"lt": last_id}},
+                ],
+            },
+            order=[{"timestamp": "desc"}, {"id": "desc"}],
+            take=21,
+            include={"uploadFiles": True},
+        )
+
+    async def psycopg():
+        rows, _ = await chat_repository.get_messages_page("chat", 21, AFTER)
+        return rows
+
+    await bench.time_async("prisma", prisma, RUNS)
+    await bench.time_async("psycopg", psycopg, RUNS)
+
+    messages, rows = await prisma(), await psycopg()
+    assert [m.id for m in messages] == [row["id"] for row in rows]
+
+
+@pytest.mark.asyncio
+async def test_asked_files(bench, seeded_db):
+    db = await get_db()
+
+    async def prisma():
+        chat_files = await db.chatuploadfile.find_many(
+            where={"chatId": "chat"},
+            include={"uploadFile": True},
+            order={"createdAt": "asc"},
+        )
+        return [chat_file.uploadFile.id for chat_file in chat_files]
+
+    async def psycopg():
+        return [row["id"] for row in await chat_repository.get_asked_files("chat")]
+
+    await bench.time_async("prisma", prisma, RUNS)
+    await bench.time_async("psycopg", psycopg, RUNS)
+
+    assert sorted(await prisma()) == sorted(await psycopg())
+
+
+@pytest.mark.asyncio
+async def test_save_turn(bench, seeded_db):
+    """A turn: the user's message asking a file and three bot messages"""
+    db = await get_db()
+
+    def turn():
+        group_id = str(uuid.uuid4())
+        timestamp = datetime.now(timezone.utc).timestamp()
+        return [
+            {
+                "id": str(uuid.uuid4()),
+                "content": "Some answer text. " * 20,
+                "role": role,
+                "timestamp": timestamp + i,
+                "group_id": group_id,
+                "upload_file_ids": ["file-1"] if role == Role.user else [],
+            }
+            for i, role in enumerate(
+                [Role.user, Role.system, Role.assistant, Role.assistant]
+            )
+        ]
+
+    # The batch the write-behind queue committed before
+    async def prisma():
+        messages = turn()
+        async with db.batch_() as batcher:
+            batcher.chatmessage.create_many(
+                data=[
+                    {
+                        "id": msg["id"],
+                        "chatId": "chat",
+                        "content": Json(msg["content"]),
+                        "role": msg["role"],
+                        "groupId": msg["group_id"],
+                        "timestamp": msg["timestamp"],
+                    }
+                    for msg in messages[1:]
+                ]
+            )
+            batcher.chatmessage.create(
+                data={
+                    "id": messages[0]["id"],
+                    "chatId": "chat",
+                    "content": Json(messages[0]["content"]),
+                    "role": Role.user,
+                    "groupId": messages[0]["group_id"],
+                    "timestamp": messages[0]["timestamp"],
+                    "uploadFiles": {"connect": [{"id": "file-1"}]},
+                }
+            )
+            batcher.chatuploadfile.create_many(
+                data=[{"chatId": "chat", "uploadFileId": "file-1"}],
+                skip_duplicates=True,
+            )
+
+    async def psycopg():
+        await chat_repository.commit_chat_writes(
+            [{**msg, "chat_id": "chat", "agent": None} for msg in turn()],
+            [{"chat_id": "chat", "upload_file_id": "file-1"}],
+            {},
+        )
+
+    await bench.time_async("prisma", prisma, RUNS)
+    await bench.time_async("psycopg", psycopg, RUNS)
@@ -0,0 +1,66 @@
+"""
+Checkpoint compression (user-044): bytes per checkpoint and the time to
+serialize and deserialize it, with CompressedSerializer against the plain
+JsonPlusSerializer, as the conversation grows.
+"""
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from core.checkpoint_serde import CompressedSerializer
+
+pytestmark = pytest.mark.benchmark
+
+RUNS = 200
+TURNS = [1, 10, 50]
+# The defaults of CHECKPOINT_COMPRESSION_MIN_BYTES and _LEVEL in .env
+MIN_BYTES = 1024
+LEVEL = 3
+
+
+def _messages(turns: int) -> list:
+    """A conversation with a tool call, its output and thinking text per turn"""
+    messages = []
+    for turn in range(turns):
+        messages += [
+            HumanMessage(f"What do my files say about topic {turn}?"),
+            AIMessage(
+                content=[
+                    {
+                        "type": "thinking",
+                        "thinking": f"The user asks about topic {turn}. " * 30,
+                    },
+                    {"type": "text", "text": "Let me search your files."},
+                ],
+                tool_calls=[
+                    {
+                        "id": f"call-{turn}",
+                        "name": "search_files",
+                        "args": {"query": f"topic {turn}"},
+                    }
+                ],
+            ),
+            ToolMessage(
+                f"Chunk of file{turn}.pdf about topic {turn}, page 3. " * 80,
+                tool_call_id=f"call-{turn}",
+            ),
+            AIMessage(f"Your files say this about topic {turn}. " * 20),
+        ]
+    return messages
+
+
+@pytest.mark.parametrize("turns", TURNS)
+def test_checkpoint_serde(bench, turns):
+    value = {"messages": _messages(turns)}
+
+    for name, serde in (
+        ("jsonplus", JsonPlusSerializer()),
+        ("compressed", CompressedSerializer(MIN_BYTES, LEVEL)),
+    ):
+        typed = serde.dumps_typed(value)
+        bench.note(f"{name}: {len(typed[1]) / 1024:.1f} KB ({typed[0]})")
+        bench.time(f"{name} dumps", lambda: serde.dumps_typed(value), RUNS)
+        bench.time(f"{name} loads", lambda: serde.loads_typed(typed), RUNS)
+
+        assert serde.loads_typed(typed) == value
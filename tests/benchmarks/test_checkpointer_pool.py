@@ -0,0 +1,84 @@
+"""
+The checkpointer under concurrent turns (user-042): the saver on the
+checkpointer pool against the single connection of from_conn_string, which
+queues every checkpoint read and write behind the others.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from typing import List
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+
+from db.psycopg.utils import get_checkpointer_pool
+
+pytestmark = pytest.mark.benchmark
+
+CONCURRENCY = [1, 10, 50]
+TURNS_PER_THREAD = 10
+MESSAGES_PER_TURN = 4
+MESSAGE = "Some answer text. " * 50
+
+CHECKPOINT_TABLES = "checkpoints, checkpoint_blobs, checkpoint_writes"
+
+
+async def _turn(saver: AsyncPostgresSaver, thread_id: str) -> float:
+    """A turn's checkpoint traffic: the latest read, a write and its writes"""
+    start = time.perf_counter()
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    latest = await saver.aget_tuple(config)
+    checkpoint = empty_checkpoint()
+    messages = []
+    if latest:
+        config = latest.config
+        messages = latest.checkpoint["channel_values"].get("messages", [])
+        checkpoint["channel_versions"] = dict(latest.checkpoint["channel_versions"])
+
+    version = saver.get_next_version(
+        checkpoint["channel_versions"].get("messages"), None
+    )
+    checkpoint["channel_values"] = {
+        "messages": messages + [MESSAGE] * MESSAGES_PER_TURN
+    }
+    checkpoint["channel_versions"]["messages"] = version
+    config = await saver.aput(
+        config, checkpoint, {"source": "loop", "step": 1}, {"messages": version}
+    )
+    await saver.aput_writes(
+        config, [("messages", [MESSAGE])], str(uuid.uuid4()), "~__pregel_pull"
+    )
+    return time.perf_counter() - start
+
+
+async def _run(saver: AsyncPostgresSaver, threads: int) -> tuple[List[float], float]:
+    """Turn timings and the wall time of `threads` chats taking turns at once"""
+
+    async def chat(thread_id: str) -> List[float]:
+        return [await _turn(saver, thread_id) for _ in range(TURNS_PER_THREAD)]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(chat(str(uuid.uuid4())) for _ in range(threads)))
+    return [t for timings in results for t in timings], time.perf_counter() - start
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("threads", CONCURRENCY)
+async def test_checkpointer_pool(bench, app_db, threads):
+    url = os.environ["TEST_DATABASE_URL"]
+    try:
+        async with AsyncPostgresSaver.from_conn_string(url) as single:
+            await single.setup()
+            timings, elapsed = await _run(single, threads)
+            bench.report("single connection", timings)
+            bench.note(f"single connection: {len(timings) / elapsed:.0f} turns/s")
+
+        pooled = AsyncPostgresSaver(await get_checkpointer_pool())
+        timings, elapsed = await _run(pooled, threads)
+        bench.report("pool", timings)
+        bench.note(f"pool: {len(timings) / elapsed:.0f} turns/s")
+    finally:
+        app_db.execute(f"TRUNCATE {CHECKPOINT_TABLES}")
@@ -0,0 +1,80 @@
+"""
+Search over chat history (user-038) at growing history sizes: latency of
+rare and common words, first and next pages. SEARCH_BENCH_SIZES sets the
+sizes, as comma-separated message counts.
+"""
+
+import os
+
+import pytest
+
+from db.psycopg import chat_repository
+
+pytestmark = pytest.mark.benchmark
+
+SIZES = os.environ.get("SEARCH_BENCH_SIZES", "100000,1000000,10000000").split(",")
+USERS = 50
+MESSAGES_PER_CHAT = 50
+RUNS = 200
+LIMIT = 21
+
+# Every message has a unique word, and the words every message shares
+QUERIES = {
+    "rare word": "word1249",
+    "common word": "weather",
+    "phrase": '"about the weather"',
+}
+
+
+def _seed_queries(messages: int) -> list[str]:
+    chats = messages // MESSAGES_PER_CHAT
+    return [
+        f"""
+        INSERT INTO "User" (id, "firstName", "nickName", timezone, language,
+            "updatedAt")
+        SELECT 'user-' || u, 'Test', 'test', 'UTC', 'en', NOW()
+        FROM generate_series(1, {USERS}) u
+        """,
+        f"""
+        INSERT INTO "Chat" (id, title, timestamp, "userId", "updatedAt")
+        SELECT 'chat-' || c, 'Chat ' || c, c, 'user-' || (c % {USERS} + 1), NOW()
+        FROM generate_series(1, {chats}) c
+        """,
+        f"""
+        INSERT INTO "ChatMessage"
+            (id, "chatId", content, role, timestamp, "groupId", "updatedAt")
+        SELECT
+            'message-' || m, 'chat-' || (m % {chats} + 1),
+            to_jsonb('message word' || m || ' about the weather'),
+            (CASE WHEN m % 2 = 0 THEN 'user' ELSE 'assistant' END)::"Role",
+            m, 'group-' || (m / 2), NOW()
+        FROM generate_series(1, {messages}) m
+        """,
+        'ANALYZE "User", "Chat", "ChatMessage"',
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("messages", [int(size) for size in SIZES])
+async def test_search_latency(bench, app_db, messages):
+    for query in _seed_queries(messages):
+        app_db.execute(query)
+    # "word1249" is in chat-1250 of user-1 at every size
+    user_id = "user-1"
+
+    for name, query in QUERIES.items():
+
+        async def first_page():
+            return await chat_repository.search_messages(user_id, query, LIMIT)
+
+        rows = await first_page()
+        await bench.time_async(f"{name}, first page", first_page, RUNS)
+        if len(rows) < LIMIT:
+            continue
+
+        after = (rows[-1]["rank"], rows[-1]["id"])
+
+        async def next_page():
+            return await chat_repository.search_messages(user_id, query, LIMIT, after)
+
+        await bench.time_async(f"{name}, next page", next_page, RUNS)
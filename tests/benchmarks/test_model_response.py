@@ -0,0 +1,76 @@
+"""
+REST responses (user-041): a 100-message history page returned through
+ModelResponse against FastAPI's validation and encoding of the same page
+against `response_model`, through the app's gzip middleware.
+"""
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+
+from api.v1.schema.chat import ChatMessageResponse, ChatMessagesResponse
+from core.responses import model_response
+from enums.chat import ChatRole
+
+pytestmark = pytest.mark.benchmark
+
+RUNS = 1000
+
+PAGE = ChatMessagesResponse(
+    total=1000,
+    next_cursor="cursor",
+    messages=[
+        ChatMessageResponse(
+            id=f"message-{i}",
+            content="Some answer text with a few sentences in it. " * 10,
+            role=ChatRole.USER if i % 2 else ChatRole.ASSISTANT,
+            timestamp=1718000000.0 + i,
+            chat_id="chat",
+            group_id=f"group-{i // 2}",
+            upload_files=(
+                [{"id": "file", "filename": "a.pdf", "description": "A file"}]
+                if i % 10 == 0
+                else []
+            ),
+            agent={"id": "agent", "name": "Agent"} if i % 2 == 0 else None,
+        )
+        for i in range(100)
+    ],
+)
+
+app = FastAPI()
+app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=6)
+
+
+@app.get("/response-model", response_model=ChatMessagesResponse)
+async def get_with_response_model():
+    return PAGE
+
+
+@app.get("/model-response", response_model=ChatMessagesResponse)
+async def get_with_model_response():
+    return model_response(PAGE)
+
+
+@pytest.mark.asyncio
+async def test_history_page_response(bench):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+        async def response_model():
+            return await client.get("/response-model")
+
+        async def orjson():
+            return await client.get("/model-response")
+
+        await bench.time_async("response_model", response_model, RUNS)
+        await bench.time_async("ModelResponse", orjson, RUNS)
+
+        expected, response = await response_model(), await orjson()
+
+    assert response.json() == expected.json()
+    assert response.headers["content-encoding"] == "gzip"
+    bench.note(
+        f"{len(response.content)} bytes, {response.num_bytes_downloaded} gzipped"
+    )
@@ -0,0 +1,124 @@
+"""
+Parsing throughput per format (user-047): the parsing pool, PDFs sharded by
+page, against loading and splitting in a thread like before.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import statistics
+from typing import Callable, Dict, List
+
+import pymupdf
+import pytest
+import pytest_asyncio
+from langchain.schema import Document
+
+from core.parsing_pool import parsing_pool
+from services.v1.upload_parser import load_documents, split_documents
+from services.v1.upload_service import _load_documents
+
+pytestmark = pytest.mark.benchmark
+
+RUNS = 5
+# Uploads ingested at the same time, each by its own ingestion worker
+CONCURRENT_FILES = 4
+SENTENCE = "The quick brown fox jumps over the lazy dog. "
+
+
+def _write_pdf(path: str) -> None:
+    with pymupdf.open() as pdf:
+        for page in range(200):
+            pdf.new_page().insert_textbox(
+                pymupdf.Rect(36, 36, 576, 756), f"Page {page}\n" + SENTENCE * 40
+            )
+        pdf.save(path)
+
+
+def _write_text(path: str) -> None:
+    with open(path, "w") as f:
+        for line in range(20000):
+            f.write(f"{line} {SENTENCE}\n")
+
+
+def _write_csv(path: str) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "description"])
+        for row in range(20000):
+            writer.writerow([row, f"item {row}", SENTENCE])
+
+
+def _write_json(path: str) -> None:
+    with open(path, "w") as f:
+        json.dump([{"id": i, "text": SENTENCE} for i in range(20000)], f)
+
+
+def _write_python(path: str) -> None:
+    with open(path, "w") as f:
+        for i in range(5000):
+            f.write(f"def function_{i}(value):\n    return value * {i}\n\n\n")
+
+
+WRITERS: Dict[str, Callable[[str], None]] = {
+    ".pdf": _write_pdf,
+    ".txt": _write_text,
+    ".md": _write_text,
+    ".csv": _write_csv,
+    ".json": _write_json,
+    ".py": _write_python,
+}
+
+
+@pytest_asyncio.fixture
+async def pool():
+    await parsing_pool.start()
+    try:
+        yield parsing_pool
+    finally:
+        await parsing_pool.stop()
+
+
+def _in_thread(file_path: str, file_extension: str) -> List[Document]:
+    return split_documents(load_documents(file_path, file_extension), file_extension)
+
+
+async def _in_pool(file_path: str, file_extension: str) -> List[Document]:
+    documents = await _load_documents(file_path, file_extension)
+    return await parsing_pool.run(split_documents, documents, file_extension)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("extension", list(WRITERS))
+async def test_parsing_throughput(bench, pool, tmp_path, extension):
+    file_path = str(tmp_path / f"sample{extension}")
+    WRITERS[extension](file_path)
+    size = os.path.getsize(file_path) / 1024 / 1024
+
+    def thread():
+        return asyncio.gather(
+            *(
+                asyncio.to_thread(_in_thread, file_path, extension)
+                for _ in range(CONCURRENT_FILES)
+            )
+        )
+
+    def pooled():
+        return asyncio.gather(
+            *(_in_pool(file_path, extension) for _ in range(CONCURRENT_FILES))
+        )
+
+    thread_timings = await bench.time_async("thread", thread, RUNS)
+    pool_timings = await bench.time_async("pool", pooled, RUNS)
+    total = size * CONCURRENT_FILES
+    bench.note(
+        f"{CONCURRENT_FILES} x {size:.1f} MB: "
+        f"thread {total / statistics.median(thread_timings):.1f} MB/s, "
+        f"pool {total / statistics.median(pool_timings):.1f} MB/s"
+    )
+
+    # Both paths give the same chunks
+    chunks = await _in_pool(file_path, extension)
+    expected = _in_thread(file_path, extension)
+    assert [c.page_content for c in chunks] == [c.page_content for c in expected]
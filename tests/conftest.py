@@ -0,0 +1,47 @@
+"""
+Shared fixtures.
+
+Tests needing a service only run when it is configured, against a database
+dedicated to tests:
+
+- TEST_DATABASE_URL: a Postgres with the Prisma schema pushed and the search
+  column set up (`prisma db push` then `db.scripts.setup_message_search`).
+  Every test runs in a transaction that is rolled back.
+- TEST_REDIS_URL: a Redis database that is flushed around every test.
+"""
+
+import os
+from typing import Iterator
+
+import pytest
+import redis
+from psycopg import Connection
+from psycopg.rows import DictRow, dict_row
+
+
+@pytest.fixture
+def pg_conn() -> Iterator[Connection[DictRow]]:
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    with Connection.connect(url, row_factory=dict_row) as conn:
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+
+
+@pytest.fixture
+def redis_client() -> Iterator[redis.Redis]:
+    url = os.environ.get("TEST_REDIS_URL")
+    if not url:
+        pytest.skip("TEST_REDIS_URL is not set")
+
+    client = redis.Redis.from_url(url, decode_responses=True)
+    client.flushdb()
+    try:
+        yield client
+    finally:
+        client.flushdb()
+        client.close()
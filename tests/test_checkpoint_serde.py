@@ -0,0 +1,33 @@
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from core.checkpoint_serde import COMPRESSED_SUFFIX, CompressedSerializer
+
+LARGE_VALUE = {"messages": ["the same tool output again"] * 200}
+
+
+def test_small_values_are_not_compressed():
+    serde = CompressedSerializer(min_bytes=1024, level=3)
+
+    type_, data = serde.dumps_typed({"a": 1})
+
+    assert not type_.endswith(COMPRESSED_SUFFIX)
+    assert serde.loads_typed((type_, data)) == {"a": 1}
+
+
+def test_large_values_are_compressed():
+    serde = CompressedSerializer(min_bytes=1024, level=3)
+    _, plain = JsonPlusSerializer().dumps_typed(LARGE_VALUE)
+
+    type_, data = serde.dumps_typed(LARGE_VALUE)
+
+    assert type_.endswith(COMPRESSED_SUFFIX)
+    assert len(data) < len(plain)
+    assert serde.loads_typed((type_, data)) == LARGE_VALUE
+
+
+def test_reads_values_written_without_compression():
+    serde = CompressedSerializer(min_bytes=1024, level=3)
+
+    written = JsonPlusSerializer().dumps_typed(LARGE_VALUE)
+
+    assert serde.loads_typed(written) == LARGE_VALUE
@@ -0,0 +1,134 @@
+"""
+Retries, leases and re-enqueues of the ingestion queue, run against a real
+Redis.
+"""
+
+import os
+import time
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+
+import core.ingestion_queue as ingestion_queue_module
+from core.ingestion_queue import (
+    CLAIM_SCRIPT,
+    PENDING_KEY,
+    IngestionQueue,
+    _job_key,
+)
+from enums.ingestion import IngestionStatus
+
+SETTINGS = SimpleNamespace(
+    ingestion_workers=1,
+    ingestion_max_attempts=2,
+    ingestion_retry_delay=10,
+    ingestion_job_timeout=30,
+    ingestion_job_ttl=60,
+    ingestion_poll_interval=0.01,
+)
+
+
+@pytest_asyncio.fixture
+async def async_redis(monkeypatch) -> AsyncIterator[redis.Redis]:
+    url = os.environ.get("TEST_REDIS_URL")
+    if not url:
+        pytest.skip("TEST_REDIS_URL is not set")
+
+    client = redis.Redis.from_url(url, decode_responses=True)
+    await client.flushdb()
+
+    async def publish(user_id: str, event: Dict) -> None:
+        pass
+
+    monkeypatch.setattr(ingestion_queue_module, "get_redis", lambda: client)
+    monkeypatch.setattr(ingestion_queue_module, "get_settings", lambda: SETTINGS)
+    monkeypatch.setattr(ingestion_queue_module.user_event_hub, "publish", publish)
+    try:
+        yield client
+    finally:
+        await client.flushdb()
+        await client.aclose()
+
+
+def _queue(fail: bool, discarded: List[str]) -> IngestionQueue:
+    async def handler(job: Dict[str, str]) -> None:
+        if fail:
+            raise RuntimeError("parse error")
+
+    async def failure_handler(job: Dict[str, str]) -> None:
+        discarded.append(job["file_id"])
+
+    queue = IngestionQueue()
+    queue._handler = handler
+    queue._failure_handler = failure_handler
+    return queue
+
+
+@pytest.mark.asyncio
+async def test_enqueue_is_idempotent(async_redis):
+    queue = _queue(fail=False, discarded=[])
+
+    assert await queue.enqueue("f", "u", "a.pdf") is True
+    assert await queue.enqueue("f", "u", "a.pdf") is False
+
+    await queue._process("f")
+
+    assert await queue.enqueue("f", "u", "a.pdf") is False
+    assert (await queue.get_job("f"))["status"] == IngestionStatus.READY.value
+
+
+@pytest.mark.asyncio
+async def test_failed_attempt_is_retried_with_backoff(async_redis):
+    discarded: List[str] = []
+    queue = _queue(fail=True, discarded=discarded)
+    await queue.enqueue("f", "u", "a.pdf")
+
+    before = time.time()
+    await queue._process("f")
+
+    job = await queue.get_job("f")
+    assert job["status"] == IngestionStatus.QUEUED.value
+    assert job["attempts"] == "1"
+    assert job["error"] == "parse error"
+    assert await async_redis.zscore(PENDING_KEY, "f") >= before + 10
+    assert discarded == []
+
+
+@pytest.mark.asyncio
+async def test_last_failure_discards_the_upload(async_redis):
+    discarded: List[str] = []
+    queue = _queue(fail=True, discarded=discarded)
+    await queue.enqueue("f", "u", "a.pdf")
+
+    await queue._process("f")
+    await queue._process("f")
+
+    assert (await queue.get_job("f"))["status"] == IngestionStatus.FAILED.value
+    assert await async_redis.zscore(PENDING_KEY, "f") is None
+    assert await async_redis.ttl(_job_key("f")) > 0
+    assert discarded == ["f"]
+
+    # A failed upload can be sent again
+    assert await queue.enqueue("f", "u", "a.pdf") is True
+    assert (await queue.get_job("f"))["attempts"] == "0"
+
+
+@pytest.mark.asyncio
+async def test_claimed_job_runs_again_once_its_lease_is_over(async_redis):
+    queue = _queue(fail=False, discarded=[])
+    await queue.enqueue("f", "u", "a.pdf")
+    now = time.time()
+    lease_end = now + SETTINGS.ingestion_job_timeout
+
+    claimed = await async_redis.eval(CLAIM_SCRIPT, 1, PENDING_KEY, now, lease_end)
+    during_lease = await async_redis.eval(
+        CLAIM_SCRIPT, 1, PENDING_KEY, lease_end - 1, lease_end + 30
+    )
+    after_lease = await async_redis.eval(
+        CLAIM_SCRIPT, 1, PENDING_KEY, lease_end + 1, lease_end + 31
+    )
+
+    assert (claimed, during_lease, after_lease) == ("f", None, "f")
@@ -0,0 +1,152 @@
+"""
+Query plan regressions: the history and search queries must keep using
+their indexes on a realistically sized history, whatever they return.
+"""
+
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from psycopg import Connection
+from psycopg.rows import DictRow
+
+from db.psycopg.chat_repository import MESSAGES_PAGE_QUERIES, SEARCH_MESSAGES_QUERY
+
+USERS = 50
+CHATS = 2000
+MESSAGES = 50000
+
+SEED_QUERIES = [
+    f"""
+    INSERT INTO "User" (id, "firstName", "nickName", timezone, language, "updatedAt")
+    SELECT 'user-' || u, 'Test', 'test', 'UTC', 'en', NOW()
+    FROM generate_series(1, {USERS}) u
+    """,
+    f"""
+    INSERT INTO "Chat" (id, title, timestamp, "userId", "updatedAt")
+    SELECT 'chat-' || c, 'Chat ' || c, c, 'user-' || (c % {USERS} + 1), NOW()
+    FROM generate_series(1, {CHATS}) c
+    """,
+    # Every message has a unique word, so a search only matches a few
+    f"""
+    INSERT INTO "ChatMessage"
+        (id, "chatId", content, role, timestamp, "groupId", "updatedAt")
+    SELECT
+        'message-' || m, 'chat-' || (m % {CHATS} + 1),
+        to_jsonb('message word' || m || ' about the weather'),
+        (CASE WHEN m % 2 = 0 THEN 'user' ELSE 'assistant' END)::"Role",
+        m, 'group-' || (m / 2), NOW()
+    FROM generate_series(1, {MESSAGES}) m
+    """,
+    'ANALYZE "User", "Chat", "ChatMessage"',
+]
+
+# What Prisma sends for the chat list, see `chat_service.get_chat_list`
+CHATS_PAGE_QUERY = """
+SELECT id, title, timestamp FROM "Chat"
+WHERE "userId" = %(user_id)s {keyset}
+ORDER BY timestamp DESC, id DESC
+LIMIT %(limit)s
+"""
+
+CHATS_NEXT_PAGE_KEYSET = """
+AND (timestamp < %(timestamp)s OR (timestamp = %(timestamp)s AND id < %(id)s))
+"""
+
+
+@pytest.fixture
+def seeded_conn(pg_conn: Connection[DictRow]) -> Iterator[Connection[DictRow]]:
+    for query in SEED_QUERIES:
+        pg_conn.execute(query)
+    yield pg_conn
+
+
+def _explain(conn: Connection[DictRow], query: str, params: Dict[str, Any]) -> Dict:
+    row = conn.execute(f"EXPLAIN (FORMAT JSON) {query}", params).fetchone()
+    assert row is not None
+    return row["QUERY PLAN"][0]["Plan"]
+
+
+def _nodes(plan: Dict) -> List[Dict]:
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(_nodes(child))
+    return nodes
+
+
+def _assert_uses_index(plan: Dict, table: str, *indexes: str) -> None:
+    """Asserts the table is only read through one of the indexes"""
+    nodes = _nodes(plan)
+    assert not [
+        node
+        for node in nodes
+        if node["Node Type"] == "Seq Scan" and node["Relation Name"] == table
+    ], f"sequential scan of {table}"
+    used = {node.get("Index Name") for node in nodes}
+    assert used & set(indexes), f"none of {indexes} used"
+
+
+@pytest.mark.parametrize("stub_thinking", [False, True])
+def test_messages_first_page_uses_index(seeded_conn, stub_thinking):
+    plan = _explain(
+        seeded_conn,
+        MESSAGES_PAGE_QUERIES[(False, stub_thinking)],
+        {"chat_id": "chat-1", "limit": 21},
+    )
+
+    _assert_uses_index(plan, "ChatMessage", "ChatMessage_chatId_timestamp_id_idx")
+
+
+@pytest.mark.parametrize("stub_thinking", [False, True])
+def test_messages_next_page_uses_index(seeded_conn, stub_thinking):
+    plan = _explain(
+        seeded_conn,
+        MESSAGES_PAGE_QUERIES[(True, stub_thinking)],
+        {"chat_id": "chat-1", "limit": 21, "timestamp": 30000.0, "id": "message-1"},
+    )
+
+    _assert_uses_index(plan, "ChatMessage", "ChatMessage_chatId_timestamp_id_idx")
+
+
+def test_chats_first_page_uses_index(seeded_conn):
+    plan = _explain(
+        seeded_conn,
+        CHATS_PAGE_QUERY.format(keyset=""),
+        {"user_id": "user-1", "limit": 21},
+    )
+
+    _assert_uses_index(plan, "Chat", "Chat_userId_timestamp_id_idx")
+
+
+def test_chats_next_page_uses_index(seeded_conn):
+    plan = _explain(
+        seeded_conn,
+        CHATS_PAGE_QUERY.format(keyset=CHATS_NEXT_PAGE_KEYSET),
+        {"user_id": "user-1", "limit": 21, "timestamp": 1000.0, "id": "chat-1"},
+    )
+
+    _assert_uses_index(plan, "Chat", "Chat_userId_timestamp_id_idx")
+
+
+@pytest.mark.parametrize(
+    "rank, last_id", [(None, None), (0.1, "message-1")], ids=["first", "next"]
+)
+def test_search_uses_index(seeded_conn, rank, last_id):
+    plan = _explain(
+        seeded_conn,
+        SEARCH_MESSAGES_QUERY,
+        {
+            "user_id": "user-1",
+            "query": "word1249",  # In chat-1250 of user-1
+            "limit": 21,
+            "rank": rank,
+            "id": last_id,
+        },
+    )
+
+    # Through the matches, or through the few chats of the user
+    _assert_uses_index(
+        plan,
+        "ChatMessage",
+        "ChatMessage_contentSearch_idx",
+        "ChatMessage_chatId_timestamp_id_idx",
+    )
@@ -0,0 +1,327 @@
+"""
+Behaviour of the Lua scripts, run against a real Redis.
+"""
+
+import json
+
+from core.chat_touch import RELEASE_SCRIPT as TOUCH_RELEASE_SCRIPT
+from core.chat_touch import TOUCH_SCRIPT
+from core.checkpoint_cache import ADD_WRITES_SCRIPT, SET_LATEST_SCRIPT
+from core.checkpoint_compactor import RELEASE_SCRIPT as COMPACTION_RELEASE_SCRIPT
+from core.ingestion_queue import CLAIM_SCRIPT, ENQUEUE_SCRIPT
+from core.redis_lock import RELEASE_LOCK_SCRIPT
+from core.upload_manifest import BEGIN_SCRIPT, DROP_STALE_SCRIPT, RECORD_SCRIPT
+from services.v1.chat_index_service import REBUILD_SCRIPT
+from services.v1.message_cache_service import (
+    APPEND_SCRIPT,
+    PATCH_SCRIPT,
+    WARM_SCRIPT,
+)
+
+CACHE_KEYS = ("messages", "count", "generation")
+TTL = 60
+
+
+def _message(message_id: str, content: str = "") -> str:
+    return json.dumps({"id": message_id, "content": content})
+
+
+# Chat index (user-029)
+
+INDEX_KEYS = ("index", "meta", "state", "removed")
+
+
+def test_rebuild_skips_removed_chats(redis_client):
+    redis_client.sadd("removed", "deleted")
+
+    redis_client.eval(
+        REBUILD_SCRIPT,
+        4,
+        *INDEX_KEYS,
+        TTL,
+        "v1",
+        *("kept", 10.0, "Kept", "hello"),
+        *("deleted", 20.0, "Deleted", ""),
+        *("empty", 5.0, "Empty", ""),
+    )
+
+    assert redis_client.zrange("index", 0, -1, withscores=True) == [
+        ("empty", 5.0),
+        ("kept", 10.0),
+    ]
+    assert redis_client.hgetall("meta") == {
+        "kept:title": "Kept",
+        "kept:preview": "hello",
+        "empty:title": "Empty",
+        "version": "v1",
+    }
+    assert redis_client.get("state") == "ready"
+
+
+def test_rebuild_keeps_newer_writes(redis_client):
+    redis_client.zadd("index", {"chat": 30.0})
+    redis_client.hset("meta", "chat:title", "Renamed")
+
+    redis_client.eval(
+        REBUILD_SCRIPT, 4, *INDEX_KEYS, TTL, "v1", "chat", 10.0, "Old", "preview"
+    )
+
+    assert redis_client.zscore("index", "chat") == 30.0
+    assert redis_client.hget("meta", "chat:title") == "Renamed"
+
+
+# Message cache (user-030)
+
+
+def test_append_to_cold_cache_only_bumps_generation(redis_client):
+    appended = redis_client.eval(APPEND_SCRIPT, 3, *CACHE_KEYS, 10, TTL, _message("a"))
+
+    assert appended == 0
+    assert redis_client.exists("messages", "count") == 0
+    assert redis_client.ttl("generation") > 0
+
+
+def test_generation_never_comes_back_after_expiry(redis_client):
+    redis_client.eval(APPEND_SCRIPT, 3, *CACHE_KEYS, 10, TTL, _message("a"))
+    first = int(redis_client.get("generation"))
+    redis_client.delete("generation")
+
+    redis_client.eval(PATCH_SCRIPT, 2, "messages", "generation", TTL, "a", "")
+
+    assert int(redis_client.get("generation")) > first
+
+
+def test_append_to_warm_cache_keeps_newest(redis_client):
+    redis_client.eval(
+        WARM_SCRIPT, 3, *CACHE_KEYS, 0, TTL, 2, _message("b"), _message("a")
+    )
+
+    appended = redis_client.eval(
+        APPEND_SCRIPT, 3, *CACHE_KEYS, 2, TTL, _message("c"), _message("d")
+    )
+
+    assert appended == 1
+    assert [json.loads(m)["id"] for m in redis_client.lrange("messages", 0, -1)] == [
+        "d",
+        "c",
+    ]
+    assert redis_client.get("count") == "4"
+    assert redis_client.ttl("messages") > 0
+
+
+def test_warm_after_a_write_is_refused(redis_client):
+    redis_client.eval(APPEND_SCRIPT, 3, *CACHE_KEYS, 10, TTL, _message("a"))
+
+    warmed = redis_client.eval(WARM_SCRIPT, 3, *CACHE_KEYS, 0, TTL, 1, _message("a"))
+
+    assert warmed == 0
+    assert redis_client.exists("messages", "count") == 0
+
+
+def test_warm_starts_generation(redis_client):
+    warmed = redis_client.eval(WARM_SCRIPT, 3, *CACHE_KEYS, 0, TTL, 1, _message("a"))
+
+    assert warmed == 1
+    assert int(redis_client.get("generation")) > 0
+    assert redis_client.ttl("generation") > 0
+
+
+def test_patch_replaces_message_by_id(redis_client):
+    redis_client.eval(
+        WARM_SCRIPT, 3, *CACHE_KEYS, 0, TTL, 2, _message("b"), _message("a")
+    )
+    generation = int(redis_client.get("generation"))
+
+    patched = redis_client.eval(
+        PATCH_SCRIPT, 2, "messages", "generation", TTL, "a", _message("a", "edited")
+    )
+    missing = redis_client.eval(
+        PATCH_SCRIPT, 2, "messages", "generation", TTL, "z", _message("z")
+    )
+
+    assert (patched, missing) == (1, 0)
+    assert json.loads(redis_client.lindex("messages", 1))["content"] == "edited"
+    assert int(redis_client.get("generation")) == generation + 2
+
+
+# Chat touches (user-031)
+
+
+def test_touch_keeps_newest_timestamp(redis_client):
+    for timestamp in ("10.5", "30.25", "20.0"):
+        redis_client.eval(TOUCH_SCRIPT, 1, "pending", "chat", timestamp)
+
+    assert redis_client.hget("pending", "chat") == "30.25"
+
+
+def test_release_keeps_chats_touched_during_flush(redis_client):
+    redis_client.hset("pending", mapping={"flushed": "1.0", "touched": "2.0"})
+    redis_client.hset("pending", "touched", "3.0")
+
+    redis_client.eval(
+        TOUCH_RELEASE_SCRIPT, 1, "pending", "flushed", "1.0", "touched", "2.0"
+    )
+
+    assert redis_client.hgetall("pending") == {"touched": "3.0"}
+
+
+def test_release_lock_leaves_lock_of_next_owner(redis_client):
+    redis_client.set("lock", "next-owner")
+
+    expired = redis_client.eval(RELEASE_LOCK_SCRIPT, 1, "lock", "first-owner")
+    released = redis_client.eval(RELEASE_LOCK_SCRIPT, 1, "lock", "next-owner")
+
+    assert (expired, released) == (0, 1)
+    assert redis_client.exists("lock") == 0
+
+
+# Checkpoint cache (user-043)
+
+
+def test_set_latest_never_goes_back(redis_client):
+    keys = ("latest", "writes:2", "namespaces")
+    redis_client.hset("writes:2", mapping={"task:0": "w"})
+
+    newer = redis_client.eval(SET_LATEST_SCRIPT, 3, *keys, "2", "data2", TTL, "")
+    older = redis_client.eval(SET_LATEST_SCRIPT, 3, *keys, "1", "data1", TTL, "")
+
+    assert (newer, older) == (1, 0)
+    assert redis_client.hgetall("latest") == {
+        "id": "2",
+        "data": "data2",
+        "writes": "1",
+    }
+    assert redis_client.smembers("namespaces") == {""}
+
+
+def test_add_writes_counts_writes_of_latest(redis_client):
+    keys = ("latest", "writes:1")
+    redis_client.eval(SET_LATEST_SCRIPT, 3, *keys, "namespaces", "1", "d", TTL, "")
+
+    redis_client.eval(ADD_WRITES_SCRIPT, 2, *keys, "1", TTL, "t:0", "a", "t:1", "b")
+    redis_client.eval(ADD_WRITES_SCRIPT, 2, *keys, "1", TTL, "t:0", "c")
+
+    assert redis_client.hgetall("writes:1") == {"t:0": "a", "t:1": "b"}
+    assert redis_client.hget("latest", "writes") == "2"
+
+
+def test_add_writes_of_older_checkpoint_leaves_latest(redis_client):
+    redis_client.eval(
+        SET_LATEST_SCRIPT, 3, "latest", "writes:2", "namespaces", "2", "d", TTL, ""
+    )
+
+    redis_client.eval(ADD_WRITES_SCRIPT, 2, "latest", "writes:1", "1", TTL, "t:0", "a")
+
+    assert redis_client.hget("latest", "writes") == "0"
+
+
+# Checkpoint compaction (user-037)
+
+
+def test_compaction_release_keeps_threads_marked_again(redis_client):
+    redis_client.zadd("pending", {"idle": 100, "active": 100})
+    redis_client.zadd("pending", {"active": 200})
+
+    for thread_id in ("idle", "active"):
+        redis_client.eval(COMPACTION_RELEASE_SCRIPT, 1, "pending", thread_id, 100)
+
+    assert redis_client.zrange("pending", 0, -1) == ["active"]
+
+
+# Ingestion queue (user-046)
+
+
+def _enqueue(redis_client, file_id: str, now: float) -> int:
+    return redis_client.eval(
+        ENQUEUE_SCRIPT, 2, f"job:{file_id}", "pending", file_id, now, "user_id", "u"
+    )
+
+
+def test_enqueue_is_idempotent_until_failed(redis_client):
+    assert _enqueue(redis_client, "f", 100) == 1
+    redis_client.hset("job:f", mapping={"status": "parsing", "attempts": 1})
+    assert _enqueue(redis_client, "f", 200) == 0
+
+    redis_client.hset("job:f", "status", "failed")
+    assert _enqueue(redis_client, "f", 300) == 1
+
+    assert redis_client.hgetall("job:f") == {
+        "status": "queued",
+        "attempts": "0",
+        "user_id": "u",
+    }
+    assert redis_client.zscore("pending", "f") == 300
+
+
+def test_claim_leases_due_job(redis_client):
+    redis_client.zadd("pending", {"due": 100, "later": 500})
+
+    first = redis_client.eval(CLAIM_SCRIPT, 1, "pending", 200, 1000)
+    second = redis_client.eval(CLAIM_SCRIPT, 1, "pending", 200, 1000)
+
+    assert (first, second) == ("due", None)
+    assert redis_client.zscore("pending", "due") == 1000
+
+
+# Upload manifest (user-050)
+
+
+def _begin(redis_client, total_chunks: int = 3, user_id: str = "u") -> int:
+    return redis_client.eval(
+        BEGIN_SCRIPT,
+        2,
+        "manifest",
+        "active",
+        "f",
+        user_id,
+        "a.pdf",
+        total_chunks,
+        1024,
+        100,
+    )
+
+
+def _record(redis_client, chunk_index: int, size: str = "") -> int:
+    return redis_client.eval(
+        RECORD_SCRIPT, 3, "manifest", "chunks", "active", "f", chunk_index, size, 200
+    )
+
+
+def test_begin_rejects_chunk_of_another_upload(redis_client):
+    assert _begin(redis_client) == 1
+    assert _begin(redis_client) == 1
+    assert _begin(redis_client, total_chunks=4) == 0
+    assert _begin(redis_client, user_id="other") == 0
+
+    assert redis_client.hget("manifest", "user_id") == "u"
+
+
+def test_record_counts_distinct_chunks(redis_client):
+    _begin(redis_client)
+
+    assert _record(redis_client, 0) == 1
+    assert _record(redis_client, 0) == 1
+    assert _record(redis_client, 2, "3000") == 2
+
+    assert redis_client.hget("manifest", "size") == "3000"
+    assert redis_client.zscore("active", "f") == 200
+
+
+def test_record_after_sweep_is_refused(redis_client):
+    assert _record(redis_client, 0) == -1
+    assert redis_client.exists("chunks") == 0
+
+
+def test_drop_stale_keeps_upload_with_new_chunk(redis_client):
+    _begin(redis_client)
+    _record(redis_client, 0)
+
+    fresh = redis_client.eval(
+        DROP_STALE_SCRIPT, 3, "active", "manifest", "chunks", "f", 150
+    )
+    stale = redis_client.eval(
+        DROP_STALE_SCRIPT, 3, "active", "manifest", "chunks", "f", 250
+    )
+
+    assert (fresh, stale) == (0, 1)
+    assert redis_client.exists("active", "manifest", "chunks") == 0
@@ -0,0 +1,45 @@
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+from core.utils import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(1718000000.123456, "a1b2")
+
+    assert decode_cursor(cursor, float, str) == [1718000000.123456, "a1b2"]
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(0.5, "?/+" * 20)
+
+    assert set(cursor) <= set(
+        "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_="
+    )
+
+
+def test_cursor_accepts_int_for_float():
+    assert decode_cursor(encode_cursor(3, "id"), float, str) == [3, "id"]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not base64!",
+        base64.urlsafe_b64encode(b"not json").decode(),
+        base64.urlsafe_b64encode(b'{"rank": 1}').decode(),
+        encode_cursor(1.0),
+        encode_cursor(1.0, "id", "extra"),
+        encode_cursor("1.0", "id"),
+        encode_cursor(True, "id"),
+        encode_cursor(1.0, 2.0),
+        base64.urlsafe_b64encode(b"[null, null]").decode(),
+    ],
+)
+def test_invalid_cursor_is_bad_request(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, float, str)
+
+    assert exc_info.value.status_code == 400